@@ -1,9 +1,11 @@
 import pandas as pd
 import os
+from contextlib import nullcontext
 import seaborn as sns
-from data_loader import load_processed_data
+from data_loader import load_processed_data, load_user_dictionary, format_session_ids, time_window_filters
 # Import session analysis functions
 from session_analyzer import (
+    build_session_summary,
     calculate_session_durations,
     plot_session_duration_histogram,
     get_session_duration_stats,
@@ -36,346 +38,386 @@ from page_analyzer import (
     get_top_directories_by_hits_and_sessions,
     get_top_file_types_by_hits
 )
+from task_graph import TaskGraph, SKIPPED
+from chart_rendering import ChartRenderer
 
 # Configuración de Seaborn para los gráficos
 sns.set_theme(style="whitegrid")
 
+# Columnas del conjunto procesado que usa cada sección del análisis. Todas las tareas comparten un
+# único DataFrame (el grafo reutiliza los intermedios entre secciones), así que se lee la unión
+# (ANALYSIS_COLUMNS); el resto (Método, Resultado, Tamaño...) no se llega a leer del Parquet.
+ANALYSIS_SECTION_COLUMNS = {
+    'sesiones, tiempos por página y tipos de página': ['SessionID', 'marca de tiempo', 'Página'],
+    'duración media por hora de inicio': ['SessionID', 'marca de tiempo', 'Fecha/Hora'],
+    'dominios y tipos de dominio': ['SessionID', 'Host remoto'],
+    'visitantes': ['SessionID', 'UserID', 'Host remoto'],
+    'páginas, directorios, tipos de archivo y páginas de entrada/salida': ['SessionID', 'marca de tiempo', 'Página'],
+}
+ANALYSIS_COLUMNS = list(dict.fromkeys(column for columns in ANALYSIS_SECTION_COLUMNS.values() for column in columns))
+
+
+def save_low_avg_time_sessions(
+    per_session_avg_page_time_df: pd.DataFrame,
+    user_dictionary: pd.DataFrame | None,
+    output_tables_dir: str,
+    top_n: int = 20
+) -> pd.DataFrame:
+    """Tarea 2.3.1: muestra y guarda las top_n sesiones con menor tiempo medio por página."""
+    top_low_avg_time_sessions = per_session_avg_page_time_df.head(top_n)
+    if user_dictionary is not None:
+        top_low_avg_time_sessions = top_low_avg_time_sessions.assign(
+            SessionID=format_session_ids(top_low_avg_time_sessions['SessionID'], user_dictionary)
+        )
+    print(f"\nTop {top_n} sesiones con menor tiempo medio por página (segundos):")
+    print(top_low_avg_time_sessions.to_string())
+
+    table_path = os.path.join(output_tables_dir, f'top_{top_n}_low_avg_page_time_sessions.csv')
+    try:
+        top_low_avg_time_sessions.to_csv(table_path, index=False)
+        print(f"Tabla de las {top_n} sesiones con menor tiempo medio por página guardada en: {table_path}")
+    except Exception as e:
+        print(f"Error al guardar la tabla: {e}")
+    return top_low_avg_time_sessions
+
+def identify_fast_sessions(
+    per_session_avg_page_time_df: pd.DataFrame,
+    user_dictionary: pd.DataFrame | None,
+    output_tables_dir: str,
+    threshold: float = 0.5
+) -> set:
+    """
+    Tarea 2.3.2: identifica (y guarda en una tabla) las sesiones con tiempo medio por página
+    menor que threshold segundos. Devuelve el conjunto de sus SessionID.
+    """
+    identified_fast_sessions_df = per_session_avg_page_time_df[
+        per_session_avg_page_time_df['avg_page_view_time_seconds'] < threshold
+    ]
+    print(f"\nSe identificaron {len(identified_fast_sessions_df)} sesiones con un tiempo medio por página menor a {threshold} segundos.")
+    if identified_fast_sessions_df.empty:
+        return set()
+
+    print("Algunas de estas sesiones (hasta 10):")
+    print(identified_fast_sessions_df.head(10).to_string())
+    fast_sessions_table_path = os.path.join(output_tables_dir, 'identified_fast_sessions.csv')
+    fast_sessions_table = identified_fast_sessions_df
+    if user_dictionary is not None:
+        fast_sessions_table = fast_sessions_table.assign(
+            SessionID=format_session_ids(fast_sessions_table['SessionID'], user_dictionary)
+        )
+    try:
+        fast_sessions_table.to_csv(fast_sessions_table_path, index=False)
+        print(f"Tabla de sesiones rápidas (<{threshold}s) guardada en: {fast_sessions_table_path}")
+    except Exception as e:
+        print(f"Error al guardar la tabla de sesiones rápidas: {e}")
+    return set(identified_fast_sessions_df['SessionID'])
+
+def remove_fast_sessions(
+    df: pd.DataFrame,
+    session_summary: pd.DataFrame,
+    fast_session_ids: set
+) -> tuple[pd.DataFrame, pd.DataFrame, bool]:
+    """
+    Tarea 2.3.3: elimina las sesiones de fast_session_ids de los hits y de la tabla resumen.
+    Devuelve (hits, tabla resumen, si se eliminaron sesiones); sin sesiones que eliminar devuelve las originales.
+    """
+    if not fast_session_ids:
+        print("\nNo se eliminaron sesiones en el paso 2.3.3 (ninguna identificada o ninguna que cumpliera criterios de eliminación).")
+        return df, session_summary, False
+
+    rows_before_fast_session_removal = len(df)
+    df_no_fast_sessions = df[~df['SessionID'].isin(fast_session_ids)].copy() # .copy() para evitar SettingWithCopyWarning más adelante
+    rows_after_fast_session_removal = len(df_no_fast_sessions)
+    print(f"\nSe eliminaron {len(fast_session_ids)} sesiones consideradas demasiado rápidas.")
+    print(f"Filas en el DataFrame antes de eliminar sesiones rápidas: {rows_before_fast_session_removal}")
+    print(f"Filas en el DataFrame después de eliminar sesiones rápidas: {rows_after_fast_session_removal}")
+    print(f"Número de filas eliminadas: {rows_before_fast_session_removal - rows_after_fast_session_removal}")
+    # Las sesiones se eliminan completas, así que basta con filtrar la tabla resumen
+    session_summary_no_fast_sessions = session_summary[~session_summary.index.isin(fast_session_ids)]
+    return df_no_fast_sessions, session_summary_no_fast_sessions, True
+
+def build_analysis_graph(
+    df_processed: pd.DataFrame,
+    user_dictionary: pd.DataFrame | None,
+    output_graphics_dir: str,
+    output_tables_dir: str,
+    approximate_top_tables: bool = False,
+    max_workers: int = 4,
+    renderer: ChartRenderer | None = None,
+    scatter_render_mode: str = 'auto'
+) -> TaskGraph:
+    """
+    Construye el grafo de tareas del análisis (tareas 2.1 a 2.8). Los intermedios (tabla resumen
+    de sesiones, duraciones, hits sin sesiones rápidas...) son tareas cuyo resultado se calcula una
+    sola vez y se comparte, y las ramas independientes (tablas de dominios, directorios, histogramas...)
+    se ejecutan en paralelo. Si no hay tiempos de visualización de página o tiempos medios por sesión,
+    se omiten las tareas desde la 2.3 en adelante.
+    Con renderer los gráficos se dibujan en su pool de procesos mientras sigue el análisis; sin él,
+    las tareas que dibujan lo hacen en este proceso, de una en una.
+    scatter_render_mode es el render_mode de plot_hits_vs_duration_scatter.
+    """
+    graph = TaskGraph(max_workers=max_workers)
+    draws_in_process = renderer is None
+    graph.add('hits', lambda: df_processed)
+
+    # Tabla resumen por sesión (inicio, fin, hits, páginas de entrada/salida...) calculada una sola vez
+    # y reutilizada por todos los análisis de sesión
+    graph.add('session_summary', build_session_summary, ['hits'])
+
+    # --- Tarea 2.1: Duración de sesiones (>1 visita): histograma y resumen estadístico ---
+    graph.add('session_durations', lambda summary: calculate_session_durations(None, summary), ['session_summary'])
+
+    def session_duration_report(session_durations_seconds, histogram_filename, stats_filename, plot):
+        if session_durations_seconds.empty:
+            print("No hay duraciones de sesión para analizar más a fondo.")
+            return None
+        if plot:
+            print(f"\nTotal de sesiones con >1 visita para análisis de duración: {len(session_durations_seconds)}")
+            return plot_session_duration_histogram(
+                session_durations_seconds, output_graphics_dir, filename=histogram_filename, renderer=renderer
+            )
+        return get_session_duration_stats(session_durations_seconds, output_graphics_dir, filename=stats_filename)
+
+    graph.add('session_duration_histogram',
+              lambda durations: session_duration_report(durations, "session_duration_histogram.png", None, True),
+              ['session_durations'], uses_pyplot=draws_in_process)
+    graph.add('session_duration_stats',
+              lambda durations: session_duration_report(durations, None, "session_duration_stats.txt", False),
+              ['session_durations'])
+
+    # --- Tarea 2.2: Tiempo medio por página: histograma y estadísticas ---
+    graph.add('page_view_durations', calculate_mean_time_per_page, ['hits'])
+
+    def page_view_duration_report(page_view_result, histogram_filename, stats_filename, plot):
+        page_view_durations_seconds, mean_time_per_page_seconds = page_view_result
+        if mean_time_per_page_seconds is None:
+            return None
+        if plot:
+            return plot_page_view_duration_histogram(
+                page_view_durations_seconds, output_graphics_dir, filename=histogram_filename, renderer=renderer
+            )
+        return get_page_view_duration_stats(page_view_durations_seconds, output_graphics_dir, filename=stats_filename)
+
+    graph.add('page_view_duration_histogram',
+              lambda result: page_view_duration_report(result, "page_view_duration_histogram.png", None, True),
+              ['page_view_durations'], uses_pyplot=draws_in_process)
+    graph.add('page_view_duration_stats',
+              lambda result: page_view_duration_report(result, None, "page_view_duration_stats.txt", False),
+              ['page_view_durations'])
+
+    # --- Tarea 2.3: Sesiones con menor tiempo medio por página y eliminación de las rápidas ---
+    graph.add('per_session_avg_page_time', lambda summary: calculate_per_session_avg_page_time(None, summary), ['session_summary'])
+
+    def check_analysis_inputs(page_view_result, per_session_avg_page_time_df):
+        if page_view_result[1] is None:
+            print("\nNo se pudo calcular el tiempo medio por página por sesión (mean_time_per_page_seconds está None).")
+        elif per_session_avg_page_time_df.empty:
+            print("\nNo se pudo calcular el tiempo medio por página por sesión (per_session_avg_page_time_df está vacío).")
+        else:
+            return True
+        print("Omitiendo tareas 2.3.2 en adelante, incluyendo 2.4, 2.5, 2.6 y 2.7.")
+        return SKIPPED
+
+    graph.add('analysis_inputs_available', check_analysis_inputs, ['page_view_durations', 'per_session_avg_page_time'])
+    graph.add('low_avg_time_sessions_table',
+              lambda per_session: save_low_avg_time_sessions(per_session, user_dictionary, output_tables_dir),
+              ['per_session_avg_page_time'], after=['analysis_inputs_available'])
+    graph.add('fast_sessions',
+              lambda per_session: identify_fast_sessions(per_session, user_dictionary, output_tables_dir),
+              ['per_session_avg_page_time'], after=['analysis_inputs_available'])
+    # Hits y tabla resumen sin las sesiones rápidas, que usan las tareas siguientes
+    graph.add('analysis_data', remove_fast_sessions, ['hits', 'session_summary', 'fast_sessions'])
+    graph.add('analysis_hits', lambda data: data[0], ['analysis_data'])
+    graph.add('analysis_session_summary', lambda data: data[1], ['analysis_data'])
+
+    # --- Tarea 2.3.4: Actualizar histogramas y estadísticas si se eliminaron sesiones ---
+    def if_sessions_removed(data, compute):
+        if not data[2]:
+            return SKIPPED
+        return compute()
+
+    graph.add('filtered_session_durations',
+              lambda data: if_sessions_removed(data, lambda: calculate_session_durations(None, data[1])),
+              ['analysis_data'])
+    graph.add('filtered_session_duration_histogram',
+              lambda durations: session_duration_report(durations, "session_duration_histogram_after_2.3.3_filter.png", None, True),
+              ['filtered_session_durations'], uses_pyplot=draws_in_process)
+    graph.add('filtered_session_duration_stats',
+              lambda durations: session_duration_report(durations, None, "session_duration_stats_after_2.3.3_filter.txt", False),
+              ['filtered_session_durations'])
+    graph.add('filtered_page_view_durations',
+              lambda data: if_sessions_removed(data, lambda: calculate_mean_time_per_page(data[0])),
+              ['analysis_data'])
+    graph.add('filtered_page_view_duration_histogram',
+              lambda result: page_view_duration_report(result, "page_view_duration_histogram_after_2.3.3_filter.png", None, True),
+              ['filtered_page_view_durations'], uses_pyplot=draws_in_process)
+    graph.add('filtered_page_view_duration_stats',
+              lambda result: page_view_duration_report(result, None, "page_view_duration_stats_after_2.3.3_filter.txt", False),
+              ['filtered_page_view_durations'])
+
+    # Duraciones de sesión para el resto del análisis: las filtradas si se eliminaron sesiones
+    graph.add('analysis_session_durations',
+              lambda data, durations: calculate_session_durations(None, data[1]) if data[2] else durations,
+              ['analysis_data', 'session_durations'])
+
+    # --- Tarea 2.4: Páginas visitadas por sesión ---
+    graph.add('session_hit_counts', lambda summary: summary['num_hits'].rename(None), ['analysis_session_summary'])
+
+    def hits_per_session_report(session_hit_counts, plot):
+        if session_hit_counts.empty:
+            print("No hay datos de conteo de hits por sesión para generar el histograma o estadísticas.")
+            return None
+        if plot:
+            return plot_hits_per_session_histogram(session_hit_counts, output_graphics_dir, renderer=renderer)
+        return get_hits_per_session_stats(session_hit_counts, output_graphics_dir)
+
+    graph.add('hits_per_session_histogram', lambda counts: hits_per_session_report(counts, True),
+              ['session_hit_counts'], uses_pyplot=draws_in_process)
+    graph.add('hits_per_session_stats', lambda counts: hits_per_session_report(counts, False), ['session_hit_counts'])
+
+    # --- Tarea 2.5: Relación entre visitas y duración ---
+    def hits_vs_duration_scatter(session_hit_counts, active_session_durations):
+        if active_session_durations.empty or session_hit_counts.empty:
+            print("No se pueden generar datos para el diagrama de dispersión hits vs duración.")
+            return None
+        return plot_hits_vs_duration_scatter(
+            session_hit_counts, active_session_durations, output_graphics_dir,
+            renderer=renderer, render_mode=scatter_render_mode
+        )
+
+    graph.add('hits_vs_duration_scatter', hits_vs_duration_scatter,
+              ['session_hit_counts', 'analysis_session_durations'], uses_pyplot=draws_in_process)
+
+    # --- Tarea 2.6: Duración de la visita a las dos primeras páginas ---
+    graph.add('first_second_page_durations', calculate_first_second_page_durations, ['analysis_hits'])
+
+    def first_page_duration_histogram(durations):
+        first_page_durations, _ = durations
+        if first_page_durations.empty:
+            print("No se pudieron calcular duraciones para la primera página.")
+            return None
+        print(f"Se calcularon {len(first_page_durations)} duraciones para la primera página de sesiones.")
+        return plot_first_page_duration_histogram(first_page_durations, output_graphics_dir, renderer=renderer)
+
+    def first_second_page_duration_stats(durations):
+        first_page_durations, second_page_durations = durations
+        if first_page_durations.empty and second_page_durations.empty:
+            print("No hay datos de duración de primera o segunda página para calcular estadísticas.")
+            return None
+        return get_first_second_page_duration_stats(first_page_durations, second_page_durations, output_graphics_dir)
+
+    graph.add('first_page_duration_histogram', first_page_duration_histogram, ['first_second_page_durations'], uses_pyplot=draws_in_process)
+    graph.add('first_second_page_duration_stats', first_second_page_duration_stats, ['first_second_page_durations'])
+
+    # --- Tarea 2.7: Tipo de página por su extensión ---
+    # Sobre una copia superficial: las columnas nuevas no modifican los hits que leen otras tareas
+    graph.add('hits_with_page_type', lambda hits: classify_page_type(hits.copy(deep=False)), ['analysis_hits'])
+    graph.add('first_second_page_durations_by_type',
+              lambda hits: get_first_second_page_durations_by_type(hits, output_tables_dir), ['hits_with_page_type'])
+    graph.add('first_second_page_duration_histograms_by_type',
+              lambda hits: plot_first_second_page_duration_histograms_by_type(hits, output_graphics_dir, renderer=renderer),
+              ['hits_with_page_type'], uses_pyplot=draws_in_process)
+    # La tarea 2.7.4 (discusión) se abordará en la memoria.
+
+    # --- Tarea 2.8: Tablas y gráficos adicionales ---
+    graph.add('top_domains',
+              lambda hits: get_top_domains_by_hits_and_sessions(hits, output_graphics_dir, top_n=20, approximate=approximate_top_tables),
+              ['analysis_hits'])
+    graph.add('top_domain_types', lambda hits: get_top_domain_types(hits, output_graphics_dir, top_n=7), ['analysis_hits'])
+    graph.add('mean_session_duration_by_hour',
+              lambda hits, summary, durations: plot_mean_session_duration_by_hour(
+                  hits, output_graphics_dir, session_summary=summary, session_durations=durations, renderer=renderer),
+              ['analysis_hits', 'analysis_session_summary', 'analysis_session_durations'], uses_pyplot=draws_in_process)
+    graph.add('top_visitors', lambda hits: get_top_visitors_by_sessions(hits, output_graphics_dir, top_n=10), ['analysis_hits'])
+    graph.add('visitor_session_distribution',
+              lambda hits: get_visitor_session_distribution(hits, output_graphics_dir, max_sessions_to_detail=9), ['analysis_hits'])
+    graph.add('top_pages',
+              lambda hits: get_top_pages_by_hits_and_sessions(hits, output_graphics_dir, top_n=10, approximate=approximate_top_tables),
+              ['analysis_hits'])
+    graph.add('top_directories',
+              lambda hits: get_top_directories_by_hits_and_sessions(hits, output_graphics_dir, top_n=10, approximate=approximate_top_tables),
+              ['analysis_hits'])
+    graph.add('top_file_types', lambda hits: get_top_file_types_by_hits(hits, output_graphics_dir, top_n=10), ['analysis_hits'])
+    graph.add('top_entry_pages',
+              lambda hits, summary: get_top_entry_pages(hits, output_graphics_dir, top_n=10, session_summary=summary),
+              ['analysis_hits', 'analysis_session_summary'])
+    graph.add('top_exit_pages',
+              lambda hits, summary: get_top_exit_pages(hits, output_graphics_dir, top_n=10, session_summary=summary),
+              ['analysis_hits', 'analysis_session_summary'])
+    graph.add('top_single_access_pages',
+              lambda hits, summary: get_top_single_access_pages(hits, output_graphics_dir, top_n=10, session_summary=summary),
+              ['analysis_hits', 'analysis_session_summary'])
+    graph.add('session_duration_distribution_minutes',
+              lambda hits, summary, durations: get_session_duration_distribution_minutes(
+                  hits, output_graphics_dir, session_summary=summary, session_durations_seconds=durations),
+              ['analysis_hits', 'analysis_session_summary', 'analysis_session_durations'])
+    return graph
+
 if __name__ == '__main__':
     # Construir rutas de manera robusta
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.join(script_dir, '..')
     
-    input_data_path = os.path.join(project_root, 'output', 'processed_log_data.parquet')
+    # 'processed_log_data' si preprocessing.py guardó el conjunto particionado (processed_partition_by)
+    processed_dataset_name = 'processed_log_data.parquet'
+    input_data_path = os.path.join(project_root, 'output', processed_dataset_name)
     input_data_path = os.path.normpath(input_data_path)
     
     output_graphics_dir = os.path.join(project_root, 'output', 'graphics', 'analysis')
     output_graphics_dir = os.path.normpath(output_graphics_dir)
-    if not os.path.exists(output_graphics_dir):
-        os.makedirs(output_graphics_dir)
-        print(f"Directorio para gráficos creado: {output_graphics_dir}")
+    output_tables_dir = os.path.normpath(os.path.join(project_root, 'output', 'tables'))
+    for output_dir in [output_graphics_dir, output_tables_dir]:
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+            print(f"Directorio de salida creado: {output_dir}")
+
+    # Ventana temporal a analizar, p.ej. ('1995-07-01', '1995-07-08'); None analiza todo el log.
+    # El Parquet único está ordenado por SessionID, así que cada row group abarca todo el periodo y el
+    # filtro no puede descartar ninguno (solo se ahorra leer columnas). Si existe el conjunto particionado
+    # por tiempo (processed_partition_by en preprocessing.py) se usa ese: solo se leen las particiones
+    # de la ventana.
+    analysis_time_window = None
+    partitioned_data_path = os.path.normpath(os.path.join(project_root, 'output', 'processed_log_data'))
+    if analysis_time_window and os.path.isdir(partitioned_data_path):
+        input_data_path = partitioned_data_path
+
+    # Leer los datos de una caché Arrow memory-mapped junto al Parquet (se regenera si este cambia).
+    # La caché guarda el conjunto completo: con una ventana temporal se lee el Parquet con sus filtros
+    use_processed_cache = analysis_time_window is None
+
+    # Tablas top de páginas, dominios y directorios con sketches en streaming (Space-Saving,
+    # Count-Min y HyperLogLog) en lugar de agrupar todos los hits: aproximadas, con memoria fija
+    approximate_top_tables = False
+
+    # Hilos para ejecutar en paralelo las tareas independientes del análisis (1 = en secuencia)
+    analysis_workers = 4
+
+    # Procesos que dibujan los gráficos (backend Agg) mientras sigue el análisis, uno por núcleo libre
+    # (hasta 4); 0 los dibuja en este proceso, que con un solo núcleo es más rápido
+    chart_render_workers = min(4, (os.cpu_count() or 1) - 1)
+
+    # Dibujado del diagrama hits vs duración: 'points' (un punto por sesión), 'density' (histograma 2D),
+    # 'sample' (muestra estratificada) o 'auto' (histograma 2D con muchas sesiones)
+    scatter_render_mode = 'auto'
 
     # Cargar datos
-    df_processed = load_processed_data(input_data_path)
+    analysis_filters = time_window_filters(*analysis_time_window) if analysis_time_window else None
+    df_processed = load_processed_data(
+        input_data_path, columns=ANALYSIS_COLUMNS, filters=analysis_filters, use_cache=use_processed_cache
+    )
+    # Diccionario para mostrar los UserID/SessionID enteros con el nombre del host
+    user_dictionary = load_user_dictionary(os.path.normpath(os.path.join(project_root, 'output', 'user_dictionary.parquet')))
     
     if df_processed is not None:
-        # --- Tarea 2.1.2: Calcular duración de sesiones (>1 visita) ---
-        session_durations_seconds = calculate_session_durations(df_processed)
-        
-        if not session_durations_seconds.empty:
-            print(f"\nTotal de sesiones con >1 visita para análisis de duración: {len(session_durations_seconds)}")
-            # --- Tarea 2.1.3: Generar histograma de duración de sesión ---
-            plot_session_duration_histogram(session_durations_seconds, output_graphics_dir)
-
-            # --- Tarea 2.1.4: Calcular resumen estadístico de duración de sesión ---
-            session_duration_stats_df = get_session_duration_stats(session_durations_seconds, output_graphics_dir) # Guardar en el mismo dir que los gráficos
-            # La variable session_duration_stats_df se puede usar más adelante si es necesario
-
-        else:
-            print("No hay duraciones de sesión para analizar más a fondo.")
-
-        # Aquí se añadirán las llamadas a las funciones para las tareas 2.1.4, etc.
-
-        # --- Tarea 2.2.1: Calcular tiempo medio por página ---
-        page_view_durations_seconds, mean_time_per_page_seconds = calculate_mean_time_per_page(df_processed)
-        
-        if mean_time_per_page_seconds is not None:
-            # --- Tarea 2.2.2: Construir histograma del tiempo por página ---
-            plot_page_view_duration_histogram(page_view_durations_seconds, output_graphics_dir)
-            
-            # --- Tarea 2.2.3: Calcular estadísticas de tiempo por página ---
-            page_view_stats_df = get_page_view_duration_stats(page_view_durations_seconds, output_graphics_dir)
-
-            # --- Tarea 2.3.1: Identificar 20 sesiones con menor tiempo medio por página ---
-            per_session_avg_page_time_df = calculate_per_session_avg_page_time(df_processed)
-            if not per_session_avg_page_time_df.empty:
-                top_20_low_avg_time_sessions = per_session_avg_page_time_df.head(20)
-                print("\nTop 20 sesiones con menor tiempo medio por página (segundos):")
-                print(top_20_low_avg_time_sessions.to_string())
-                
-                # Guardar esta tabla
-                output_tables_dir = os.path.join(project_root, 'output', 'tables')
-                output_tables_dir = os.path.normpath(output_tables_dir)
-                if not os.path.exists(output_tables_dir):
-                    os.makedirs(output_tables_dir)
-                    print(f"Directorio para tablas creado: {output_tables_dir}")
-                
-                table_path = os.path.join(output_tables_dir, 'top_20_low_avg_page_time_sessions.csv')
-                try:
-                    top_20_low_avg_time_sessions.to_csv(table_path, index=False)
-                    print(f"Tabla de las 20 sesiones con menor tiempo medio por página guardada en: {table_path}")
-                except Exception as e:
-                    print(f"Error al guardar la tabla: {e}")
-
-                # --- Tarea 2.3.2: Identificar sesiones con tiempo medio por página < 0.5s ---
-                if not per_session_avg_page_time_df.empty:
-                    fast_sessions_threshold = 0.5
-                    identified_fast_sessions_df = per_session_avg_page_time_df[
-                        per_session_avg_page_time_df['avg_page_view_time_seconds'] < fast_sessions_threshold
-                    ]
-                    print(f"\nSe identificaron {len(identified_fast_sessions_df)} sesiones con un tiempo medio por página menor a {fast_sessions_threshold} segundos.")
-                    
-                    if not identified_fast_sessions_df.empty:
-                        print("Algunas de estas sesiones (hasta 10):")
-                        print(identified_fast_sessions_df.head(10).to_string())
-                        # Guardar esta tabla también podría ser útil
-                        fast_sessions_table_path = os.path.join(output_tables_dir, 'identified_fast_sessions.csv')
-                        try:
-                            identified_fast_sessions_df.to_csv(fast_sessions_table_path, index=False)
-                            print(f"Tabla de sesiones rápidas (<{fast_sessions_threshold}s) guardada en: {fast_sessions_table_path}")
-                        except Exception as e:
-                            print(f"Error al guardar la tabla de sesiones rápidas: {e}")
-                        
-                        # Estas SessionIDs se usarán en la tarea 2.3.3
-                        session_ids_to_potentially_remove = set(identified_fast_sessions_df['SessionID'])
-                    else:
-                        session_ids_to_potentially_remove = set()
-                else:
-                    session_ids_to_potentially_remove = set()
-                    print("\nNo se pudo calcular el tiempo medio por página por sesión, saltando la identificación de sesiones rápidas.")
-
-                # --- Tarea 2.3.3: Eliminar sesiones identificadas como rápidas ---
-                # Por defecto, eliminamos todas las sesiones identificadas con avg_page_view_time_seconds < 0.5s.
-                # Si se decide conservar algunas, esta lógica necesitaría ajustarse manualmente o con una lista de excepciones.
-                if session_ids_to_potentially_remove:
-                    rows_before_fast_session_removal = len(df_processed)
-                    df_processed_no_fast_sessions = df_processed[
-                        ~df_processed['SessionID'].isin(session_ids_to_potentially_remove)
-                    ].copy() # .copy() para evitar SettingWithCopyWarning más adelante
-                    rows_after_fast_session_removal = len(df_processed_no_fast_sessions)
-                    print(f"\nSe eliminaron {len(session_ids_to_potentially_remove)} sesiones consideradas demasiado rápidas.")
-                    print(f"Filas en el DataFrame antes de eliminar sesiones rápidas: {rows_before_fast_session_removal}")
-                    print(f"Filas en el DataFrame después de eliminar sesiones rápidas: {rows_after_fast_session_removal}")
-                    print(f"Número de filas eliminadas: {rows_before_fast_session_removal - rows_after_fast_session_removal}")
-                    
-                    # df_processed_no_fast_sessions será el DataFrame para análisis posteriores si se eliminaron sesiones.
-                    # Si no se eliminaron (o no había ninguna que eliminar), podemos seguir usando df_processed
-                    # o renombrar/reasignar para consistencia en las tareas siguientes.
-                    # Para claridad, vamos a usar df_current_for_analysis para las tareas que siguen este paso.
-                    df_current_for_analysis = df_processed_no_fast_sessions
-                    sessions_were_removed_in_2_3_3 = True
-                else:
-                    print("\nNo se eliminaron sesiones en el paso 2.3.3 (ninguna identificada o ninguna que cumpliera criterios de eliminación).")
-                    df_current_for_analysis = df_processed # Continuar con el DataFrame original
-                    sessions_were_removed_in_2_3_3 = False
-
-                # A partir de aquí, las tareas que dependan de este filtrado (ej. 2.3.4) 
-                # deberían usar df_current_for_analysis y la bandera sessions_were_removed_in_2_3_3.
-
-                # --- Tarea 2.3.4: Actualizar histogramas y estadísticas si se eliminaron sesiones ---
-                if sessions_were_removed_in_2_3_3:
-                    print("\n--- REGENERANDO ANÁLISIS DE 2.1 y 2.2 CON DATAFRAME FILTRADO (SIN SESIONES RÁPIDAS) ---")
-                    
-                    # --- Actualización para 2.1 (Duración de la sesión) ---
-                    print("\n--- Actualizando análisis de Duración de Sesión (2.1) ---")
-                    session_durations_seconds_filtered = calculate_session_durations(df_current_for_analysis)
-                    if not session_durations_seconds_filtered.empty:
-                        plot_session_duration_histogram(
-                            session_durations_seconds_filtered, 
-                            output_graphics_dir,
-                            filename="session_duration_histogram_after_2.3.3_filter.png"
-                        )
-                        get_session_duration_stats(
-                            session_durations_seconds_filtered, 
-                            output_graphics_dir,
-                            filename="session_duration_stats_after_2.3.3_filter.txt"
-                        )
-                    else:
-                        print("No hay duraciones de sesión para analizar después del filtro 2.3.3.")
-
-                    # --- Actualización para 2.2 (Tiempo medio por página) ---
-                    print("\n--- Actualizando análisis de Tiempo Medio por Página (2.2) ---")
-                    page_view_durations_seconds_filtered, mean_time_per_page_seconds_filtered = \
-                        calculate_mean_time_per_page(df_current_for_analysis)
-                    if mean_time_per_page_seconds_filtered is not None:
-                        plot_page_view_duration_histogram(
-                            page_view_durations_seconds_filtered,
-                            output_graphics_dir,
-                            filename="page_view_duration_histogram_after_2.3.3_filter.png"
-                        )
-                        get_page_view_duration_stats(
-                            page_view_durations_seconds_filtered,
-                            output_graphics_dir,
-                            filename="page_view_duration_stats_after_2.3.3_filter.txt"
-                        )
-                    else:
-                        print("No hay duraciones de visualización de página para analizar después del filtro 2.3.3.")
-                else:
-                    print("\nNo se eliminaron sesiones en 2.3.3, por lo que no es necesario actualizar los análisis de 2.1 y 2.2.")
-
-                # --- Tarea 2.4: Páginas visitadas ---
-                print("\n--- Iniciando análisis de Páginas Visitadas por Sesión (2.4) ---")
-                session_hit_counts = df_current_for_analysis.groupby('SessionID').size()
-                if not session_hit_counts.empty:
-                    plot_hits_per_session_histogram(session_hit_counts, output_graphics_dir)
-                    hits_per_session_stats_df = get_hits_per_session_stats(session_hit_counts, output_graphics_dir)
-                else:
-                    print("No hay datos de conteo de hits por sesión para generar el histograma o estadísticas.")
-
-                # --- Tarea 2.5: Relación entre visitas y duración ---
-                print("\n--- Iniciando análisis de Relación Visitas-Duración (2.5) ---")
-                # Determinar qué serie de duraciones de sesión usar
-                active_session_durations = pd.Series(dtype='float64')
-                if sessions_were_removed_in_2_3_3:
-                    # Recalcular session_durations basado en df_current_for_analysis si no se hizo ya de forma reutilizable
-                    # Asumimos que session_durations_seconds_filtered de 2.3.4 es la correcta
-                    # Necesitamos asegurar que está disponible o recalcularla aquí.
-                    # Por ahora, vamos a recalcularla para asegurar que es sobre df_current_for_analysis
-                    # y solo para sesiones > 1 hit.
-                    temp_session_durations = calculate_session_durations(df_current_for_analysis)
-                    if temp_session_durations is not None and not temp_session_durations.empty:
-                        active_session_durations = temp_session_durations
-                else:
-                    # Usar la original session_durations_seconds calculada en 2.1.2
-                    # Esta ya estaba basada en el df_processed (antes del filtro 2.3.3)
-                    # y era para sesiones > 1 hit.
-                    # Necesitamos que session_durations_seconds esté disponible en este scope.
-                    # La estructura actual la define dentro de un if. Rehacer ligeramente.
-                    if 'session_durations_seconds' in locals() and not session_durations_seconds.empty:
-                         active_session_durations = session_durations_seconds
-                    elif 'session_durations_seconds_filtered' in locals() and not session_durations_seconds_filtered.empty():
-                        # This case implies sessions_were_removed_in_2_3_3 was true, 
-                        # but we are in the else branch - this indicates a logic flaw, should use the filtered one
-                        # For safety, let's assume if sessions_were_removed_in_2_3_3 is false, we use original if available
-                        # else recalculate on df_current_for_analysis (which is df_processed here)
-                         active_session_durations = calculate_session_durations(df_current_for_analysis)
-                    else: # Fallback: recalculate if not available
-                        active_session_durations = calculate_session_durations(df_current_for_analysis)
-                
-                # session_hit_counts ya está calculado sobre df_current_for_analysis
-                if not active_session_durations.empty and not session_hit_counts.empty:
-                    # 2.5.1: Diagrama de dispersión
-                    scatter_data_for_regression = plot_hits_vs_duration_scatter(
-                        session_hit_counts, 
-                        active_session_durations, 
-                        output_graphics_dir
-                    )
-                    # scatter_data_for_regression (DataFrame con 'hits_per_session', 'duration_seconds') 
-                    # se usará para la regresión en 2.5.2
-                else:
-                    print("No se pueden generar datos para el diagrama de dispersión hits vs duración.")
-
-                # --- Tarea 2.6: Duración de la visita a las dos primeras páginas ---
-                print("\n--- Iniciando análisis de Duración de las Dos Primeras Páginas (2.6) ---")
-                first_page_durations, second_page_durations = calculate_first_second_page_durations(df_current_for_analysis)
-                
-                if not first_page_durations.empty:
-                    print(f"Se calcularon {len(first_page_durations)} duraciones para la primera página de sesiones.")
-                    plot_first_page_duration_histogram(first_page_durations, output_graphics_dir)
-                else:
-                    print("No se pudieron calcular duraciones para la primera página.")
-                
-                if not first_page_durations.empty or not second_page_durations.empty:
-                    get_first_second_page_duration_stats(
-                        first_page_durations, 
-                        second_page_durations, 
-                        output_graphics_dir
-                    )
-                else:
-                    print("No hay datos de duración de primera o segunda página para calcular estadísticas.")
-                
-                # --- Tarea 2.7: Determinación del tipo de página por su extensión ---
-                print("\n--- Iniciando análisis de Tipo de Página por Extensión (2.7) ---")
-                # Tarea 2.7.1: Implementar clasificación de páginas
-                df_current_for_analysis = classify_page_type(df_current_for_analysis)
-                
-                # Comprobación de que la columna PageType se ha añadido
-                if 'PageType' in df_current_for_analysis.columns:
-                    print("Columna 'PageType' añadida y DataFrame actualizado.")
-                    # print(df_current_for_analysis[['Página', 'PageType']].head().to_string()) # Keep this commented for cleaner output unless debugging
-                    
-                    # Tarea 2.7.2: Comparar duración media de primeras/segundas páginas por tipo
-                    # Asegurar que el directorio de tablas existe
-                    output_tables_dir = os.path.join(project_root, 'output', 'tables')
-                    output_tables_dir = os.path.normpath(output_tables_dir)
-                    if not os.path.exists(output_tables_dir):
-                        os.makedirs(output_tables_dir)
-                        print(f"Directorio para tablas creado: {output_tables_dir}")
-
-                    mean_first_by_type, mean_second_by_type = get_first_second_page_durations_by_type(
-                        df_current_for_analysis,
-                        output_tables_dir # Guardar el .txt en el directorio de tablas
-                    )
-                    # mean_first_by_type y mean_second_by_type contienen las series con las medias
-                    # que pueden usarse más adelante o para la memoria.
-                    
-                    # Tarea 2.7.3: Generar histogramas normalizados de duración por tipo
-                    plot_first_second_page_duration_histograms_by_type(
-                        df_current_for_analysis,
-                        output_graphics_dir # Guardar los gráficos en el directorio de análisis
-                    )
-                    
-                else:
-                    print("Error: La columna 'PageType' no se añadió al DataFrame. Omitiendo tarea 2.7.2 y siguientes.")
-
-                # La tarea 2.7.4 (discusión) se abordará en la memoria.
-
-                # --- Tarea 2.8: Análisis de datos (Tablas y Gráficos Adicionales) ---
-                print("\n--- Iniciando Sección 2.8: Análisis de Datos Adicionales ---")
-
-                # Tarea 2.8.1: Tabla: 20 dominios más repetidos
-                # Asegurar que el directorio de tablas existe (aunque ya debería por usos anteriores)
-                if not os.path.exists(output_tables_dir):
-                    os.makedirs(output_tables_dir)
-                    print(f"Directorio para tablas creado: {output_tables_dir}")
-                
-                top_domains_df = get_top_domains_by_hits_and_sessions(df_current_for_analysis, output_graphics_dir, top_n=20)
-                # if top_domains_df is not None:
-                #     print("\nTop 20 Dominios por Hits y Sesiones:")
-                #     print(top_domains_df.to_string())
-
-                # --- Tarea 2.8.2: Tabla (DataFrame): 7 tipos de dominio más repetidos ---
-                # Llamada a la nueva función
-                df_top_domain_types = get_top_domain_types(df_current_for_analysis, output_graphics_dir, top_n=7)
-                # La función get_top_domain_types ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.3: Gráfico de barras: longitud media de las visitas (sesiones) a lo largo de las 24 horas del día ---
-                plot_mean_session_duration_by_hour(df_current_for_analysis, output_graphics_dir)
-                # La función plot_mean_session_duration_by_hour ya guarda el gráfico.
-
-                # --- Tarea 2.8.4: Tabla (DataFrame): 10 visitantes ('UserID') más repetidos (por número de visitas/sesiones) ---
-                df_top_visitors = get_top_visitors_by_sessions(df_current_for_analysis, output_graphics_dir, top_n=10)
-                # La función get_top_visitors_by_sessions ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.5: Tabla (DataFrame): número de visitantes ('UserID') únicos, por número de visitas/sesiones que realizan (ej. cuántos usuarios tienen 1 sesión, cuántos tienen 2, ..., hasta 9) ---
-                df_visitor_dist = get_visitor_session_distribution(df_current_for_analysis, output_graphics_dir, max_sessions_to_detail=9)
-                # La función get_visitor_session_distribution ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.6: Tabla (DataFrame): 10 páginas más visitadas (por número de hits totales y por número de sesiones distintas en las que aparecen) ---
-                df_top_pages = get_top_pages_by_hits_and_sessions(df_current_for_analysis, output_graphics_dir, top_n=10)
-                # La función get_top_pages_by_hits_and_sessions ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.7: Tabla (DataFrame): 10 directorios más visitados ---
-                df_top_directories = get_top_directories_by_hits_and_sessions(df_current_for_analysis, output_graphics_dir, top_n=10)
-                # La función get_top_directories_by_hits_and_sessions ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.8: Tabla (DataFrame): 10 tipos de fichero más repetidos (por número de accesos/hits) ---
-                df_top_file_types = get_top_file_types_by_hits(df_current_for_analysis, output_graphics_dir, top_n=10)
-                # La función get_top_file_types_by_hits ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.9: Tabla (DataFrame): 10 páginas de entrada más repetidas ---
-                df_top_entry_pages = get_top_entry_pages(df_current_for_analysis, output_graphics_dir, top_n=10)
-                # La función get_top_entry_pages ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.10: Tabla (DataFrame): 10 páginas de salida más repetidas ---
-                df_top_exit_pages = get_top_exit_pages(df_current_for_analysis, output_graphics_dir, top_n=10)
-                # La función get_top_exit_pages ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.11: Tabla (DataFrame): 10 páginas de acceso único más visitadas ---
-                df_top_single_access = get_top_single_access_pages(df_current_for_analysis, output_graphics_dir, top_n=10)
-                # La función get_top_single_access_pages ya imprime y guarda la tabla.
-
-                # --- Tarea 2.8.12: Tabla (DataFrame): distribución de la duración de las visitas/sesiones en minutos ---
-                df_duration_dist_minutes = get_session_duration_distribution_minutes(df_current_for_analysis, output_graphics_dir)
-                # La función get_session_duration_distribution_minutes ya imprime y guarda la tabla.
-
-                # --- FIN de tareas de 2.8 --- 
-
-            else: # Corresponde a if not per_session_avg_page_time_df.empty:
-                print("\nNo se pudo calcular el tiempo medio por página por sesión (per_session_avg_page_time_df está vacío).")
-                print("Omitiendo tareas 2.3.2 en adelante, incluyendo 2.4, 2.5, 2.6 y 2.7.")
-        else: # Corresponde al if mean_time_per_page_seconds is not None:
-            print("\nNo se pudo calcular el tiempo medio por página por sesión (mean_time_per_page_seconds está None).")
-            print("Omitiendo tareas 2.3.2 en adelante, incluyendo 2.4, 2.5, 2.6 y 2.7.")
-
+        # Al salir del with se esperan los gráficos pendientes y se cierra el pool aunque el análisis falle
+        chart_renderer = ChartRenderer(max_workers=chart_render_workers) if chart_render_workers > 0 else nullcontext()
+        with chart_renderer as renderer:
+            analysis_graph = build_analysis_graph(
+                df_processed, user_dictionary, output_graphics_dir, output_tables_dir,
+                approximate_top_tables=approximate_top_tables, max_workers=analysis_workers, renderer=renderer,
+                scatter_render_mode=scatter_render_mode
+            )
+            analysis_graph.run()
+            analysis_graph.print_timings()
     else:
-        print("No se pudieron cargar los datos procesados. Terminando el script de análisis.") 
\ No newline at end of file
+        print("No se pudieron cargar los datos procesados. Terminando el script de análisis.")
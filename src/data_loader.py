@@ -1,17 +1,164 @@
 import pandas as pd
 import os
+import json
+import pyarrow as pa
+import pyarrow.parquet as pq
+from log_common import (
+    TIMESTAMP_REFERENCE, SESSION_COUNTER_BITS, PROCESSED_SCHEMA_VERSION, apply_processed_schema,
+    PARTITION_COLUMN, PARTITION_FORMATS
+)
 
-def load_processed_data(file_path: str) -> pd.DataFrame | None:
-    """Carga el DataFrame procesado desde un archivo Parquet."""
+def time_window_filters(start=None, end=None) -> list[tuple]:
+    """
+    Construye filtros para load_processed_data que seleccionan los hits con Fecha/Hora en [start, end).
+    start/end aceptan cualquier valor válido para pd.Timestamp; sin zona horaria se interpretan en UTC.
+    El filtro se aplica sobre 'marca de tiempo', por lo que no hace falta cargar las columnas de fecha.
+    """
+    filters = []
+    for bound, operator in [(start, '>='), (end, '<')]:
+        if bound is None:
+            continue
+        bound = pd.Timestamp(bound)
+        if bound.tzinfo is None:
+            bound = bound.tz_localize('UTC')
+        filters.append(('marca de tiempo', operator, (bound - TIMESTAMP_REFERENCE).total_seconds()))
+    return filters
+
+def _partition_filters(dataset_path: str, filters: list) -> list[tuple]:
+    """
+    Traduce los límites sobre 'marca de tiempo' de filters a un rango de claves de partición del
+    conjunto escrito por preprocessing.write_partitioned_dataset, para que el lector descarte
+    directorios completos fuera de la ventana temporal. Solo admite filtros en forma de lista de tuplas (AND).
+    """
+    if not filters or not all(isinstance(condition, tuple) for condition in filters):
+        return []
+    partition_keys = [
+        name.split('=', 1)[1] for name in os.listdir(dataset_path)
+        if name.startswith(PARTITION_COLUMN + '=') and name != f'{PARTITION_COLUMN}=desconocido'
+    ]
+    if not partition_keys:
+        return []
+    # La granularidad (día u hora) se deduce de la longitud de las claves existentes
+    key_format = next(
+        (fmt for fmt in PARTITION_FORMATS.values() if len(TIMESTAMP_REFERENCE.strftime(fmt)) == len(partition_keys[0])), None
+    )
+    if key_format is None:
+        return []
+    partition_filters = []
+    for column, operator, value in filters:
+        if column != 'marca de tiempo':
+            continue
+        partition_key = (TIMESTAMP_REFERENCE + pd.Timedelta(seconds=value)).strftime(key_format)
+        # La partición que contiene el límite se lee siempre; el filtro por fila hace el resto
+        if operator in ('>=', '>'):
+            partition_filters.append((PARTITION_COLUMN, '>=', partition_key))
+        elif operator in ('<', '<='):
+            partition_filters.append((PARTITION_COLUMN, '<=', partition_key))
+    return partition_filters
+
+# Clave de los metadatos de la caché Arrow con la firma del Parquet del que se generó
+CACHE_SIGNATURE_KEY = b'source_signature'
+
+def _source_signature(file_path: str) -> str:
+    """Firma del Parquet (o del conjunto particionado) de origen: ruta relativa, tamaño y mtime de cada fichero."""
+    if os.path.isdir(file_path):
+        paths = sorted(os.path.join(root, name) for root, _dirs, names in os.walk(file_path) for name in names)
+    else:
+        paths = [file_path]
+    entries = []
+    for path in paths:
+        stat = os.stat(path)
+        entries.append([os.path.relpath(path, file_path), stat.st_size, stat.st_mtime_ns])
+    return json.dumps(entries)
+
+def _load_arrow_cache(file_path: str) -> pa.Table:
+    """
+    Devuelve la tabla completa del Parquet desde una caché Arrow IPC (sin comprimir) junto a él,
+    abierta con memory-map: arrancar no requiere decodificar el Parquet y varios procesos comparten
+    las páginas a través de la caché del sistema operativo. La caché se regenera si la firma del
+    Parquet de origen (tamaño y fecha de modificación) no coincide con la guardada.
+    """
+    cache_path = file_path.rstrip(os.sep) + '.arrow'
+    # La firma se toma antes de leer: si el Parquet cambia durante la lectura, la siguiente carga lo detecta
+    signature = _source_signature(file_path).encode()
+    if os.path.exists(cache_path):
+        table = pa.ipc.open_file(pa.memory_map(cache_path)).read_all()
+        if (table.schema.metadata or {}).get(CACHE_SIGNATURE_KEY) == signature:
+            print(f"Usando la caché Arrow: {cache_path}")
+            return table
+        print(f"La caché Arrow {cache_path} no corresponde al Parquet actual; se regenera.")
+    table = pq.read_table(file_path)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), CACHE_SIGNATURE_KEY: signature})
+    tmp_cache_path = cache_path + '.tmp'
+    with pa.OSFile(tmp_cache_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_cache_path, cache_path)
+    print(f"Caché Arrow guardada en: {cache_path}")
+    return table
+
+def load_processed_data(file_path: str, columns: list[str] | None = None, filters: list | None = None, use_cache: bool = False) -> pd.DataFrame | None:
+    """
+    Carga el DataFrame procesado desde un archivo Parquet.
+    columns limita las columnas leídas y filters (formato de pyarrow, p.ej. [('Is_Bot', '==', False)]
+    o time_window_filters(...)) se aplica en el lector de Parquet, que descarta row groups
+    completos usando sus estadísticas antes de decodificarlos.
+    file_path puede ser también el directorio de un conjunto particionado por día u hora
+    (preprocessing.write_partitioned_dataset): entonces solo se leen las particiones que
+    solapan la ventana temporal de filters.
+    Con use_cache=True y sin filters los datos se leen de una caché Arrow memory-mapped (ver
+    _load_arrow_cache) y columns se aplica sobre ella. Con filters la caché no se usa: contiene el
+    conjunto completo y generarla o leerla anularía la poda de particiones y de row groups.
+    """
     print(f"Cargando datos procesados desde: {file_path}")
     if not os.path.exists(file_path):
         print(f"Error: El archivo {file_path} no fue encontrado. Asegúrate de ejecutar preprocessing.py primero.")
         return None
+    if use_cache and filters:
+        print("Hay filtros: se lee el Parquet directamente, sin la caché Arrow.")
+        use_cache = False
     try:
-        df = pd.read_parquet(file_path)
+        if use_cache:
+            table = _load_arrow_cache(file_path)
+            if columns is not None:
+                table = table.select(columns)
+            df = table.to_pandas()
+            # Igual que pd.read_parquet: los attrs (versión de esquema, orden) viajan en los metadatos
+            if b'PANDAS_ATTRS' in (table.schema.metadata or {}):
+                df.attrs = json.loads(table.schema.metadata[b'PANDAS_ATTRS'])
+        else:
+            if os.path.isdir(file_path):
+                filters = (filters or []) + _partition_filters(file_path, filters)
+            df = pd.read_parquet(file_path, columns=columns, filters=filters or None)
+        if PARTITION_COLUMN in df.columns and (columns is None or PARTITION_COLUMN not in columns):
+            df = df.drop(columns=PARTITION_COLUMN)
+        if df.attrs.get('schema_version') != PROCESSED_SCHEMA_VERSION:
+            print(f"Actualizando los tipos de columna al esquema versión {PROCESSED_SCHEMA_VERSION} (fichero con versión {df.attrs.get('schema_version')}).")
+            df = apply_processed_schema(df)
         print("Datos procesados cargados exitosamente.")
         df.info()
         return df
     except Exception as e:
         print(f"Error al cargar el archivo Parquet: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+def load_user_dictionary(file_path: str) -> pd.DataFrame | None:
+    """Carga el diccionario de usuarios (código 'UserID' -> 'Host remoto') generado por preprocessing.py."""
+    if not os.path.exists(file_path):
+        print(f"Advertencia: El diccionario de usuarios {file_path} no fue encontrado. Se mostrarán los códigos enteros.")
+        return None
+    try:
+        return pd.read_parquet(file_path)
+    except Exception as e:
+        print(f"Error al cargar el diccionario de usuarios: {e}")
+        return None
+
+def format_session_ids(session_ids: pd.Series, user_dictionary: pd.DataFrame) -> pd.Series:
+    """
+    Convierte SessionID enteros a etiquetas legibles 'host_n' (host del usuario y número de sesión),
+    el mismo formato que tenían los identificadores antes de codificarlos como enteros.
+    """
+    session_ids = session_ids.astype('int64')
+    user_codes = session_ids // (1 << SESSION_COUNTER_BITS)
+    session_counters = session_ids % (1 << SESSION_COUNTER_BITS)
+    hosts = user_codes.map(user_dictionary.set_index('UserID')['Host remoto'])
+    return hosts.astype(str) + "_" + session_counters.astype(str)
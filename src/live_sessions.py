@@ -0,0 +1,316 @@
+import argparse
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+import pandas as pd
+from log_common import parse_log_line, parse_clf_datetimes, extract_extension_from_page
+from streaming_stats import DurationSketch
+
+def _decode_lines(data: bytes) -> list[str]:
+    """Líneas de data con saltos de línea universales, como open(..., 'r'): '\\r\\n' y '\\r' también separan líneas."""
+    text = data.decode('utf-8', errors='ignore')
+    return text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+
+def follow(log_file_path: str, poll_interval: float = 1.0, from_start: bool = False, idle_timeout: float | None = None):
+    """
+    Sigue un fichero log que va creciendo (como tail -F) y genera listas con las líneas completas
+    añadidas desde la lectura anterior; genera una lista vacía en cada sondeo sin datos nuevos.
+    Una línea sin salto final se guarda hasta que se completa. Si el fichero se sustituye por otro
+    (rotación), como tail -F, primero se lee el anterior hasta el final (incluida su última línea,
+    aunque no tenga salto final) y después el nuevo desde el principio. Si se trunca, se vuelve a
+    leer desde el principio.
+
+    Args:
+        log_file_path (str): Ruta del fichero log.
+        poll_interval (float): Segundos entre sondeos cuando no hay datos nuevos.
+        from_start (bool): Si es True se leen también las líneas ya existentes; si no, solo las nuevas.
+        idle_timeout (float | None): Termina tras estos segundos seguidos sin datos nuevos (None: nunca).
+    """
+    f = open(log_file_path, 'rb')
+    try:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        pending = b''
+        last_data_time = time.monotonic()
+        while True:
+            data = f.read()
+            if data:
+                last_data_time = time.monotonic()
+                complete, newline, pending = (pending + data).rpartition(b'\n')
+                if newline:
+                    yield _decode_lines(complete)
+                    continue
+            if idle_timeout is not None and time.monotonic() - last_data_time >= idle_timeout:
+                break
+            yield []
+            time.sleep(poll_interval)
+
+            # Rotación o truncado: el fichero de la ruta ya no es el abierto o ha encogido
+            try:
+                stat = os.stat(log_file_path)
+            except FileNotFoundError:
+                continue
+            if stat.st_ino != os.fstat(f.fileno()).st_ino:
+                # Las líneas añadidas al fichero anterior entre la última lectura y la rotación no se pierden
+                complete, newline, last_line = (pending + f.read()).rpartition(b'\n')
+                f.close()
+                f = open(log_file_path, 'rb')
+                pending = b''
+                remaining_lines = _decode_lines(complete) if newline else []
+                if last_line:
+                    remaining_lines.append(last_line.decode('utf-8', errors='ignore'))
+                if remaining_lines:
+                    last_data_time = time.monotonic()
+                    yield remaining_lines
+            elif stat.st_size < f.tell():
+                f.seek(0)
+                pending = b''
+    finally:
+        f.close()
+
+class _OpenSession:
+    """Estado de una sesión abierta de un host en LiveSessionTracker."""
+    __slots__ = ('start_timestamp', 'end_timestamp', 'num_hits', 'entry_page', 'exit_page',
+                 'start_hour', 'page_view_time_sum', 'num_page_views')
+
+    def __init__(self, timestamp: float, page: str, hour: int):
+        self.start_timestamp = timestamp
+        self.end_timestamp = timestamp
+        self.num_hits = 1
+        self.entry_page = page
+        self.exit_page = page
+        self.start_hour = hour
+        self.page_view_time_sum = 0.0
+        self.num_page_views = 0
+
+class LiveSessionTracker:
+    """
+    Sesionización en tiempo real de hits que llegan en orden temporal, con la misma regla de
+    timeout que identify_sessions: un hit abre una sesión nueva del host si han pasado más de
+    timeout_seconds desde su hit anterior. Solo se guardan en memoria las sesiones abiertas,
+    en un OrderedDict por host ordenado por la última actividad. Una sesión se cierra cuando la
+    marca de tiempo más reciente vista (tiempo de evento) supera su último hit en más de
+    timeout_seconds, y al cerrarse se acumula en los contadores de las métricas de
+    session_analyzer.py (duraciones, hits por sesión, páginas de entrada/salida/acceso único).
+    Las duraciones de sesión (>1 hit) y los tiempos de visualización de página se resumen en
+    DurationSketch (session_durations, page_view_durations), que get_session_duration_stats y
+    get_page_view_duration_stats aceptan en lugar de las Series.
+    Con los hits en orden, las sesiones cerradas coinciden con las de build_session_summary.
+    """
+
+    def __init__(self, timeout_seconds: int = 1800, allowed_extensions: set[str] | None = None):
+        self.timeout_seconds = timeout_seconds
+        self.allowed_extensions = allowed_extensions
+        self.open_sessions = OrderedDict() # host -> _OpenSession, de menos a más reciente
+        self.watermark = None # Marca de tiempo más reciente vista
+
+        self.processed_lines = 0
+        self.skipped_lines = 0
+        self.filtered_hits = 0
+        self.num_sessions = 0
+        self.num_hits = 0
+        self.hits_per_session = Counter()
+        self.num_multi_hit_sessions = 0
+        self.session_durations = DurationSketch()
+        self.page_view_durations = DurationSketch()
+        self.entry_pages = Counter()
+        self.exit_pages = Counter()
+        self.single_access_pages = Counter()
+
+    def process_lines(self, lines) -> list[dict]:
+        """
+        Parsea un lote de líneas del log (parse_log_line) y las añade a las sesiones abiertas.
+        Las líneas vacías, las que no encajan con LOG_PATTERN y las de fecha no válida cuentan como omitidas;
+        los hits de extensiones no permitidas (si se indicó allowed_extensions) se descartan.
+        Devuelve las sesiones cerradas por el avance del tiempo (ver _close_session).
+        """
+        hosts, datetimes, pages = [], [], []
+        for line in lines:
+            self.processed_lines += 1
+            stripped_line = line.strip()
+            parsed_line_data = parse_log_line(stripped_line) if stripped_line else None
+            if parsed_line_data is None:
+                self.skipped_lines += 1
+                continue
+            page = parsed_line_data[3]
+            if self.allowed_extensions is not None:
+                extension = extract_extension_from_page(page)
+                if extension != "" and extension not in self.allowed_extensions:
+                    self.filtered_hits += 1
+                    continue
+            hosts.append(parsed_line_data[0])
+            datetimes.append(parsed_line_data[1])
+            pages.append(page)
+        if not hosts:
+            return []
+
+        parsed_datetimes, timestamps = parse_clf_datetimes(pd.Series(datetimes, dtype='str'))
+        hours = parsed_datetimes.dt.hour.tolist()
+        closed = []
+        for host, timestamp, page, hour in zip(hosts, timestamps.tolist(), pages, hours):
+            if math.isnan(timestamp): # Fecha no válida
+                self.skipped_lines += 1
+                continue
+            closed.extend(self.add_hit(host, timestamp, page, hour))
+        return closed
+
+    def add_hit(self, host: str, timestamp: float, page: str, hour: int) -> list[dict]:
+        """Añade un hit ya parseado. Devuelve las sesiones cerradas por el avance del tiempo."""
+        closed = []
+        if self.watermark is None or timestamp > self.watermark:
+            closed = self.expire(timestamp)
+
+        session = self.open_sessions.get(host)
+        if session is not None and timestamp - session.end_timestamp > self.timeout_seconds:
+            closed.append(self._close_session(host))
+            session = None
+        if session is None:
+            self.open_sessions[host] = _OpenSession(timestamp, page, hour)
+            return closed
+
+        # Tiempo de visualización de la página anterior: hasta este hit
+        page_view_time = timestamp - session.end_timestamp
+        if page_view_time >= 0:
+            session.page_view_time_sum += page_view_time
+            session.num_page_views += 1
+            self.page_view_durations.add(page_view_time)
+        if timestamp < session.start_timestamp: # Hit fuera de orden
+            session.start_timestamp = timestamp
+            session.entry_page = page
+            session.start_hour = hour
+        if timestamp > session.end_timestamp: # Con empates, la salida es el primer hit de la última marca
+            session.end_timestamp = timestamp
+            session.exit_page = page
+            # Solo si avanza su última actividad: expire() depende de que open_sessions siga ordenado por ella
+            self.open_sessions.move_to_end(host)
+        session.num_hits += 1
+        return closed
+
+    def expire(self, watermark: float) -> list[dict]:
+        """
+        Avanza el tiempo de evento hasta watermark y cierra las sesiones sin hits en más de
+        timeout_seconds. Sirve también para cerrar sesiones cuando el log deja de crecer.
+        """
+        if self.watermark is None or watermark > self.watermark:
+            self.watermark = watermark
+        closed = []
+        while self.open_sessions:
+            host, session = next(iter(self.open_sessions.items()))
+            if self.watermark - session.end_timestamp <= self.timeout_seconds:
+                break
+            closed.append(self._close_session(host))
+        return closed
+
+    def flush(self) -> list[dict]:
+        """Cierra todas las sesiones abiertas (p.ej. al terminar de leer un log completo)."""
+        return [self._close_session(host) for host in list(self.open_sessions)]
+
+    def _close_session(self, host: str) -> dict:
+        """Saca la sesión del host de las abiertas, la acumula en los contadores y la devuelve como dict."""
+        session = self.open_sessions.pop(host)
+        self.num_sessions += 1
+        self.num_hits += session.num_hits
+        self.hits_per_session[session.num_hits] += 1
+        self.entry_pages[session.entry_page] += 1
+        self.exit_pages[session.exit_page] += 1
+        if session.num_hits == 1:
+            self.single_access_pages[session.entry_page] += 1
+        else:
+            self.num_multi_hit_sessions += 1
+            self.session_durations.add(session.end_timestamp - session.start_timestamp)
+        return {
+            'host': host,
+            'start_timestamp': session.start_timestamp,
+            'end_timestamp': session.end_timestamp,
+            'num_hits': session.num_hits,
+            'entry_page': session.entry_page,
+            'exit_page': session.exit_page,
+            'start_hour': session.start_hour,
+            'mean_page_view_time': session.page_view_time_sum / session.num_page_views if session.num_page_views else float('nan'),
+            'num_page_views': session.num_page_views,
+        }
+
+    def summary(self, top_n: int = 10) -> dict:
+        """Métricas acumuladas de las sesiones cerradas (y número de sesiones aún abiertas)."""
+        durations = self.session_durations.describe()
+        page_view_durations = self.page_view_durations.describe()
+        return {
+            'lineas_procesadas': self.processed_lines,
+            'lineas_omitidas': self.skipped_lines,
+            'hits_filtrados': self.filtered_hits,
+            'sesiones_abiertas': len(self.open_sessions),
+            'sesiones_cerradas': self.num_sessions,
+            'hits_por_sesion_media': self.num_hits / self.num_sessions if self.num_sessions else float('nan'),
+            'hits_por_sesion_max': max(self.hits_per_session, default=0),
+            'sesiones_multi_hit': self.num_multi_hit_sessions,
+            'duracion_media': durations['mean'],
+            'duracion_min': durations['min'],
+            'duracion_mediana': durations['50%'],
+            'duracion_p75': durations['75%'],
+            'duracion_max': durations['max'],
+            'tiempo_vista_pagina_media': page_view_durations['mean'],
+            'tiempo_vista_pagina_mediana': page_view_durations['50%'],
+            'top_paginas_entrada': self.entry_pages.most_common(top_n),
+            'top_paginas_salida': self.exit_pages.most_common(top_n),
+            'top_paginas_acceso_unico': self.single_access_pages.most_common(top_n),
+        }
+
+def print_summary(tracker: LiveSessionTracker, top_n: int = 10) -> None:
+    """Muestra por pantalla el resumen de LiveSessionTracker.summary."""
+    print("\n--- Resumen de sesiones en vivo ---")
+    for key, value in tracker.summary(top_n).items():
+        if isinstance(value, list):
+            print(f"{key}:")
+            for page, count in value:
+                print(f"    {count:>8}  {page}")
+        elif isinstance(value, float):
+            print(f"{key}: {value:.2f}")
+        else:
+            print(f"{key}: {value}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sesioniza en tiempo real un log de acceso que va creciendo.")
+    parser.add_argument("log", help="Ruta del fichero log a seguir.")
+    parser.add_argument("--timeout", type=int, default=1800, help="Timeout de inactividad entre sesiones (segundos).")
+    parser.add_argument("--from-start", action="store_true", help="Procesar también las líneas ya existentes.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Segundos entre sondeos sin datos nuevos.")
+    parser.add_argument("--report-interval", type=float, default=60.0, help="Segundos entre resúmenes por pantalla.")
+    parser.add_argument("--idle-exit", type=float, default=None,
+                        help="Terminar tras estos segundos sin datos nuevos, cerrando las sesiones abiertas.")
+    parser.add_argument("--extensions", default=None,
+                        help="Extensiones permitidas separadas por comas (p.ej. html,htm,txt); por defecto todas.")
+    parser.add_argument("--print-sessions", action="store_true", help="Mostrar cada sesión al cerrarse.")
+    parser.add_argument("--top", type=int, default=10, help="Número de páginas en los rankings del resumen.")
+    args = parser.parse_args()
+
+    allowed_extensions = set(args.extensions.split(',')) if args.extensions else None
+    tracker = LiveSessionTracker(timeout_seconds=args.timeout, allowed_extensions=allowed_extensions)
+    print(f"Siguiendo {args.log} (timeout de sesión {args.timeout} s). Ctrl+C para terminar.")
+    last_report = time.monotonic()
+    last_data_time = time.monotonic()
+    try:
+        for lines in follow(args.log, poll_interval=args.poll_interval, from_start=args.from_start, idle_timeout=args.idle_exit):
+            if lines:
+                closed = tracker.process_lines(lines)
+                last_data_time = time.monotonic()
+            elif tracker.watermark is not None:
+                # Sin datos nuevos el tiempo de evento avanza con el reloj desde el último dato
+                now = time.monotonic()
+                closed = tracker.expire(tracker.watermark + (now - last_data_time))
+                last_data_time = now
+            else:
+                closed = []
+            if args.print_sessions:
+                for session in closed:
+                    print(session)
+            if time.monotonic() - last_report >= args.report_interval:
+                print_summary(tracker, args.top)
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        print("\nInterrumpido por el usuario.")
+    closed = tracker.flush()
+    if args.print_sessions:
+        for session in closed:
+            print(session)
+    print_summary(tracker, args.top)
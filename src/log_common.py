@@ -0,0 +1,230 @@
+import re
+import os
+import numpy as np
+import pandas as pd
+
+# Formato del log y del conjunto de datos procesado compartido por preprocessing.py (que lo genera)
+# y por los módulos de análisis y de sesiones en vivo (que lo leen), sin depender del script de
+# preprocesamiento.
+
+# Regex to parse a single log line based on Combined Log Format.
+# Fields captured: host, datetime, method, page, protocol, status, size
+LOG_PATTERN = re.compile(
+    r'^(?P<host>\S+)\s+'                               # Host remoto
+    r'-\s+-\s+'                                     # ident and user fields (always "-", not captured)
+    r'\[(?P<datetime>[^\]]+)\]\s+'                     # Fecha/Hora (e.g., 01/Jul/1995:00:00:01 -0400)
+    r'"(?P<method>GET|POST|HEAD|PUT|DELETE|OPTIONS|PATCH)\s+'  # Método HTTP
+    r'(?P<page>\S+)\s+'                                # Página (Requested resource path)
+    r'(?P<protocol>HTTP\/\d\.\d)"\s+'                  # Protocolo HTTP (e.g., HTTP/1.0)
+    r'(?P<status>\d{3})\s+'                            # Resultado (HTTP status code)
+    r'(?P<size>\S+)$'                                  # Tamaño (Size of object in bytes, can be '-')
+)
+
+# Column names as specified in TODO.md (updated)
+COLUMN_NAMES = [
+    'Host remoto', 'Fecha/Hora',
+    'Método', 'Página', 'Protocolo', 'Resultado', 'Tamaño'
+]
+
+def map_unique_values(values: pd.Series, func) -> pd.Series:
+    """
+    Equivalente a values.apply(func) pero llamando a func una sola vez por valor distinto
+    (factorize + indexado): hay millones de hits pero solo decenas de miles de páginas y hosts.
+    Los valores nulos se pasan a func como cualquier otro valor.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    mapped_uniques = pd.Series([func(value) for value in uniques])
+    return pd.Series(mapped_uniques.to_numpy()[codes], index=values.index, name=values.name, dtype=mapped_uniques.dtype)
+
+def extract_extension_from_page(page_path: str) -> str:
+    """
+    Extrae la extensión de un path de página. Devuelve la extensión en minúsculas
+    sin el punto inicial, o una cadena vacía si no hay extensión o es inválida.
+    Ej: '/path/file.HTML' -> 'html'; '/path/' -> ''; '/path/nodot' -> ''.
+    """
+    if pd.isna(page_path):
+        return ""
+    # os.path.splitext devuelve ('root', '.ext') o ('root', '')
+    _root, ext = os.path.splitext(str(page_path))
+    if ext.startswith('.'):
+        return ext[1:].lower() # Eliminar el punto inicial y convertir a minúsculas
+    return "" # Si no hay punto (ext es '') o es una extensión vacía rara.
+
+def parse_log_line(line: str) -> list | None:
+    """
+    Parses a single log line using the precompiled regex LOG_PATTERN.
+    Returns a list of captured string values in the order of COLUMN_NAMES, 
+    or None if the line does not match the pattern.
+    """
+    match = LOG_PATTERN.match(line)
+    if match:
+        parts = match.groupdict()
+        # Ensure the order matches COLUMN_NAMES (updated)
+        return [parts['host'], parts['datetime'],
+                parts['method'], parts['page'], parts['protocol'],
+                parts['status'], parts['size']]
+    return None
+
+# Formato fijo del campo Fecha/Hora en el log (p.ej. 01/Jul/1995:00:00:01 -0400)
+CLF_DATETIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+_CLF_DATETIME_LENGTH = 26
+_CLF_DIGIT_POSITIONS = [0, 1, 7, 8, 9, 10, 12, 13, 15, 16, 18, 19, 22, 23, 24, 25]
+_CLF_SEPARATORS = {2: '/', 6: '/', 11: ':', 14: ':', 17: ':', 20: ' '}
+_MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+# Clave numérica de cada mes (sus tres caracteres) para la búsqueda vectorizada
+_MONTH_KEYS = np.array([ord(m[0]) << 16 | ord(m[1]) << 8 | ord(m[2]) for m in _MONTH_NAMES])
+_MONTH_KEY_ORDER = np.argsort(_MONTH_KEYS)
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+# Referencia de 'marca de tiempo' (1995-01-01 00:00:00 UTC) y segundos entre el epoch Unix y ella
+TIMESTAMP_REFERENCE = pd.Timestamp('1995-01-01', tz='UTC')
+REFERENCE_EPOCH_SECONDS = 788918400
+
+def _days_from_civil(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """Número de días desde 1970-01-01 para fechas del calendario gregoriano (vectorizado)."""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def parse_clf_datetimes(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Convierte el campo 'Fecha/Hora' (formato fijo 01/Jul/1995:00:00:01 -0400) a datetime con
+    zona horaria y a segundos desde 1995-01-01 UTC, en una sola pasada vectorizada.
+    Cada cadena distinta se convierte una sola vez (muchos hits comparten el mismo segundo)
+    y el resultado se reparte a todas las filas. Las cadenas que no siguen el formato fijo
+    se delegan en pd.to_datetime, por lo que el resultado coincide con el de
+    pd.to_datetime(..., format=CLF_DATETIME_FORMAT, errors='coerce').
+
+    Returns:
+        tuple[pd.Series, pd.Series]: (datetimes con zona horaria, 'marca de tiempo' en segundos float64).
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=str)
+    candidates = np.flatnonzero(np.char.str_len(uniques) == _CLF_DATETIME_LENGTH)
+
+    # Matriz (n, 26) con el código de cada carácter: cada campo está en una posición fija
+    chars = uniques[candidates].astype(f'U{_CLF_DATETIME_LENGTH}').view(np.uint32)
+    chars = chars.reshape(-1, _CLF_DATETIME_LENGTH).astype(np.int64)
+    digits = chars - ord('0')
+    def field(start, end):
+        result = np.zeros(len(chars), dtype=np.int64)
+        for pos in range(start, end):
+            result = result * 10 + digits[:, pos]
+        return result
+
+    valid = ((digits[:, _CLF_DIGIT_POSITIONS] >= 0) & (digits[:, _CLF_DIGIT_POSITIONS] <= 9)).all(axis=1)
+    for pos, separator in _CLF_SEPARATORS.items():
+        valid &= chars[:, pos] == ord(separator)
+    valid &= (chars[:, 21] == ord('+')) | (chars[:, 21] == ord('-'))
+    month_keys = chars[:, 3] << 16 | chars[:, 4] << 8 | chars[:, 5]
+    month_slot = np.minimum(np.searchsorted(_MONTH_KEYS[_MONTH_KEY_ORDER], month_keys), 11)
+    month_index = _MONTH_KEY_ORDER[month_slot]
+    valid &= _MONTH_KEYS[month_index] == month_keys
+    month = month_index + 1
+
+    day, year = field(0, 2), field(7, 11)
+    hour, minute, second = field(12, 14), field(15, 17), field(18, 20)
+    offset_seconds = np.where(chars[:, 21] == ord('-'), -1, 1) * (field(22, 24) * 3600 + field(24, 26) * 60)
+    # Las fechas fuera de rango (p.ej. 31/Jun) también se delegan en pd.to_datetime
+    leap = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+    days_in_month = _DAYS_IN_MONTH[month] + ((month == 2) & leap)
+    valid &= (day >= 1) & (day <= days_in_month) & (hour < 24) & (minute < 60) & (second < 60)
+
+    fast_positions = candidates[valid]
+    fast_offsets = np.unique(offset_seconds[valid])
+    if len(fast_offsets) != 1:
+        # Sin filas de formato fijo o con varias zonas horarias: se conserva el comportamiento de pd.to_datetime
+        datetimes = pd.to_datetime(values, format=CLF_DATETIME_FORMAT, errors='coerce')
+        if isinstance(datetimes.dtype, pd.DatetimeTZDtype):
+            marca = (datetimes.dt.tz_convert('UTC') - pd.Timestamp("1995-01-01 00:00:00", tz='UTC')).dt.total_seconds()
+        else:
+            marca = pd.Series(np.nan, index=values.index)
+        return datetimes, marca
+
+    epoch_seconds = np.full(len(uniques), np.nan)
+    epoch_seconds[fast_positions] = (
+        _days_from_civil(year[valid], month[valid], day[valid]) * 86400
+        + hour[valid] * 3600 + minute[valid] * 60 + second[valid]
+        - offset_seconds[valid]
+    )
+    is_slow = np.ones(len(uniques), dtype=bool)
+    is_slow[fast_positions] = False
+    if is_slow.any():
+        slow = pd.to_datetime(pd.Series(uniques[is_slow]), format=CLF_DATETIME_FORMAT, errors='coerce', utc=True)
+        epoch_seconds[is_slow] = (slow - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy()
+
+    # Tipo (zona horaria y resolución) igual al que devuelve pd.to_datetime para este formato
+    target_dtype = pd.to_datetime(pd.Series(uniques[fast_positions[:1]]), format=CLF_DATETIME_FORMAT).dtype
+    row_seconds = np.where(codes >= 0, epoch_seconds[codes], np.nan)
+    utc_values = pd.to_datetime(row_seconds, unit='s', utc=True)
+    datetimes = pd.Series(utc_values, index=values.index).dt.tz_convert(target_dtype.tz).astype(target_dtype)
+    marca = pd.Series(row_seconds - REFERENCE_EPOCH_SECONDS, index=values.index)
+    return datetimes, marca
+
+# Un SessionID entero guarda el código de usuario en los bits altos y el contador de sesión
+# del usuario en los SESSION_COUNTER_BITS bits bajos
+SESSION_COUNTER_BITS = 32
+
+# Orden de los hits que dejan identify_sessions/identify_sessions_incremental. Se anota en
+# df.attrs['sort_order'] (pandas lo guarda en los metadatos del Parquet) para que los análisis
+# no tengan que volver a ordenar millones de filas.
+SESSION_SORT_ORDER = ['SessionID', 'marca de tiempo']
+
+def _is_sorted_by_session_time(df: pd.DataFrame) -> bool:
+    """Comprueba en O(n) que df está ordenado por SessionID y, dentro de cada sesión, por marca de tiempo (NaN al final)."""
+    session_ids = df['SessionID'].to_numpy()
+    timestamps = df['marca de tiempo'].to_numpy(dtype='float64')
+    if len(df) < 2:
+        return True
+    if not (session_ids[1:] >= session_ids[:-1]).all():
+        return False
+    same_session = session_ids[1:] == session_ids[:-1]
+    next_timestamps = timestamps[1:]
+    in_order = (next_timestamps >= timestamps[:-1]) | np.isnan(next_timestamps)
+    return bool(in_order[same_session].all())
+
+def sort_by_session_time(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Devuelve los hits ordenados por SESSION_SORT_ORDER, igual que df.sort_values(by=SESSION_SORT_ORDER).
+    Si df.attrs indica que ya lo están (y la comprobación lineal lo confirma) se evita la ordenación
+    y se devuelve una copia superficial, de modo que añadir columnas no modifica el DataFrame original.
+    """
+    if df.attrs.get('sort_order') == SESSION_SORT_ORDER and _is_sorted_by_session_time(df):
+        return df.copy(deep=False)
+    df_sorted = df.sort_values(by=SESSION_SORT_ORDER, kind='stable')
+    df_sorted.attrs['sort_order'] = list(SESSION_SORT_ORDER)
+    return df_sorted
+
+# Esquema del conjunto de datos procesado (processed_log_data.parquet). Las columnas de texto
+# con pocos valores distintos se guardan como categóricas (diccionario en Parquet) en lugar de
+# millones de cadenas; 'Resultado' es siempre un código de 3 dígitos y 'Tamaño' (bytes) es exacto
+# en float32 hasta 16 MB. La versión se guarda en df.attrs['schema_version'] para que
+# data_loader.load_processed_data actualice ficheros generados con un esquema anterior.
+PROCESSED_SCHEMA_VERSION = 1
+PROCESSED_SCHEMA = {
+    'Host remoto': 'category',
+    'Método': 'category',
+    'Página': 'category',
+    'Protocolo': 'category',
+    'Extensión': 'category',
+    'Resultado': 'int16',
+    'Tamaño': 'float32',
+    'marca de tiempo': 'float64',
+    'UserID': 'int32',
+    'SessionID': 'int64',
+}
+
+def apply_processed_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte las columnas presentes en df a los tipos de PROCESSED_SCHEMA y anota la versión del esquema."""
+    conversions = {col: dtype for col, dtype in PROCESSED_SCHEMA.items() if col in df.columns and df[col].dtype != dtype}
+    df_out = df.astype(conversions)
+    df_out.attrs['schema_version'] = PROCESSED_SCHEMA_VERSION
+    return df_out
+
+# Conjunto procesado particionado al estilo Hive (<directorio>/periodo=<clave>/...) por día u hora UTC
+# de 'Fecha/Hora'. Las claves son cadenas que se ordenan igual que el tiempo, de modo que una ventana
+# temporal se traduce en un rango de claves y el lector solo abre los directorios que la solapan.
+PARTITION_COLUMN = 'periodo'
+PARTITION_FORMATS = {'day': '%Y-%m-%d', 'hour': '%Y-%m-%dT%H'}
@@ -1,11 +1,10 @@
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np # Added for potential use with NaN or specific conditions
-
-# Configuración de Seaborn para los gráficos (si es específico o global)
-# sns.set_theme(style="whitegrid") # Puede ser global en el main script
+from log_common import sort_by_session_time, map_unique_values
+from streaming_stats import TopKeySketch, DurationSketch
+from chart_rendering import ChartRenderer, render_chart, bin_histogram_and_kde, save_binned_arrays, draw_histogram
 
 def _extract_extension(page_path: str) -> str:
     """
@@ -32,7 +31,7 @@ def classify_page_type(df: pd.DataFrame) -> pd.DataFrame:
         print("Error: La columna 'Página' no existe en el DataFrame.")
         df['PageType'] = "desconocido"
         return df
-    df['extension'] = df['Página'].astype(str).apply(_extract_extension)
+    df['extension'] = map_unique_values(df['Página'], _extract_extension)
     df['PageType'] = np.where(df['extension'] == '', 'navegación', 'contenido')
     print(f"Tipos de página clasificados. Distribución:\n{df['PageType'].value_counts(normalize=True)}")
     return df
@@ -43,7 +42,7 @@ def calculate_mean_time_per_page(df: pd.DataFrame) -> tuple[pd.Series, float | N
     y luego el tiempo medio por página.
     """
     print("\nCalculando el tiempo medio por página...")
-    df_sorted = df.sort_values(by=['SessionID', 'marca de tiempo'])
+    df_sorted = sort_by_session_time(df)
     df_sorted['page_view_duration'] = df_sorted.groupby('SessionID')['marca de tiempo'].diff().shift(-1)
     all_page_view_durations = df_sorted['page_view_duration'].dropna()
     all_page_view_durations = all_page_view_durations[all_page_view_durations >= 0]
@@ -55,14 +54,37 @@ def calculate_mean_time_per_page(df: pd.DataFrame) -> tuple[pd.Series, float | N
     print(f"Tiempo medio por página (excluyendo la última de cada sesión): {mean_time_per_page:.2f} segundos.")
     return all_page_view_durations, mean_time_per_page
 
+def _render_page_view_duration_histogram(durations_to_plot: pd.Series | dict, title_note: str, file_path: str) -> None:
+    """
+    Dibuja y guarda el histograma de plot_page_view_duration_histogram (se puede ejecutar en un ChartRenderer)
+    a partir de las duraciones o de sus arrays de bin_histogram_and_kde.
+    """
+    plt.figure(figsize=(12, 7))
+    draw_histogram(durations_to_plot)
+    plt.title(f'Histograma de Tiempos de Visualización de Página\n{title_note}')
+    plt.xlabel("Tiempo de Visualización de Página (segundos)")
+    plt.ylabel("Número de Vistas de Página")
+    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+    try:
+        plt.savefig(file_path)
+        print(f"Histograma de tiempo de visualización de página guardado en: {file_path}")
+    except Exception as e:
+        print(f"Error al guardar el histograma: {e}")
+    plt.close()
+
 def plot_page_view_duration_histogram(
     page_view_durations_seconds: pd.Series,
     output_dir: str,
     filename: str = "page_view_duration_histogram.png",
-    threshold_percentile: float | None = 0.99
+    threshold_percentile: float | None = 0.99,
+    renderer: ChartRenderer | None = None,
+    binned: bool = True
 ) -> None:
     """
     Genera y guarda un histograma de las duraciones de visualización de página individuales.
+    Con binned=True el histograma y su KDE se calculan una vez con bin_histogram_and_kde (guardados
+    en un .npz junto al PNG) y el gráfico se dibuja a partir de esos arrays.
+    Con renderer el gráfico se dibuja en su pool de procesos (ver chart_rendering.py).
     """
     if page_view_durations_seconds.empty:
         print("No hay duraciones de visualización de página para generar el histograma.")
@@ -89,32 +111,27 @@ def plot_page_view_duration_histogram(
     else:
         description_for_memoria = "No se aplicó filtrado de valores atípicos para este histograma."
     print(description_for_memoria)
-    plt.figure(figsize=(12, 7))
-    sns.histplot(durations_to_plot, kde=True, bins='auto')
-    title_note = description_for_memoria.split(". ")[0]
-    plt.title(f'Histograma de Tiempos de Visualización de Página\n{title_note}')
-    plt.xlabel("Tiempo de Visualización de Página (segundos)")
-    plt.ylabel("Número de Vistas de Página")
-    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
     file_path = os.path.join(output_dir, filename)
-    try:
-        plt.savefig(file_path)
-        print(f"Histograma de tiempo de visualización de página guardado en: {file_path}")
-    except Exception as e:
-        print(f"Error al guardar el histograma: {e}")
-    plt.close()
+    if binned:
+        durations_to_plot = bin_histogram_and_kde(durations_to_plot)
+        save_binned_arrays(file_path, durations_to_plot)
+    render_chart(
+        _render_page_view_duration_histogram, durations_to_plot, description_for_memoria.split(". ")[0],
+        file_path, renderer=renderer
+    )
     memoria_notes_path = os.path.join(output_dir, filename.replace('.png', '_notes.txt'))
     with open(memoria_notes_path, "w") as f:
         f.write(description_for_memoria)
     print(f"Notas para la memoria (histograma tiempo por página) guardadas en: {memoria_notes_path}")
 
 def get_page_view_duration_stats(
-    page_view_durations_seconds: pd.Series,
+    page_view_durations_seconds: pd.Series | DurationSketch,
     output_dir: str,
     filename: str = "page_view_duration_stats.txt"
 ) -> pd.DataFrame | None:
     """
     Calcula y guarda un resumen estadístico de las duraciones de visualización de página.
+    Acepta un DurationSketch en lugar de la Serie (percentiles y moda aproximados).
     """
     if page_view_durations_seconds.empty:
         print("No hay duraciones de visualización de página para calcular estadísticas.")
@@ -164,33 +181,54 @@ def calculate_first_second_page_durations(df: pd.DataFrame) -> tuple[pd.Series,
     if 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns:
         print("Error: Se requieren las columnas 'SessionID' y 'marca de tiempo'.")
         return pd.Series(dtype='float64'), pd.Series(dtype='float64')
-    df_sorted = df.sort_values(by=['SessionID', 'marca de tiempo'])
-    first_page_durs = []
-    second_page_durs = []
-    for session_id, group in df_sorted.groupby('SessionID'):
-        timestamps = group['marca de tiempo'].tolist()
-        if len(timestamps) >= 2:
-            duration_first_page = timestamps[1] - timestamps[0]
-            if duration_first_page >= 0:
-                first_page_durs.append(duration_first_page)
-        if len(timestamps) >= 3:
-            duration_second_page = timestamps[2] - timestamps[1]
-            if duration_second_page >= 0:
-                second_page_durs.append(duration_second_page)
-    s_first_page_durations = pd.Series(first_page_durs, dtype='float64')
-    s_second_page_durations = pd.Series(second_page_durs, dtype='float64')
+    df_sorted = sort_by_session_time(df)
+    session_ids = df_sorted['SessionID'].to_numpy()
+    timestamps = df_sorted['marca de tiempo'].to_numpy(dtype='float64')
+    # Posición del primer hit de cada sesión en el array ordenado y número de hits de cada una
+    starts = np.flatnonzero(np.r_[True, session_ids[1:] != session_ids[:-1]])
+    session_sizes = np.diff(np.r_[starts, len(session_ids)])
+    first_page_starts = starts[session_sizes >= 2]
+    first_page_durs = timestamps[first_page_starts + 1] - timestamps[first_page_starts]
+    second_page_starts = starts[session_sizes >= 3]
+    second_page_durs = timestamps[second_page_starts + 2] - timestamps[second_page_starts + 1]
+    # Las duraciones negativas (o NaN) se descartan
+    s_first_page_durations = pd.Series(first_page_durs[first_page_durs >= 0], dtype='float64')
+    s_second_page_durations = pd.Series(second_page_durs[second_page_durs >= 0], dtype='float64')
     print(f"Calculadas {len(s_first_page_durations)} duraciones para primeras páginas.")
     print(f"Calculadas {len(s_second_page_durations)} duraciones para segundas páginas.")
     return s_first_page_durations, s_second_page_durations
 
+def _render_first_page_duration_histogram(durations_to_plot: pd.Series | dict, title_note: str, file_path: str) -> None:
+    """
+    Dibuja y guarda el histograma de plot_first_page_duration_histogram (se puede ejecutar en un ChartRenderer)
+    a partir de las duraciones o de sus arrays de bin_histogram_and_kde.
+    """
+    plt.figure(figsize=(12, 7))
+    draw_histogram(durations_to_plot)
+    plt.title(f'Histograma de Duración de la Primera Página en Sesiones\n{title_note}')
+    plt.xlabel("Duración de la Primera Página (segundos)")
+    plt.ylabel("Número de Sesiones")
+    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+    try:
+        plt.savefig(file_path)
+        print(f"Histograma de duración de primera página guardado en: {file_path}")
+    except Exception as e:
+        print(f"Error al guardar el histograma: {e}")
+    plt.close()
+
 def plot_first_page_duration_histogram(
     first_page_durations_seconds: pd.Series,
     output_dir: str,
     filename: str = "first_page_duration_histogram.png",
-    threshold_percentile: float | None = 0.99
+    threshold_percentile: float | None = 0.99,
+    renderer: ChartRenderer | None = None,
+    binned: bool = True
 ) -> None:
     """
     Genera y guarda un histograma de las duraciones de la primera página de las sesiones.
+    Con binned=True el histograma y su KDE se calculan una vez con bin_histogram_and_kde (guardados
+    en un .npz junto al PNG) y el gráfico se dibuja a partir de esos arrays.
+    Con renderer el gráfico se dibuja en su pool de procesos (ver chart_rendering.py).
     """
     if first_page_durations_seconds.empty:
         print("No hay duraciones de primera página para generar el histograma.")
@@ -217,33 +255,28 @@ def plot_first_page_duration_histogram(
     else:
         description_for_memoria = "No se aplicó filtrado de valores atípicos para este histograma."
     print(description_for_memoria)
-    plt.figure(figsize=(12, 7))
-    sns.histplot(durations_to_plot, kde=True, bins='auto')
-    title_note = description_for_memoria.split(". ")[0]
-    plt.title(f'Histograma de Duración de la Primera Página en Sesiones\n{title_note}')
-    plt.xlabel("Duración de la Primera Página (segundos)")
-    plt.ylabel("Número de Sesiones")
-    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
     file_path = os.path.join(output_dir, filename)
-    try:
-        plt.savefig(file_path)
-        print(f"Histograma de duración de primera página guardado en: {file_path}")
-    except Exception as e:
-        print(f"Error al guardar el histograma: {e}")
-    plt.close()
+    if binned:
+        durations_to_plot = bin_histogram_and_kde(durations_to_plot)
+        save_binned_arrays(file_path, durations_to_plot)
+    render_chart(
+        _render_first_page_duration_histogram, durations_to_plot, description_for_memoria.split(". ")[0],
+        file_path, renderer=renderer
+    )
     memoria_notes_path = os.path.join(output_dir, filename.replace('.png', '_notes.txt'))
     with open(memoria_notes_path, "w") as f:
         f.write(description_for_memoria)
     print(f"Notas para la memoria (histograma duración primera página) guardadas en: {memoria_notes_path}")
 
 def get_first_second_page_duration_stats(
-    first_page_durations: pd.Series,
-    second_page_durations: pd.Series,
+    first_page_durations: pd.Series | DurationSketch,
+    second_page_durations: pd.Series | DurationSketch,
     output_dir: str,
     filename: str = "first_second_page_duration_stats.txt"
 ) -> tuple[pd.DataFrame | None, pd.DataFrame | None]:
     """
     Calcula y guarda estadísticas para las duraciones de la primera y segunda página.
+    Acepta DurationSketch en lugar de las Series (percentiles y moda aproximados).
     """
     print("\nCalculando estadísticas para las duraciones de la primera y segunda página...")
     output_text_content = ""
@@ -300,7 +333,7 @@ def get_first_second_page_durations_by_type(df: pd.DataFrame, output_dir: str, f
     if df['PageType'].isnull().all():
         print("Error: La columna 'PageType' está vacía o solo contiene NaNs.")
         return None, None
-    df_sorted = df.sort_values(by=['SessionID', 'marca de tiempo'])
+    df_sorted = sort_by_session_time(df)
     df_sorted['next_timestamp_in_session'] = df_sorted.groupby('SessionID')['marca de tiempo'].shift(-1)
     df_sorted['first_page_duration'] = df_sorted['next_timestamp_in_session'] - df_sorted['marca de tiempo']
     first_pages_df = df_sorted.groupby('SessionID').first().reset_index()
@@ -337,16 +370,49 @@ def get_first_second_page_durations_by_type(df: pd.DataFrame, output_dir: str, f
         print(f"Error al guardar las estadísticas por tipo: {e}")
     return all_stats_dfs.get("Primera Página"), all_stats_dfs.get("Segunda Página")
 
+# Etiqueta, color y prefijo de sus arrays en el .npz de cada tipo de página en los histogramas por tipo
+_PAGE_TYPE_HISTOGRAM_STYLES = {
+    'navegación': ('Navegación', 'skyblue', 'navegacion_'),
+    'contenido': ('Contenido', 'orange', 'contenido_'),
+}
+
+def _render_normalized_duration_histogram_by_type(
+    durations_by_type: dict, page_description: str, title_note: str, file_path: str
+) -> None:
+    """
+    Dibuja y guarda el histograma de _plot_normalized_duration_histogram_by_type (se puede ejecutar en un
+    ChartRenderer). durations_by_type asigna a cada tipo de página sus duraciones o sus arrays de bin_histogram_and_kde.
+    """
+    plt.figure(figsize=(12, 7))
+    for page_type, durations in durations_by_type.items():
+        label, color, _ = _PAGE_TYPE_HISTOGRAM_STYLES[page_type]
+        draw_histogram(durations, stat="density", color=color, label=label)
+    plt.title(f'Histograma Normalizado de Duración de {page_description}\nPor Tipo de Página (Navegación vs. Contenido)\n{title_note}')
+    plt.xlabel("Duración de la Página (segundos)")
+    plt.ylabel("Densidad")
+    plt.legend()
+    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+    try:
+        plt.savefig(file_path)
+        print(f"Histograma normalizado de duración ({page_description.lower()}) por tipo guardado en: {file_path}")
+    except Exception as e:
+        print(f"Error al guardar el histograma: {e}")
+    plt.close()
+
 def _plot_normalized_duration_histogram_by_type(
     durations_df: pd.DataFrame, 
     page_description: str, 
     output_dir: str,
     filename: str,
-    threshold_percentile: float | None = 0.99
+    threshold_percentile: float | None = 0.99,
+    renderer: ChartRenderer | None = None,
+    binned: bool = True
 ):
     """
     Helper para generar histogramas normalizados de duración por tipo de página.
     durations_df debe tener columnas 'duration' y 'PageType'.
+    Con binned=True los histogramas y KDE de cada tipo se calculan con bin_histogram_and_kde y se
+    guardan en un .npz junto al PNG (claves con el prefijo del tipo, p.ej. 'navegacion_counts').
     """
     if durations_df.empty or 'duration' not in durations_df.columns or 'PageType' not in durations_df.columns:
         print(f"Datos insuficientes o incorrectos para el histograma de {page_description.lower()} por tipo.")
@@ -375,41 +441,23 @@ def _plot_normalized_duration_histogram_by_type(
     if data_to_plot.empty:
         print(f"No quedan datos para graficar para {page_description.lower()} después del filtrado.")
         return
-    plt.figure(figsize=(12, 7))
-    page_types_present = data_to_plot['PageType'].unique()
-    if 'navegación' in page_types_present:
-        sns.histplot(
-            data_to_plot[data_to_plot['PageType'] == 'navegación'], 
-            x='duration', 
-            kde=True, 
-            stat="density", 
-            label='Navegación', 
-            color='skyblue',
-            bins='auto'
-        )
-    if 'contenido' in page_types_present:
-        sns.histplot(
-            data_to_plot[data_to_plot['PageType'] == 'contenido'], 
-            x='duration', 
-            kde=True, 
-            stat="density", 
-            label='Contenido', 
-            color='orange',
-            bins='auto'
-        )
     title_note = notes_list[0].split(". Afectó")[0] if notes_list else ""
-    plt.title(f'Histograma Normalizado de Duración de {page_description}\nPor Tipo de Página (Navegación vs. Contenido)\n{title_note}')
-    plt.xlabel("Duración de la Página (segundos)")
-    plt.ylabel("Densidad")
-    plt.legend()
-    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
     file_path = os.path.join(output_dir, filename)
-    try:
-        plt.savefig(file_path)
-        print(f"Histograma normalizado de duración ({page_description.lower()}) por tipo guardado en: {file_path}")
-    except Exception as e:
-        print(f"Error al guardar el histograma: {e}")
-    plt.close()
+    page_types_present = data_to_plot['PageType'].unique()
+    durations_by_type = {
+        page_type: data_to_plot.loc[data_to_plot['PageType'] == page_type, 'duration']
+        for page_type in _PAGE_TYPE_HISTOGRAM_STYLES if page_type in page_types_present
+    }
+    if binned:
+        durations_by_type = {page_type: bin_histogram_and_kde(durations) for page_type, durations in durations_by_type.items()}
+        save_binned_arrays(file_path, {
+            _PAGE_TYPE_HISTOGRAM_STYLES[page_type][2] + name: array
+            for page_type, arrays in durations_by_type.items() for name, array in arrays.items()
+        })
+    render_chart(
+        _render_normalized_duration_histogram_by_type, durations_by_type, page_description, title_note,
+        file_path, renderer=renderer
+    )
     memoria_notes_path = os.path.join(output_dir, filename.replace('.png', '_notes.txt'))
     with open(memoria_notes_path, "w") as f:
         f.write("\n".join(notes_list))
@@ -420,27 +468,31 @@ def plot_first_second_page_duration_histograms_by_type(
     output_dir: str,
     first_page_filename: str = "first_page_duration_norm_hist_by_type.png",
     second_page_filename: str = "second_page_duration_norm_hist_by_type.png",
-    threshold_percentile: float | None = 0.99
+    threshold_percentile: float | None = 0.99,
+    renderer: ChartRenderer | None = None,
+    binned: bool = True
 ) -> None:
     """
     Genera histogramas normalizados para la duración de la primera y segunda página, 
     comparando tipos 'navegación' vs. 'contenido'.
+    Con renderer los gráficos se dibujan en su pool de procesos (ver chart_rendering.py), y con
+    binned=True a partir de histogramas y KDE precalculados (ver _plot_normalized_duration_histogram_by_type).
     """
     print("\nGenerando histogramas normalizados de duración de primera/segunda página por tipo...")
     if 'PageType' not in df.columns or df['PageType'].isnull().all():
         print("Error: Columna 'PageType' no encontrada o vacía. Ejecute classify_page_type primero.")
         return
-    df_sorted = df.sort_values(by=['SessionID', 'marca de tiempo'])
+    df_sorted = sort_by_session_time(df)
     df_sorted['next_timestamp_in_session'] = df_sorted.groupby('SessionID')['marca de tiempo'].shift(-1)
     df_sorted['first_page_duration'] = df_sorted['next_timestamp_in_session'] - df_sorted['marca de tiempo']
     first_pages_data = df_sorted.groupby('SessionID').first().reset_index()
     first_pages_data = first_pages_data[first_pages_data['first_page_duration'] >= 0][['first_page_duration', 'PageType']].rename(columns={'first_page_duration': 'duration'})
-    _plot_normalized_duration_histogram_by_type(first_pages_data, "Primera Página", output_dir, first_page_filename, threshold_percentile)
+    _plot_normalized_duration_histogram_by_type(first_pages_data, "Primera Página", output_dir, first_page_filename, threshold_percentile, renderer, binned)
     df_sorted['next_next_timestamp_in_session'] = df_sorted.groupby('SessionID')['marca de tiempo'].shift(-2)
     df_sorted['second_page_duration'] = df_sorted['next_next_timestamp_in_session'] - df_sorted['next_timestamp_in_session']
     second_pages_data = df_sorted.groupby('SessionID').nth(1).reset_index()
     second_pages_data = second_pages_data[second_pages_data['second_page_duration'] >= 0][['second_page_duration', 'PageType']].rename(columns={'second_page_duration': 'duration'})
-    _plot_normalized_duration_histogram_by_type(second_pages_data, "Segunda Página", output_dir, second_page_filename, threshold_percentile)
+    _plot_normalized_duration_histogram_by_type(second_pages_data, "Segunda Página", output_dir, second_page_filename, threshold_percentile, renderer, binned)
 
 def _extract_display_domain(host_remoto: str) -> str:
     """
@@ -457,23 +509,59 @@ def _extract_display_domain(host_remoto: str) -> str:
         return host_str
     return host_str
 
-def get_top_domains_by_hits_and_sessions(df: pd.DataFrame, output_dir: str, top_n: int = 20) -> pd.DataFrame | None:
+def _approximate_top_by_hits_and_sessions(
+    keys: pd.Series, session_ids: pd.Series, key_name: str, top_n: int,
+    epsilon: float, hll_precision: int, batch_rows: int = 1000000, key_func=None
+) -> pd.DataFrame:
+    """
+    Versión aproximada de la tabla top-N por hits y sesiones distintas: recorre los hits por lotes
+    de batch_rows con un TopKeySketch (Space-Saving + Count-Min para los hits, HyperLogLog por clave
+    para las sesiones) en lugar de agrupar todo el DataFrame. Si se pasa key_func (p. ej. el dominio
+    o el directorio), se aplica a cada lote de keys, así que nunca se materializa la columna derivada
+    completa. Devuelve las mismas columnas que la versión exacta: key_name, 'HitCount' y 'SessionCount'.
+    """
+    sketch = TopKeySketch(epsilon=epsilon, hll_precision=hll_precision)
+    for start in range(0, len(keys), batch_rows):
+        batch_keys = keys.iloc[start:start + batch_rows]
+        if key_func is not None:
+            batch_keys = map_unique_values(batch_keys, key_func)
+        sketch.update(batch_keys, session_ids.iloc[start:start + batch_rows])
+    print(f"Modo aproximado: error máximo de HitCount {sketch.hit_error_bound:.0f} hits, "
+          f"error relativo típico de SessionCount {sketch.session_relative_error:.1%}.")
+    df_top = sketch.top(top_n, key_name=key_name)
+    if key_func is None and isinstance(keys.dtype, pd.CategoricalDtype): # Como el índice de groupby sobre una columna categórica
+        df_top[key_name] = df_top[key_name].astype(keys.dtype)
+    return df_top
+
+def get_top_domains_by_hits_and_sessions(
+    df: pd.DataFrame, output_dir: str, top_n: int = 20,
+    approximate: bool = False, epsilon: float = 0.001, hll_precision: int = 12
+) -> pd.DataFrame | None:
     """
     Identifica los N dominios/hosts más repetidos, por número de hits y sesiones.
     Utiliza el campo 'Host remoto' directamente después de una limpieza básica con _extract_display_domain.
+    Con approximate=True usa sketches en streaming (ver _approximate_top_by_hits_and_sessions):
+    los hits sobrestiman como mucho epsilon * (hits totales) y las sesiones tienen un error relativo
+    típico de 1.04 / sqrt(2**hll_precision).
     """
     print("\n--- Analizando Top Dominios/Hosts (Host Remoto) ---")
     if 'Host remoto' not in df.columns or 'SessionID' not in df.columns:
         print("Error: Se requieren las columnas 'Host remoto' y 'SessionID'.")
         return None
-    df_copy = df.copy()
-    df_copy['DisplayDomain'] = df_copy['Host remoto'].apply(_extract_display_domain)
-    domain_hits = df_copy.groupby('DisplayDomain').size().rename('HitCount')
-    domain_sessions = df_copy.groupby('DisplayDomain')['SessionID'].nunique().rename('SessionCount')
-    domain_summary_df = pd.concat([domain_hits, domain_sessions], axis=1).fillna(0)
-    domain_summary_df['SessionCount'] = domain_summary_df['SessionCount'].astype(int)
-    domain_summary_df = domain_summary_df.sort_values(by=['HitCount', 'SessionCount'], ascending=[False, False])
-    df_top_domains = domain_summary_df.head(top_n).reset_index()
+    if approximate: # Sin copiar el DataFrame: el dominio se calcula lote a lote
+        df_top_domains = _approximate_top_by_hits_and_sessions(
+            df['Host remoto'], df['SessionID'], 'DisplayDomain', top_n, epsilon, hll_precision,
+            key_func=_extract_display_domain
+        )
+    else:
+        df_copy = df.copy()
+        df_copy['DisplayDomain'] = map_unique_values(df_copy['Host remoto'], _extract_display_domain)
+        domain_hits = df_copy.groupby('DisplayDomain').size().rename('HitCount')
+        domain_sessions = df_copy.groupby('DisplayDomain')['SessionID'].nunique().rename('SessionCount')
+        domain_summary_df = pd.concat([domain_hits, domain_sessions], axis=1).fillna(0)
+        domain_summary_df['SessionCount'] = domain_summary_df['SessionCount'].astype(int)
+        domain_summary_df = domain_summary_df.sort_values(by=['HitCount', 'SessionCount'], ascending=[False, False])
+        df_top_domains = domain_summary_df.head(top_n).reset_index()
     print(f"\nTop {top_n} Dominios/Hosts por Hits y Sesiones:")
     print(df_top_domains.to_string())
     output_tables_dir = os.path.join(output_dir, '..', 'tables')
@@ -518,8 +606,8 @@ def get_top_domain_types(df: pd.DataFrame, output_dir: str, top_n: int = 7) -> p
         print("Error: Se requieren las columnas 'Host remoto' y 'SessionID'.")
         return None
     df_copy = df.copy()
-    df_copy['CleanedHost'] = df_copy['Host remoto'].apply(_extract_display_domain)
-    df_copy['TLD'] = df_copy['CleanedHost'].apply(_extract_tld)
+    df_copy['CleanedHost'] = map_unique_values(df_copy['Host remoto'], _extract_display_domain)
+    df_copy['TLD'] = map_unique_values(df_copy['CleanedHost'], _extract_tld)
     df_tlds = df_copy[df_copy['TLD'] != '']
     if df_tlds.empty:
         print("No se pudieron extraer TLDs válidos para el análisis.")
@@ -544,21 +632,32 @@ def get_top_domain_types(df: pd.DataFrame, output_dir: str, top_n: int = 7) -> p
         print(f"Error al guardar la tabla de tipos de dominio: {e}")
     return df_top_tlds
 
-def get_top_pages_by_hits_and_sessions(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> pd.DataFrame | None:
+def get_top_pages_by_hits_and_sessions(
+    df: pd.DataFrame, output_dir: str, top_n: int = 10,
+    approximate: bool = False, epsilon: float = 0.001, hll_precision: int = 12
+) -> pd.DataFrame | None:
     """
     Identifica las N páginas más visitadas, por número de hits totales y por número de sesiones distintas.
+    Con approximate=True usa sketches en streaming (ver _approximate_top_by_hits_and_sessions):
+    los hits sobrestiman como mucho epsilon * (hits totales) y las sesiones tienen un error relativo
+    típico de 1.04 / sqrt(2**hll_precision).
     """
     print("\n--- Analizando Top Páginas Más Visitadas ---")
     if 'Página' not in df.columns or 'SessionID' not in df.columns:
         print("Error: Se requieren las columnas 'Página' y 'SessionID'.")
         return None
-    df_copy = df.copy()
-    page_hits = df_copy.groupby('Página').size().rename('HitCount')
-    page_sessions = df_copy.groupby('Página')['SessionID'].nunique().rename('SessionCount')
-    page_summary_df = pd.concat([page_hits, page_sessions], axis=1).fillna(0)
-    page_summary_df['SessionCount'] = page_summary_df['SessionCount'].astype(int)
-    page_summary_df = page_summary_df.sort_values(by=['HitCount', 'SessionCount'], ascending=[False, False])
-    df_top_pages = page_summary_df.head(top_n).reset_index()
+    if approximate:
+        df_top_pages = _approximate_top_by_hits_and_sessions(
+            df['Página'], df['SessionID'], 'Página', top_n, epsilon, hll_precision
+        )
+    else:
+        df_copy = df.copy()
+        page_hits = df_copy.groupby('Página', observed=True).size().rename('HitCount')
+        page_sessions = df_copy.groupby('Página', observed=True)['SessionID'].nunique().rename('SessionCount')
+        page_summary_df = pd.concat([page_hits, page_sessions], axis=1).fillna(0)
+        page_summary_df['SessionCount'] = page_summary_df['SessionCount'].astype(int)
+        page_summary_df = page_summary_df.sort_values(by=['HitCount', 'SessionCount'], ascending=[False, False])
+        df_top_pages = page_summary_df.head(top_n).reset_index()
     print(f"\nTop {top_n} Páginas por Hits y Sesiones:")
     print(df_top_pages.to_string())
     output_tables_dir = os.path.join(output_dir, '..', 'tables') 
@@ -591,22 +690,34 @@ def _extract_directory(page_path: str) -> str:
     directory = path_str[:last_slash_pos]
     return directory if directory else "/" # Handle cases like "/file.html" -> "/"
 
-def get_top_directories_by_hits_and_sessions(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> pd.DataFrame | None:
+def get_top_directories_by_hits_and_sessions(
+    df: pd.DataFrame, output_dir: str, top_n: int = 10,
+    approximate: bool = False, epsilon: float = 0.001, hll_precision: int = 12
+) -> pd.DataFrame | None:
     """
     Identifica los N directorios más visitados, por número de hits y sesiones.
+    Con approximate=True usa sketches en streaming (ver _approximate_top_by_hits_and_sessions):
+    los hits sobrestiman como mucho epsilon * (hits totales) y las sesiones tienen un error relativo
+    típico de 1.04 / sqrt(2**hll_precision).
     """
     print("\n--- Analizando Top Directorios Más Visitados ---")
     if 'Página' not in df.columns or 'SessionID' not in df.columns:
         print("Error: Se requieren las columnas 'Página' y 'SessionID'.")
         return None
-    df_copy = df.copy()
-    df_copy['Directory'] = df_copy['Página'].apply(_extract_directory)
-    dir_hits = df_copy.groupby('Directory').size().rename('HitCount')
-    dir_sessions = df_copy.groupby('Directory')['SessionID'].nunique().rename('SessionCount')
-    dir_summary_df = pd.concat([dir_hits, dir_sessions], axis=1).fillna(0)
-    dir_summary_df['SessionCount'] = dir_summary_df['SessionCount'].astype(int)
-    dir_summary_df = dir_summary_df.sort_values(by=['HitCount', 'SessionCount'], ascending=[False, False])
-    df_top_dirs = dir_summary_df.head(top_n).reset_index()
+    if approximate: # Sin copiar el DataFrame: el directorio se calcula lote a lote
+        df_top_dirs = _approximate_top_by_hits_and_sessions(
+            df['Página'], df['SessionID'], 'Directory', top_n, epsilon, hll_precision,
+            key_func=_extract_directory
+        )
+    else:
+        df_copy = df.copy()
+        df_copy['Directory'] = map_unique_values(df_copy['Página'], _extract_directory)
+        dir_hits = df_copy.groupby('Directory').size().rename('HitCount')
+        dir_sessions = df_copy.groupby('Directory')['SessionID'].nunique().rename('SessionCount')
+        dir_summary_df = pd.concat([dir_hits, dir_sessions], axis=1).fillna(0)
+        dir_summary_df['SessionCount'] = dir_summary_df['SessionCount'].astype(int)
+        dir_summary_df = dir_summary_df.sort_values(by=['HitCount', 'SessionCount'], ascending=[False, False])
+        df_top_dirs = dir_summary_df.head(top_n).reset_index()
     print(f"\nTop {top_n} Directorios por Hits y Sesiones:")
     print(df_top_dirs.to_string())
     output_tables_dir = os.path.join(output_dir, '..', 'tables')
@@ -637,7 +748,7 @@ def get_top_file_types_by_hits(df: pd.DataFrame, output_dir: str, top_n: int = 1
     # Asegurar que tenemos la columna 'extension'
     if 'extension' not in df_copy.columns:
         print("Columna 'extension' no encontrada, extrayéndola...")
-        df_copy['extension'] = df_copy['Página'].astype(str).apply(_extract_extension)
+        df_copy['extension'] = map_unique_values(df_copy['Página'], _extract_extension)
 
     # Filtrar extensiones vacías (páginas de navegación o sin extensión real)
     df_with_extensions = df_copy[df_copy['extension'] != '']
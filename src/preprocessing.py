@@ -1,92 +1,317 @@
 import pandas as pd
-import re
 import os
-
-# Regex to parse a single log line based on Combined Log Format.
-# Fields captured: host, datetime, method, page, protocol, status, size
-LOG_PATTERN = re.compile(
-    r'^(?P<host>\S+)\s+'                               # Host remoto
-    r'-\s+-\s+'                                     # ident and user fields (always "-", not captured)
-    r'\[(?P<datetime>[^\]]+)\]\s+'                     # Fecha/Hora (e.g., 01/Jul/1995:00:00:01 -0400)
-    r'"(?P<method>GET|POST|HEAD|PUT|DELETE|OPTIONS|PATCH)\s+'  # Método HTTP
-    r'(?P<page>\S+)\s+'                                # Página (Requested resource path)
-    r'(?P<protocol>HTTP\/\d\.\d)"\s+'                  # Protocolo HTTP (e.g., HTTP/1.0)
-    r'(?P<status>\d{3})\s+'                            # Resultado (HTTP status code)
-    r'(?P<size>\S+)$'                                  # Tamaño (Size of object in bytes, can be '-')
+import io
+import shutil
+import itertools
+import glob
+import tempfile
+import json
+import hashlib
+import gzip
+import bz2
+import lzma
+from collections import deque
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from log_common import (
+    COLUMN_NAMES, parse_log_line, map_unique_values, extract_extension_from_page,
+    parse_clf_datetimes, REFERENCE_EPOCH_SECONDS, SESSION_COUNTER_BITS, sort_by_session_time,
+    apply_processed_schema, PARTITION_COLUMN, PARTITION_FORMATS
 )
 
-# Column names as specified in TODO.md (updated)
-COLUMN_NAMES = [
-    'Host remoto', 'Fecha/Hora',
-    'Método', 'Página', 'Protocolo', 'Resultado', 'Tamaño'
-]
-
-def _extract_extension_from_page(page_path: str) -> str:
-    """
-    Extrae la extensión de un path de página. Devuelve la extensión en minúsculas
-    sin el punto inicial, o una cadena vacía si no hay extensión o es inválida.
-    Ej: '/path/file.HTML' -> 'html'; '/path/' -> ''; '/path/nodot' -> ''.
-    """
-    if pd.isna(page_path):
-        return ""
-    # os.path.splitext devuelve ('root', '.ext') o ('root', '')
-    _root, ext = os.path.splitext(str(page_path))
-    if ext.startswith('.'):
-        return ext[1:].lower() # Eliminar el punto inicial y convertir a minúsculas
-    return "" # Si no hay punto (ext es '') o es una extensión vacía rara.
-
-def parse_log_line(line: str) -> list | None:
-    """
-    Parses a single log line using the precompiled regex LOG_PATTERN.
-    Returns a list of captured string values in the order of COLUMN_NAMES, 
-    or None if the line does not match the pattern.
-    """
-    match = LOG_PATTERN.match(line)
-    if match:
-        parts = match.groupdict()
-        # Ensure the order matches COLUMN_NAMES (updated)
-        return [parts['host'], parts['datetime'],
-                parts['method'], parts['page'], parts['protocol'],
-                parts['status'], parts['size']]
+def _parse_text_lines(lines, report_every: int | None = None) -> tuple[list, int, int]:
+    """
+    Parsea un iterable de líneas de texto con parse_log_line.
+    Devuelve (filas parseadas, líneas procesadas, líneas omitidas): las líneas vacías
+    y las que no encajan con LOG_PATTERN cuentan como omitidas.
+    """
+    parsed_data = []
+    processed_lines = 0
+    skipped_lines = 0
+    for line in lines:
+        processed_lines += 1
+        stripped_line = line.strip()
+        if not stripped_line: # Skip empty lines
+            skipped_lines +=1
+            continue
+
+        parsed_line_data = parse_log_line(stripped_line)
+        if parsed_line_data:
+            parsed_data.append(parsed_line_data)
+        else:
+            skipped_lines += 1
+            # Uncomment for debugging malformed lines:
+            # print(f"Advertencia: Línea no parseada [{processed_lines}]: {stripped_line}")
+
+        if report_every and processed_lines % report_every == 0: # Provide feedback for very large files
+            print(f"Procesadas {processed_lines} líneas... ({len(parsed_data)} válidas, {skipped_lines} omitidas)")
+    return parsed_data, processed_lines, skipped_lines
+
+# Tokenizadores de línea disponibles en load_log_data: 'regex' aplica LOG_PATTERN línea a línea;
+# 'split' trocea bloques enteros por los separadores fijos del formato con pyarrow.compute
+LOG_TOKENIZERS = ('regex', 'split')
+
+# Número de campos separados por un espacio en una línea canónica:
+# host - - [fecha zona] "método página protocolo" resultado tamaño
+_SPLIT_FIELD_COUNT = 10
+_SPLIT_METHOD_TOKENS = pa.array(['"' + method for method in ('GET', 'POST', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'PATCH')])
+
+def _tokenize_text_block_split(text: str) -> tuple[pd.DataFrame, int, int]:
+    """
+    Tokenizador 'split': parte el bloque en líneas y cada línea por espacios con pyarrow.compute,
+    sin crear objetos Python por línea. Solo acepta por esta vía las líneas canónicas (ASCII
+    imprimible, campos separados por un único espacio); para ellas LOG_PATTERN capturaría
+    exactamente los mismos campos. El resto de líneas (vacías, con tabuladores, no ASCII,
+    malformadas...) pasan por parse_log_line, así que las líneas aceptadas y omitidas coinciden
+    con el tokenizador 'regex'. El texto no debe contener '\r' (ver _parse_text_block).
+    """
+    lines = pc.split_pattern(pa.array([text]), '\n').flatten()
+    if text.endswith('\n') or not text: # El último salto de línea no abre una línea nueva
+        lines = lines.slice(0, len(lines) - 1)
+
+    parts = pc.split_pattern(lines, ' ')
+    is_candidate = pc.and_(
+        pc.equal(pc.list_value_length(parts), _SPLIT_FIELD_COUNT),
+        pc.invert(pc.match_substring_regex(lines, '[^ -~]'))
+    )
+    candidate_positions = np.flatnonzero(is_candidate.to_numpy(zero_copy_only=False))
+    candidate_parts = parts.filter(is_candidate)
+    (host, ident, user, date, zone, method,
+     page, protocol, status, size) = [pc.list_element(candidate_parts, i) for i in range(_SPLIT_FIELD_COUNT)]
+
+    checks = [
+        pc.greater(pc.utf8_length(host), 0),
+        pc.equal(ident, '-'),
+        pc.equal(user, '-'),
+        pc.starts_with(date, '['),
+        pc.equal(pc.count_substring(date, ']'), 0),
+        pc.ends_with(zone, ']'),
+        pc.equal(pc.count_substring(zone, ']'), 1),
+        pc.is_in(method, value_set=_SPLIT_METHOD_TOKENS),
+        pc.greater(pc.utf8_length(page), 0),
+        pc.match_substring_regex(protocol, r'^HTTP/[0-9]\.[0-9]"$'),
+        pc.match_substring_regex(status, '^[0-9]{3}$'),
+        pc.greater(pc.utf8_length(size), 0),
+    ]
+    is_valid = checks[0]
+    for check in checks[1:]:
+        is_valid = pc.and_(is_valid, check)
+
+    columns = [
+        host,
+        pc.binary_join_element_wise(pc.utf8_slice_codeunits(date, 1), pc.utf8_slice_codeunits(zone, 0, -1), ' '),
+        pc.utf8_slice_codeunits(method, 1),
+        page,
+        pc.utf8_slice_codeunits(protocol, 0, -1),
+        status,
+        size,
+    ]
+    df = pa.table([column.filter(is_valid) for column in columns], names=COLUMN_NAMES).to_pandas()
+    df.index = candidate_positions[is_valid.to_numpy(zero_copy_only=False)]
+
+    # Líneas no canónicas: se resuelven con LOG_PATTERN y se insertan en su posición original
+    is_fallback = np.ones(len(lines), dtype=bool)
+    is_fallback[df.index] = False
+    fallback_rows = []
+    fallback_positions = []
+    for position in np.flatnonzero(is_fallback):
+        stripped_line = lines[int(position)].as_py().strip()
+        parsed_line_data = parse_log_line(stripped_line) if stripped_line else None
+        if parsed_line_data:
+            fallback_rows.append(parsed_line_data)
+            fallback_positions.append(position)
+    if fallback_rows:
+        df = pd.concat([df, pd.DataFrame(fallback_rows, columns=COLUMN_NAMES, index=fallback_positions)]).sort_index()
+
+    return df.reset_index(drop=True), len(lines), len(lines) - len(df)
+
+def _parse_text_block(text: str, tokenizer: str = 'regex') -> tuple[pd.DataFrame, int, int]:
+    """
+    Parsea un bloque de texto con el tokenizador indicado (ver LOG_TOKENIZERS).
+    Devuelve (DataFrame con COLUMN_NAMES, líneas procesadas, líneas omitidas).
+    Los bloques con '\r' (saltos de línea universales) se parsean siempre con 'regex'.
+    """
+    if tokenizer == 'split' and '\r' not in text:
+        return _tokenize_text_block_split(text)
+    parsed_data, processed_lines, skipped_lines = _parse_text_lines(io.StringIO(text, newline=None))
+    return pd.DataFrame(parsed_data, columns=COLUMN_NAMES), processed_lines, skipped_lines
+
+def _parse_bytes(data: bytes, tokenizer: str = 'regex') -> tuple[pd.DataFrame, int, int]:
+    """
+    Decodifica y parsea un bloque de bytes que empieza tras un salto de línea, de modo que el
+    texto decodificado y las líneas obtenidas (con saltos universales, como open(..., 'r'))
+    coinciden con la lectura secuencial.
+    """
+    return _parse_text_block(data.decode('utf-8', errors='ignore'), tokenizer)
+
+def _parse_byte_range(task: tuple[str, int, int, str]) -> tuple[pd.DataFrame, int, int]:
+    """Worker del parser paralelo: lee el rango de bytes [start, end) del fichero y lo parsea."""
+    log_file_path, start, end, tokenizer = task
+    with open(log_file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return _parse_bytes(data, tokenizer)
+
+def _concat_parsed_chunks(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    """Une en orden los DataFrames parseados por bloques, ignorando los bloques sin filas válidas."""
+    chunks = [chunk for chunk in chunks if not chunk.empty]
+    if not chunks:
+        return pd.DataFrame(columns=COLUMN_NAMES)
+    return pd.concat(chunks, ignore_index=True)
+
+# Cabeceras (magic bytes) de los formatos comprimidos admitidos y la función que abre cada uno.
+# gzip.open, bz2.open y lzma.open leen también ficheros con varios miembros/streams concatenados.
+COMPRESSION_MAGIC = {
+    'gzip': b'\x1f\x8b',
+    'bz2': b'BZh',
+    'xz': b'\xfd7zXZ\x00',
+}
+_COMPRESSION_OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+def detect_compression(log_file_path: str) -> str | None:
+    """Devuelve 'gzip', 'bz2' o 'xz' según la cabecera del fichero, o None si es texto plano."""
+    with open(log_file_path, 'rb') as f:
+        header = f.read(max(len(magic) for magic in COMPRESSION_MAGIC.values()))
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if header.startswith(magic):
+            return compression
     return None
 
-def load_log_data(log_file_path: str) -> pd.DataFrame | None:
+def _open_log_binary(log_file_path: str):
+    """Abre el log en modo binario, descomprimiendo al vuelo si está comprimido."""
+    compression = detect_compression(log_file_path)
+    if compression is None:
+        return open(log_file_path, 'rb')
+    return _COMPRESSION_OPENERS[compression](log_file_path, 'rb')
+
+def _open_log_text(log_file_path: str):
+    """Abre el log como texto (utf-8, errors='ignore', saltos universales), comprimido o no."""
+    return io.TextIOWrapper(_open_log_binary(log_file_path), encoding='utf-8', errors='ignore')
+
+def _iter_line_aligned_blocks(f, block_size_bytes: int):
+    """Lee un flujo binario en bloques de unos block_size_bytes que terminan siempre en un salto de línea ('\\n')."""
+    while True:
+        data = f.read(block_size_bytes)
+        if not data:
+            break
+        if not data.endswith(b'\n'):
+            data += f.readline() # Completar la línea en curso
+        yield data
+
+def _find_chunk_boundaries(log_file_path: str, chunk_size_bytes: int) -> list[tuple[int, int]]:
+    """
+    Divide el fichero en rangos de bytes de unos chunk_size_bytes, alineados a saltos de línea ('\\n').
+    Devuelve una lista de tuplas (inicio, fin) que cubren todo el fichero sin solapes.
+    """
+    file_size = os.path.getsize(log_file_path)
+    boundaries = []
+    start = 0
+    with open(log_file_path, 'rb') as f:
+        while start < file_size:
+            end = start + chunk_size_bytes
+            if end >= file_size:
+                end = file_size
+            else:
+                f.seek(end)
+                f.readline() # Avanzar hasta el final de la línea en curso
+                end = min(f.tell(), file_size)
+            boundaries.append((start, end))
+            start = end
+    return boundaries
+
+def _parse_log_file_parallel(log_file_path: str, n_workers: int, chunk_size_bytes: int = 32 * 1024 * 1024,
+                              tokenizer: str = 'regex') -> tuple[pd.DataFrame, int, int]:
+    """
+    Parsea el fichero en paralelo en un pool de procesos. Los resultados se combinan en el orden del
+    fichero, por lo que las filas y los contadores coinciden exactamente con la lectura secuencial.
+    Un fichero plano se divide en rangos de bytes alineados a líneas que cada proceso lee por su cuenta.
+    Uno comprimido se descomprime en este proceso por bloques que se envían al pool según se leen
+    (con como mucho 2 * n_workers bloques pendientes), así la descompresión se solapa con el parseo.
+    """
+    chunks = []
+    processed_lines = 0
+    skipped_lines = 0
+
+    def collect(result):
+        nonlocal processed_lines, skipped_lines
+        chunk_df, chunk_processed, chunk_skipped = result
+        chunks.append(chunk_df)
+        processed_lines += chunk_processed
+        skipped_lines += chunk_skipped
+        print(f"Procesadas {processed_lines} líneas... ({processed_lines - skipped_lines} válidas, {skipped_lines} omitidas)")
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        if detect_compression(log_file_path) is None:
+            tasks = [(log_file_path, start, end, tokenizer) for start, end in _find_chunk_boundaries(log_file_path, chunk_size_bytes)]
+            for result in executor.map(_parse_byte_range, tasks):
+                collect(result)
+        else:
+            pending = deque()
+            with _open_log_binary(log_file_path) as f:
+                for data in _iter_line_aligned_blocks(f, chunk_size_bytes):
+                    pending.append(executor.submit(_parse_bytes, data, tokenizer))
+                    if len(pending) >= 2 * n_workers:
+                        collect(pending.popleft().result())
+            while pending:
+                collect(pending.popleft().result())
+    return _concat_parsed_chunks(chunks), processed_lines, skipped_lines
+
+def _parse_log_file_sequential(log_file_path: str, tokenizer: str = 'regex',
+                                chunk_size_bytes: int = 32 * 1024 * 1024) -> tuple[pd.DataFrame, int, int]:
+    """
+    Parsea el fichero (comprimido o no) en el proceso actual: línea a línea con 'regex'
+    o por bloques de bytes alineados a líneas con 'split'.
+    """
+    if tokenizer == 'split':
+        chunks = []
+        processed_lines = 0
+        skipped_lines = 0
+        with _open_log_binary(log_file_path) as f:
+            for data in _iter_line_aligned_blocks(f, chunk_size_bytes):
+                chunk_df, chunk_processed, chunk_skipped = _parse_bytes(data, tokenizer)
+                chunks.append(chunk_df)
+                processed_lines += chunk_processed
+                skipped_lines += chunk_skipped
+                print(f"Procesadas {processed_lines} líneas... ({processed_lines - skipped_lines} válidas, {skipped_lines} omitidas)")
+        return _concat_parsed_chunks(chunks), processed_lines, skipped_lines
+
+    # Using utf-8 with errors='ignore' for robustness against potential encoding issues.
+    with _open_log_text(log_file_path) as f:
+        parsed_data, processed_lines, skipped_lines = _parse_text_lines(f, report_every=500000)
+    return pd.DataFrame(parsed_data, columns=COLUMN_NAMES), processed_lines, skipped_lines
+
+def load_log_data(log_file_path: str, n_workers: int | None = None, tokenizer: str = 'regex') -> pd.DataFrame | None:
     """
     Carga el fichero log de NASA y lo convierte en un DataFrame de Pandas,
     parseando cada línea con expresiones regulares.
+    Los logs comprimidos con gzip (incluido gzip con varios miembros), bz2 o xz se detectan
+    por su cabecera y se descomprimen al vuelo, sin pasar por disco.
 
     Args:
-        log_file_path (str): Path to the NASA access log file.
+        log_file_path (str): Path to the NASA access log file (texto plano, .gz, .bz2 o .xz).
+        n_workers (int | None): Número de procesos para el parseo paralelo por rangos de bytes.
+            None o 1 parsea secuencialmente. El resultado es idéntico en ambos modos.
+        tokenizer (str): 'regex' (LOG_PATTERN línea a línea) o 'split' (troceado vectorizado por
+            separadores con pyarrow, con LOG_PATTERN solo para las líneas no canónicas).
+            Ambos aceptan y omiten exactamente las mismas líneas.
 
     Returns:
         pd.DataFrame | None: DataFrame containing the parsed log data, or None if an error occurs.
     """
+    if tokenizer not in LOG_TOKENIZERS:
+        print(f"Error: tokenizador '{tokenizer}' no válido. Opciones: {', '.join(LOG_TOKENIZERS)}")
+        return None
     print(f"Cargando y parseando datos desde {log_file_path}...")
-    parsed_data = []
-    processed_lines = 0
-    skipped_lines = 0
 
     try:
-        # Using utf-8 with errors='ignore' for robustness against potential encoding issues.
-        with open(log_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                processed_lines += 1
-                stripped_line = line.strip()
-                if not stripped_line: # Skip empty lines
-                    skipped_lines +=1
-                    continue
-                
-                parsed_line_data = parse_log_line(stripped_line)
-                if parsed_line_data:
-                    parsed_data.append(parsed_line_data)
-                else:
-                    skipped_lines += 1
-                    # Uncomment for debugging malformed lines:
-                    # print(f"Advertencia: Línea no parseada [{processed_lines}]: {stripped_line}") 
-                
-                if processed_lines % 500000 == 0: # Provide feedback for very large files
-                    print(f"Procesadas {processed_lines} líneas... ({len(parsed_data)} válidas, {skipped_lines} omitidas)")
-
+        if n_workers is not None and n_workers > 1:
+            print(f"Parseo paralelo con {n_workers} procesos...")
+            df, processed_lines, skipped_lines = _parse_log_file_parallel(log_file_path, n_workers, tokenizer=tokenizer)
+        else:
+            df, processed_lines, skipped_lines = _parse_log_file_sequential(log_file_path, tokenizer=tokenizer)
     except FileNotFoundError:
         print(f"Error: El archivo {log_file_path} no fue encontrado.")
         return None
@@ -94,54 +319,293 @@ def load_log_data(log_file_path: str) -> pd.DataFrame | None:
         print(f"Ocurrió un error al leer o parsear el archivo: {e}")
         return None
 
-    if not parsed_data:
+    if df.empty:
         print("No se pudieron parsear datos válidos del archivo log.")
         return None
 
-    df = pd.DataFrame(parsed_data, columns=COLUMN_NAMES)
     print(f"Procesamiento finalizado. Total líneas leídas: {processed_lines}, Filas en DataFrame: {len(df)}, Líneas omitidas/no parseadas: {skipped_lines}")
-    
+
+    return _convert_log_columns(df)
+
+def _convert_log_columns(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """
+    Convierte las columnas de texto parseadas a sus tipos: 'Resultado' y 'Tamaño' a numéricos,
+    'Fecha/Hora' a datetime con zona horaria, y añade 'Fecha/Hora_UTC' y 'marca de tiempo'.
+    """
     # Convertir columnas 'Resultado' (status) y 'Tamaño' (size) a tipos numéricos.
     # Para 'Tamaño', los valores '-' se convertirán a NaN (Not a Number).
     df['Resultado'] = pd.to_numeric(df['Resultado'], errors='coerce') # Status code should be numeric
     df['Tamaño'] = pd.to_numeric(df['Tamaño'], errors='coerce')     # Size can be '-'
 
     # 1.1.3. Convertir la columna Fecha/Hora a objetos datetime
-    print("Convirtiendo la columna 'Fecha/Hora' a objetos datetime...")
-    # El formato es como: 01/Jul/1995:00:00:01 -0400
-    df['Fecha/Hora'] = pd.to_datetime(df['Fecha/Hora'], format='%d/%b/%Y:%H:%M:%S %z', errors='coerce')
+    if verbose:
+        print("Convirtiendo la columna 'Fecha/Hora' a objetos datetime...")
+    # El formato es como: 01/Jul/1995:00:00:01 -0400. El parser de formato fijo también
+    # calcula los segundos desde 1995-01-01 UTC usados para 'marca de tiempo'.
+    df['Fecha/Hora'], seconds_since_1995 = parse_clf_datetimes(df['Fecha/Hora'])
 
     # Comprobar si hubo errores de conversión (NaT) y reportar
     nat_count = df['Fecha/Hora'].isnull().sum()
-    if nat_count > 0:
+    if nat_count > 0 and verbose:
         print(f"Advertencia: {nat_count} entradas en 'Fecha/Hora' no pudieron ser convertidas a datetime y son NaT.")
 
     # 1.1.4. Crear columna 'marca de tiempo' (segundos desde 1 Enero 1995)
-    print("Creando columna 'marca de tiempo'...")
+    if verbose:
+        print("Creando columna 'marca de tiempo'...")
     if not df['Fecha/Hora'].isnull().all(): # Proceed if there are any valid datetimes
         # Convertir Fecha/Hora a UTC para consistencia, si no lo está ya por el %z.
         # pd.to_datetime con %z ya los hace tz-aware.
         # Para asegurar una base común, convertimos a UTC.
         df['Fecha/Hora_UTC'] = df['Fecha/Hora'].dt.tz_convert('UTC')
         
-        # Definir la fecha de referencia como UTC
-        ref_date_utc = pd.Timestamp("1995-01-01 00:00:00", tz='UTC')
-        
-        # Calcular la diferencia en segundos
-        # Solo calcular si la fecha no es NaT
-        df['marca de tiempo'] = (df['Fecha/Hora_UTC'] - ref_date_utc).dt.total_seconds()
+        # Diferencia en segundos con la referencia 1995-01-01 00:00:00 UTC, ya calculada
+        # por parse_clf_datetimes (NaN donde la fecha es NaT)
+        df['marca de tiempo'] = seconds_since_1995
         
         # Opcional: eliminar la columna intermedia Fecha/Hora_UTC si no se necesita más
         # df.drop(columns=['Fecha/Hora_UTC'], inplace=True)
         
         # Si Fecha/Hora original era NaT, marca de tiempo también será NaT. Esto es correcto.
-        print("Columna 'marca de tiempo' creada.")
+        if verbose:
+            print("Columna 'marca de tiempo' creada.")
     else:
-        print("Columna 'Fecha/Hora' no contiene fechas válidas para calcular 'marca de tiempo'.")
+        if verbose:
+            print("Columna 'Fecha/Hora' no contiene fechas válidas para calcular 'marca de tiempo'.")
         df['marca de tiempo'] = pd.NaT # O np.nan si se prefiere float para esta columna en caso de fallo total
 
     return df
 
+def _log_frame_to_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convierte a tabla Arrow un DataFrame de _convert_log_columns, con las mismas columnas aunque
+    ninguna fecha sea válida, para que todos los lotes/ficheros compartan esquema.
+    """
+    if 'Fecha/Hora_UTC' not in df.columns: # Lote sin ninguna fecha válida
+        df['Fecha/Hora_UTC'] = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns, UTC]')
+        df['marca de tiempo'] = np.nan
+        df = df[COLUMN_NAMES + ['Fecha/Hora_UTC', 'marca de tiempo']]
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def stream_log_to_parquet(log_file_path: str, parquet_path: str, batch_lines: int = 500000) -> tuple[int, int, int] | None:
+    """
+    Parsea el fichero log por lotes de batch_lines líneas y escribe cada lote como un row group
+    del fichero Parquet de salida. El uso de memoria del parseo depende del tamaño del lote, no del
+    fichero; solo está acotada esta etapa: las siguientes del pipeline de __main__ (filtro de extensiones,
+    bots, UserID, sesiones) leen el Parquet completo, porque los bots y las sesiones necesitan todos
+    los hits de cada host. Cada lote pasa por las mismas conversiones de tipo que load_log_data, por lo que leer el
+    Parquet resultante da el mismo DataFrame.
+
+    Args:
+        log_file_path (str): Ruta al fichero log de NASA (texto plano o comprimido, ver load_log_data).
+        parquet_path (str): Ruta del fichero Parquet a generar.
+        batch_lines (int): Número de líneas del log parseadas por lote (row group).
+
+    Returns:
+        tuple[int, int, int] | None: (líneas leídas, filas escritas, líneas omitidas), o None si ocurre un error.
+    """
+    print(f"Cargando y parseando datos por lotes de {batch_lines} líneas desde {log_file_path}...")
+    output_dir = os.path.dirname(parquet_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"Directorio creado: {output_dir}")
+
+    processed_lines = 0
+    skipped_lines = 0
+    written_rows = 0
+    writer = None
+    try:
+        with _open_log_text(log_file_path) as f:
+            while True:
+                lines = list(itertools.islice(f, batch_lines))
+                if not lines:
+                    break
+                parsed_data, batch_processed, batch_skipped = _parse_text_lines(lines)
+                processed_lines += batch_processed
+                skipped_lines += batch_skipped
+                if not parsed_data:
+                    continue
+
+                batch_df = _convert_log_columns(pd.DataFrame(parsed_data, columns=COLUMN_NAMES), verbose=False)
+                table = _log_frame_to_table(batch_df)
+                if writer is None:
+                    writer = pq.ParquetWriter(parquet_path, table.schema)
+                else:
+                    table = table.cast(writer.schema)
+                writer.write_table(table)
+                written_rows += len(batch_df)
+                print(f"Procesadas {processed_lines} líneas... ({written_rows} válidas, {skipped_lines} omitidas)")
+    except FileNotFoundError:
+        print(f"Error: El archivo {log_file_path} no fue encontrado.")
+        return None
+    except Exception as e:
+        print(f"Ocurrió un error al leer, parsear o escribir los lotes: {e}")
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        print("No se pudieron parsear datos válidos del archivo log.")
+        return None
+
+    print(f"Procesamiento finalizado. Total líneas leídas: {processed_lines}, Filas escritas: {written_rows}, Líneas omitidas/no parseadas: {skipped_lines}")
+    print(f"Datos parseados guardados por lotes en: {parquet_path}")
+    return processed_lines, written_rows, skipped_lines
+
+def resolve_log_paths(log_source: str) -> list[str]:
+    """
+    Devuelve los ficheros log indicados por log_source, ordenados por nombre: todos los ficheros
+    (no ocultos) de un directorio, los que encajan con un patrón glob (p.ej. 'datos/access_log_*')
+    o el propio fichero.
+    """
+    if os.path.isdir(log_source):
+        return sorted(
+            os.path.join(log_source, name) for name in os.listdir(log_source)
+            if not name.startswith('.') and os.path.isfile(os.path.join(log_source, name))
+        )
+    if glob.has_magic(log_source):
+        return sorted(path for path in glob.glob(log_source) if os.path.isfile(path))
+    return [log_source]
+
+def _parse_log_file_to_sorted_run(task: tuple[str, str, str, int]) -> tuple[int, int, int]:
+    """
+    Worker de ingest_log_files: parsea un fichero log completo y lo guarda en run_path como Parquet
+    ordenado (de forma estable) por 'marca de tiempo', con las fechas no válidas al final.
+    Los logs ya vienen casi ordenados, así que la ordenación estable apenas mueve filas.
+    Devuelve (líneas leídas, filas escritas, líneas omitidas).
+    """
+    log_file_path, run_path, tokenizer, batch_rows = task
+    df, processed_lines, skipped_lines = _parse_log_file_sequential(log_file_path, tokenizer=tokenizer)
+    if df.empty:
+        return processed_lines, 0, skipped_lines
+    df = _convert_log_columns(df, verbose=False)
+    df = df.sort_values('marca de tiempo', kind='stable', na_position='last')
+    pq.write_table(_log_frame_to_table(df), run_path, row_group_size=batch_rows)
+    return processed_lines, len(df), skipped_lines
+
+def _merge_key(table: pa.Table) -> np.ndarray:
+    """Clave de mezcla: 'marca de tiempo' con las fechas no válidas (NaN) como +inf, para que vayan al final."""
+    timestamps = table.column('marca de tiempo').to_numpy().astype('float64')
+    return np.where(np.isnan(timestamps), np.inf, timestamps)
+
+def _merge_sorted_runs(run_paths: list[str], writer: pq.ParquetWriter, batch_rows: int) -> None:
+    """
+    Mezcla k ficheros Parquet ordenados por 'marca de tiempo' (ver _parse_log_file_to_sorted_run)
+    escribiendo el resultado ordenado en writer, con memoria acotada a un lote por fichero.
+    En cada paso se emiten a la vez todas las filas de los lotes en memoria hasta la marca de
+    tiempo de corte (la menor de las últimas marcas de los lotes de ficheros no agotados).
+    Los empates se ordenan por fichero y luego por posición, como una ordenación estable
+    global de los ficheros concatenados en el orden de run_paths.
+    """
+    readers = [pq.ParquetFile(path).iter_batches(batch_size=batch_rows) for path in run_paths]
+    buffers = [None] * len(readers) # (tabla, clave) del lote en memoria de cada fichero
+    exhausted = [False] * len(readers)
+    while True:
+        for i, reader in enumerate(readers):
+            if buffers[i] is None and not exhausted[i]:
+                batch = next(reader, None)
+                if batch is None:
+                    exhausted[i] = True
+                else:
+                    table = pa.Table.from_batches([batch]).cast(writer.schema)
+                    buffers[i] = (table, _merge_key(table))
+        active = [i for i, buffer in enumerate(buffers) if buffer is not None]
+        if not active:
+            break
+
+        # Un fichero no agotado puede tener más filas con su última marca de tiempo: los empates
+        # con el corte de los ficheros posteriores al primero en esa situación esperan al siguiente paso
+        pending_last_keys = {i: buffers[i][1][-1] for i in active if not exhausted[i]}
+        cutoff = min(pending_last_keys.values(), default=np.inf)
+        cutoff_run = min((i for i, key in pending_last_keys.items() if key == cutoff), default=len(readers))
+
+        tables = []
+        keys = []
+        for i in active:
+            table, key = buffers[i]
+            n_rows = np.searchsorted(key, cutoff, side='right' if i <= cutoff_run else 'left')
+            tables.append(table.slice(0, n_rows))
+            keys.append(key[:n_rows])
+            buffers[i] = (table.slice(n_rows), key[n_rows:]) if n_rows < len(key) else None
+        merged = pa.concat_tables(tables)
+        if merged.num_rows:
+            writer.write_table(merged.take(np.argsort(np.concatenate(keys), kind='stable')))
+
+def ingest_log_files(log_source: str, parquet_path: str, n_workers: int | None = None,
+                     tokenizer: str = 'regex', batch_rows: int = 500000) -> tuple[int, int, int] | None:
+    """
+    Ingiere varios ficheros log (p.ej. los logs rotados de cada día) en un único Parquet
+    ordenado por 'marca de tiempo', sin concatenarlos en memoria ni ordenarlos globalmente:
+    cada fichero se parsea en un proceso del pool y se guarda ordenado en un Parquet temporal,
+    y después se mezclan los k ficheros ordenados por lotes de batch_rows filas.
+    Las filas con la misma marca de tiempo quedan en el orden de los ficheros (por nombre)
+    y, dentro de cada fichero, en el orden del log.
+
+    Args:
+        log_source (str): Directorio, patrón glob o fichero (ver resolve_log_paths). Los ficheros
+            pueden estar comprimidos (ver load_log_data).
+        parquet_path (str): Ruta del fichero Parquet a generar.
+        n_workers (int | None): Número de procesos para parsear ficheros a la vez. None o 1 los
+            parsea uno tras otro en el proceso actual.
+        tokenizer (str): Tokenizador de líneas (ver LOG_TOKENIZERS).
+        batch_rows (int): Filas por lote en la mezcla y por row group del Parquet de salida.
+
+    Returns:
+        tuple[int, int, int] | None: (líneas leídas, filas escritas, líneas omitidas), o None si ocurre un error.
+    """
+    if tokenizer not in LOG_TOKENIZERS:
+        print(f"Error: tokenizador '{tokenizer}' no válido. Opciones: {', '.join(LOG_TOKENIZERS)}")
+        return None
+    log_paths = resolve_log_paths(log_source)
+    if not log_paths:
+        print(f"Error: No se encontraron ficheros log en {log_source}.")
+        return None
+    print(f"Ingiriendo {len(log_paths)} ficheros log desde {log_source}...")
+
+    output_dir = os.path.dirname(parquet_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"Directorio creado: {output_dir}")
+
+    runs_dir = tempfile.mkdtemp(prefix='log_runs_', dir=output_dir or None)
+    writer = None
+    try:
+        tasks = [(path, os.path.join(runs_dir, f'{i:05d}.parquet'), tokenizer, batch_rows) for i, path in enumerate(log_paths)]
+        if n_workers is not None and n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                results = list(executor.map(_parse_log_file_to_sorted_run, tasks))
+        else:
+            results = [_parse_log_file_to_sorted_run(task) for task in tasks]
+
+        processed_lines = sum(result[0] for result in results)
+        written_rows = sum(result[1] for result in results)
+        skipped_lines = sum(result[2] for result in results)
+        for log_path, (file_processed, file_written, file_skipped) in zip(log_paths, results):
+            print(f"  {log_path}: {file_processed} líneas, {file_written} válidas, {file_skipped} omitidas")
+
+        run_paths = [task[1] for task, result in zip(tasks, results) if result[1] > 0]
+        if not run_paths:
+            print("No se pudieron parsear datos válidos de los ficheros log.")
+            return None
+
+        print(f"Mezclando {len(run_paths)} ficheros ordenados por marca de tiempo...")
+        writer = pq.ParquetWriter(parquet_path, pq.read_schema(run_paths[0]))
+        _merge_sorted_runs(run_paths, writer, batch_rows)
+    except FileNotFoundError as e:
+        print(f"Error: El archivo {e.filename} no fue encontrado.")
+        return None
+    except Exception as e:
+        print(f"Ocurrió un error al ingerir los ficheros log: {e}")
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+        shutil.rmtree(runs_dir, ignore_errors=True)
+
+    print(f"Ingesta finalizada. Total líneas leídas: {processed_lines}, Filas escritas: {written_rows}, Líneas omitidas/no parseadas: {skipped_lines}")
+    print(f"Datos parseados y ordenados guardados en: {parquet_path}")
+    return processed_lines, written_rows, skipped_lines
+
 def get_top_extensions(df: pd.DataFrame, top_n: int = 10, save_to_csv_path: str | None = None) -> pd.DataFrame:
     """
     Usa la columna pre-calculada 'Extensión' del DataFrame, cuenta sus ocurrencias y 
@@ -228,7 +692,7 @@ def generate_all_extensions_report(df: pd.DataFrame, save_path: str | None = Non
     extension_counts.columns = ['Extensión', 'Número de Repeticiones']
     
     # Reemplazar NaN en la columna 'Extensión' por una cadena representativa si existiera
-    # (aunque _extract_extension_from_page está diseñado para devolver "")
+    # (aunque extract_extension_from_page está diseñado para devolver "")
     extension_counts['Extensión'] = extension_counts['Extensión'].fillna('[NaN_Ext]')
 
     print(f"Número total de tipos de extensiones únicas (incluyendo sin extensión y NaN si los hubiera): {len(extension_counts)}")
@@ -250,7 +714,38 @@ def generate_all_extensions_report(df: pd.DataFrame, save_path: str | None = Non
             
     return extension_counts
 
-def identify_bots_by_robots_txt(df: pd.DataFrame, save_path_details: str | None = None, save_path_summary: str | None = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def save_bot_tables(
+    bots_details_df: pd.DataFrame, bot_proportions_df: pd.DataFrame,
+    save_path_details: str | None = None, save_path_summary: str | None = None
+) -> None:
+    """
+    Guarda las tablas de identify_bots_by_robots_txt (detalles de bots y resumen de proporciones)
+    en las rutas indicadas; también se usa cuando la etapa de bots se recupera de la caché.
+    """
+    if save_path_details and not bots_details_df.empty:
+        try:
+            output_dir_details = os.path.dirname(save_path_details)
+            if output_dir_details and not os.path.exists(output_dir_details):
+                os.makedirs(output_dir_details)
+            bots_details_df.to_csv(save_path_details, index=False)
+            print(f"Tabla de detalles de bots guardada en: {save_path_details}")
+        except Exception as e:
+            print(f"Error al guardar la tabla de detalles de bots: {e}")
+
+    if save_path_summary:
+        try:
+            output_dir_summary = os.path.dirname(save_path_summary)
+            if output_dir_summary and not os.path.exists(output_dir_summary):
+                os.makedirs(output_dir_summary)
+            bot_proportions_df.to_csv(save_path_summary, index=False)
+            print(f"Tabla de resumen de proporciones de bots guardada en: {save_path_summary}")
+        except Exception as e:
+            print(f"Error al guardar la tabla de resumen de proporciones de bots: {e}")
+
+def identify_bots_by_robots_txt(
+    df: pd.DataFrame, save_path_details: str | None = None, save_path_summary: str | None = None,
+    known_bot_hosts: set | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Identifica hosts que accedieron a '/robots.txt' como bots, añade una columna 'Is_Bot' al DataFrame,
     y genera tablas de resumen de los bots identificados y sus proporciones.
@@ -259,6 +754,8 @@ def identify_bots_by_robots_txt(df: pd.DataFrame, save_path_details: str | None
         df (pd.DataFrame): El DataFrame de logs de entrada.
         save_path_details (str | None): Ruta para guardar la tabla de detalles de bots.
         save_path_summary (str | None): Ruta para guardar la tabla de resumen de proporciones de bots.
+        known_bot_hosts (set | None): Hosts identificados como bots en lotes anteriores (sesionización
+            incremental): se marcan como bots aunque en este lote no accedan a '/robots.txt'.
 
     Returns:
         tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: 
@@ -275,7 +772,9 @@ def identify_bots_by_robots_txt(df: pd.DataFrame, save_path_details: str | None
 
     # Identificar hosts que accedieron a /robots.txt (insensible a mayúsculas/minúsculas para /robots.txt)
     # Asegurarse de que 'Página' no tenga NaNs que puedan causar problemas con .str
-    bot_hosts = df[df['Página'].fillna('').str.lower() == '/robots.txt']['Host remoto'].unique()
+    bot_hosts = pd.Index(df[df['Página'].fillna('').str.lower() == '/robots.txt']['Host remoto'].unique())
+    if known_bot_hosts:
+        bot_hosts = bot_hosts.union(pd.Index(df['Host remoto'].unique()).intersection(pd.Index(sorted(known_bot_hosts))))
 
     if len(bot_hosts) == 0:
         print("No se identificaron hosts que hayan accedido a '/robots.txt'.")
@@ -310,36 +809,56 @@ def identify_bots_by_robots_txt(df: pd.DataFrame, save_path_details: str | None
     print(overall_bot_proportions_df)
 
     # Guardar tablas si se especificaron las rutas
-    if save_path_details and not identified_bots_details_df.empty:
-        try:
-            output_dir_details = os.path.dirname(save_path_details)
-            if output_dir_details and not os.path.exists(output_dir_details):
-                os.makedirs(output_dir_details)
-            identified_bots_details_df.to_csv(save_path_details, index=False)
-            print(f"Tabla de detalles de bots guardada en: {save_path_details}")
-        except Exception as e:
-            print(f"Error al guardar la tabla de detalles de bots: {e}")
-
-    if save_path_summary:
-        try:
-            output_dir_summary = os.path.dirname(save_path_summary)
-            if output_dir_summary and not os.path.exists(output_dir_summary):
-                os.makedirs(output_dir_summary)
-            overall_bot_proportions_df.to_csv(save_path_summary, index=False)
-            print(f"Tabla de resumen de proporciones de bots guardada en: {save_path_summary}")
-        except Exception as e:
-            print(f"Error al guardar la tabla de resumen de proporciones de bots: {e}")
+    save_bot_tables(identified_bots_details_df, overall_bot_proportions_df, save_path_details, save_path_summary)
             
     return df, identified_bots_details_df, overall_bot_proportions_df
 
+def encode_user_ids(df: pd.DataFrame, user_dictionary: pd.DataFrame | None = None, host_col: str = 'Host remoto') -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Añade la columna 'UserID' como código entero (int32) de cada host remoto.
+    Los códigos se asignan por orden de primera aparición. Si se pasa un diccionario previo,
+    sus códigos se conservan y los hosts nuevos reciben códigos a continuación, de modo que
+    codificar varios lotes seguidos da los mismos códigos que codificar todos los datos a la vez.
+
+    Args:
+        df (pd.DataFrame): DataFrame de entrada con la columna host_col.
+        user_dictionary (pd.DataFrame | None): Diccionario previo con columnas ['UserID', host_col].
+        host_col (str): Columna con el host que identifica al usuario.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: El DataFrame con 'UserID' y el diccionario actualizado
+            (código -> host) para mostrar los códigos con el nombre del host.
+    """
+    if user_dictionary is None:
+        user_dictionary = pd.DataFrame({'UserID': pd.Series(dtype='int32'), host_col: pd.Series(dtype=object)})
+    # Las filas del diccionario están ordenadas por código, así que la posición del host es su código
+    codes = pd.Index(user_dictionary[host_col]).get_indexer(df[host_col])
+    is_new_host = codes == -1
+    if is_new_host.any():
+        new_codes, new_hosts = pd.factorize(df[host_col].to_numpy()[is_new_host])
+        codes[is_new_host] = new_codes + len(user_dictionary)
+        user_dictionary = pd.concat([
+            user_dictionary,
+            pd.DataFrame({'UserID': np.arange(len(new_hosts)) + len(user_dictionary), host_col: np.asarray(new_hosts, dtype=object)})
+        ], ignore_index=True)
+    df['UserID'] = codes.astype('int32')
+    user_dictionary['UserID'] = user_dictionary['UserID'].astype('int32')
+    return df, user_dictionary
+
+def _make_session_ids(user_codes: pd.Series, session_counters: pd.Series) -> pd.Series:
+    """Combina código de usuario y contador de sesión en un SessionID entero (int64)."""
+    return user_codes.astype('int64') * (1 << SESSION_COUNTER_BITS) + session_counters.astype('int64')
+
 def identify_sessions(df: pd.DataFrame, user_col: str = 'UserID', timestamp_col: str = 'marca de tiempo', timeout_seconds: int = 1800) -> pd.DataFrame:
     """
     Identifica sesiones de usuario basadas en un timeout entre hits consecutivos.
-    Añade una columna 'SessionID' al DataFrame.
+    Añade una columna 'SessionID' entera (int64) que combina el código de usuario y el número
+    de sesión del usuario (ver _make_session_ids).
 
     Args:
         df (pd.DataFrame): DataFrame de entrada. Debe tener user_col y timestamp_col.
-        user_col (str): Nombre de la columna con el identificador de usuario.
+        user_col (str): Nombre de la columna con el identificador de usuario. Se espera un código
+            entero (ver encode_user_ids); otros valores se codifican por orden de aparición.
         timestamp_col (str): Nombre de la columna con la marca de tiempo en segundos.
         timeout_seconds (int): Umbral de tiempo en segundos para definir una nueva sesión.
 
@@ -369,15 +888,294 @@ def identify_sessions(df: pd.DataFrame, user_col: str = 'UserID', timestamp_col:
     # Crear un contador de sesión para cada usuario
     df_sorted['_session_increment'] = df_sorted.groupby(user_col)['_is_new_session_start'].cumsum()
 
-    # Crear el SessionID combinando UserID y el contador de sesión
-    df_sorted['SessionID'] = df_sorted[user_col].astype(str) + "_" + df_sorted['_session_increment'].astype(str)
+    # Crear el SessionID combinando el código de usuario y el contador de sesión
+    user_codes = df_sorted[user_col]
+    if not pd.api.types.is_integer_dtype(user_codes):
+        user_codes = pd.Series(pd.factorize(user_codes)[0], index=df_sorted.index)
+    df_sorted['SessionID'] = _make_session_ids(user_codes, df_sorted['_session_increment'])
 
     # Eliminar columnas intermedias
     df_out = df_sorted.drop(columns=['time_diff_prev_hit', '_is_new_session_start', '_session_increment'])
+    # Ordenado por usuario y tiempo, el SessionID (código de usuario en los bits altos) queda también ordenado
+    df_out.attrs['sort_order'] = ['SessionID', timestamp_col]
     
     print(f"Columna 'SessionID' creada. Número de sesiones únicas identificadas: {df_out['SessionID'].nunique()}")
     return df_out
 
+# Fichero de estado de la sesionización incremental: una fila por usuario con la marca de tiempo
+# de su último hit y su contador de sesión. La versión del formato, el timeout con el que se generó
+# y los hosts ya identificados como bots se guardan como metadatos clave-valor del Parquet.
+SESSION_STATE_VERSION = 1
+
+def _empty_session_state(user_col: str = 'UserID') -> pd.DataFrame:
+    return pd.DataFrame({
+        user_col: pd.Series(dtype='int32'),
+        'last_timestamp': pd.Series(dtype='float64'),
+        'session_counter': pd.Series(dtype='int64')
+    })
+
+def load_session_state(state_path: str, timeout_seconds: int, user_col: str = 'UserID') -> tuple[pd.DataFrame, set] | None:
+    """
+    Lee el estado guardado por save_session_state: (estado por usuario, hosts de bots conocidos).
+    Si state_path no existe devuelve un estado vacío. Devuelve None si el fichero es de otra
+    versión o se generó con otro timeout (continuar con él daría sesiones incorrectas).
+    """
+    if not os.path.exists(state_path):
+        print(f"No existe el estado de sesiones {state_path}; se empieza con un estado vacío.")
+        return _empty_session_state(user_col), set()
+    try:
+        table = pq.read_table(state_path)
+    except Exception as e:
+        print(f"Error al leer el estado de sesiones {state_path}: {e}")
+        return None
+    metadata = table.schema.metadata or {}
+    version = metadata.get(b'session_state_version')
+    if version is None or int(version) != SESSION_STATE_VERSION:
+        print(f"Error: El estado en {state_path} tiene otra versión de formato ({version}, se esperaba {SESSION_STATE_VERSION}).")
+        return None
+    state_timeout = int(metadata[b'timeout_seconds'])
+    if state_timeout != timeout_seconds:
+        print(f"Error: El estado en {state_path} se generó con otro timeout ({state_timeout} s).")
+        return None
+    state = table.to_pandas()
+    known_bot_hosts = set(json.loads(metadata.get(b'known_bot_hosts', b'[]')))
+    print(f"Estado de sesiones cargado para {len(state)} usuarios ({len(known_bot_hosts)} hosts de bots conocidos).")
+    return state, known_bot_hosts
+
+def save_session_state(state_path: str, state: pd.DataFrame, known_bot_hosts: set, timeout_seconds: int) -> None:
+    """Guarda el estado de la sesionización incremental (escribe un temporal y lo renombra)."""
+    table = pa.Table.from_pandas(state, preserve_index=False)
+    table = table.replace_schema_metadata({
+        b'session_state_version': str(SESSION_STATE_VERSION).encode(),
+        b'timeout_seconds': str(timeout_seconds).encode(),
+        b'known_bot_hosts': json.dumps(sorted(known_bot_hosts)).encode(),
+    })
+    state_dir = os.path.dirname(state_path)
+    if state_dir and not os.path.exists(state_dir):
+        os.makedirs(state_dir)
+    tmp_state_path = state_path + '.tmp'
+    pq.write_table(table, tmp_state_path)
+    os.replace(tmp_state_path, state_path)
+    print(f"Estado de sesiones guardado en: {state_path} ({len(state)} usuarios)")
+
+def identify_sessions_incremental(
+    df_new: pd.DataFrame,
+    state: pd.DataFrame,
+    user_col: str = 'UserID',
+    timestamp_col: str = 'marca de tiempo',
+    timeout_seconds: int = 1800
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Identifica sesiones en un lote nuevo de hits continuando las sesiones de lotes anteriores.
+    state tiene, por cada usuario, la marca de tiempo de su último hit y su contador de sesión
+    actual (ver load_session_state): el primer hit de un usuario en el lote continúa su última
+    sesión si no han pasado más de timeout_seconds, y si no abre la siguiente.
+    Si los lotes se añaden en orden temporal (cada hit nuevo de un usuario es posterior a los
+    ya procesados) y los códigos de usuario se mantienen entre lotes (encode_user_ids con el
+    diccionario anterior), los SessionID coinciden con los de identify_sessions sobre todos los datos.
+    El estado actualizado se devuelve sin guardarlo: el llamador lo guarda (save_session_state)
+    después de guardar el lote, para que un lote que falla al guardarse se pueda repetir.
+
+    Args:
+        df_new (pd.DataFrame): Lote nuevo de hits. Debe tener user_col (códigos enteros) y timestamp_col.
+        state (pd.DataFrame): Estado por usuario con columnas [user_col, 'last_timestamp', 'session_counter'].
+        user_col (str): Nombre de la columna con el identificador de usuario.
+        timestamp_col (str): Nombre de la columna con la marca de tiempo en segundos.
+        timeout_seconds (int): Umbral de tiempo en segundos para definir una nueva sesión.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: El lote con la columna 'SessionID' añadida y el estado actualizado.
+    """
+    print(f"\nIdentificando sesiones de forma incremental con un timeout de {timeout_seconds / 60} minutos...")
+    if user_col not in df_new.columns or timestamp_col not in df_new.columns:
+        print(f"Error: Las columnas '{user_col}' y/o '{timestamp_col}' son necesarias y no se encuentran.")
+        return df_new, state
+    if not pd.api.types.is_integer_dtype(df_new[user_col]):
+        print(f"Error: La columna '{user_col}' debe contener códigos enteros estables entre lotes (ver encode_user_ids).")
+        return df_new, state
+    state = state.set_index(user_col)
+
+    df_sorted = df_new.sort_values(by=[user_col, timestamp_col])
+    time_diff_prev_hit = df_sorted.groupby(user_col)[timestamp_col].diff()
+
+    # Para el primer hit de cada usuario en el lote, la diferencia se mide con su último hit guardado
+    is_first_in_batch = ~df_sorted[user_col].duplicated()
+    previous_last_hit = df_sorted.loc[is_first_in_batch, user_col].map(state['last_timestamp'])
+    time_diff_prev_hit[is_first_in_batch] = df_sorted.loc[is_first_in_batch, timestamp_col] - previous_last_hit
+
+    is_new_session_start = time_diff_prev_hit.isnull() | (time_diff_prev_hit > timeout_seconds)
+    base_counter = df_sorted[user_col].map(state['session_counter']).fillna(0).astype('int64')
+    session_counter = base_counter + is_new_session_start.groupby(df_sorted[user_col]).cumsum()
+
+    df_out = df_sorted.copy()
+    df_out['SessionID'] = _make_session_ids(df_sorted[user_col], session_counter)
+    df_out.attrs['sort_order'] = ['SessionID', timestamp_col]
+
+    # Actualizar el estado con el último hit y el último contador de cada usuario del lote
+    is_last_in_batch = ~df_sorted[user_col].duplicated(keep='last')
+    batch_state = pd.DataFrame({
+        'last_timestamp': df_sorted.loc[is_last_in_batch, timestamp_col].to_numpy(),
+        'session_counter': session_counter[is_last_in_batch].to_numpy()
+    }, index=pd.Index(df_sorted.loc[is_last_in_batch, user_col], name=user_col))
+    new_state = pd.concat([state[~state.index.isin(batch_state.index)], batch_state]).reset_index()
+
+    print(f"Columna 'SessionID' creada. Sesiones en el lote: {df_out['SessionID'].nunique()}. Usuarios en el estado: {len(new_state)}")
+    return df_out, new_state
+
+def _partition_keys(df: pd.DataFrame, partition_by: str) -> pd.Series:
+    """Clave de partición (PARTITION_FORMATS[partition_by]) de cada hit, o 'desconocido' sin marca de tiempo."""
+    partition_format = PARTITION_FORMATS[partition_by]
+    utc_times = pd.to_datetime(df['marca de tiempo'] + REFERENCE_EPOCH_SECONDS, unit='s', utc=True)
+    return map_unique_values(
+        utc_times.dt.floor('h' if partition_by == 'hour' else 'D'),
+        lambda t: 'desconocido' if pd.isna(t) else t.strftime(partition_format)
+    )
+
+def write_partitioned_dataset(df: pd.DataFrame, dataset_path: str, partition_by: str = 'day') -> None:
+    """
+    Escribe df como conjunto Parquet particionado por día ('day') u hora ('hour') UTC de cada hit,
+    calculados a partir de 'marca de tiempo'. El contenido previo de dataset_path se sustituye.
+    Los hits sin marca de tiempo van a la partición 'desconocido'.
+    """
+    if partition_by not in PARTITION_FORMATS:
+        print(f"Error: partition_by debe ser uno de {list(PARTITION_FORMATS)}, no '{partition_by}'.")
+        return
+    partition_keys = _partition_keys(df, partition_by)
+    df_out = df.assign(**{PARTITION_COLUMN: partition_keys})
+    # Al leer el conjunto las filas quedan agrupadas por partición, ya no por sesión y tiempo
+    df_out.attrs.pop('sort_order', None)
+
+    if os.path.exists(dataset_path):
+        shutil.rmtree(dataset_path)
+    table = pa.Table.from_pandas(df_out, preserve_index=False)
+    pq.write_to_dataset(
+        table, dataset_path, partition_cols=[PARTITION_COLUMN],
+        preserve_order=True, max_partitions=partition_keys.nunique() + 1
+    )
+    print(f"Conjunto particionado por '{partition_by}' guardado en: {dataset_path} ({partition_keys.nunique()} particiones)")
+
+def _merge_processed_hits(existing: pd.DataFrame | None, df_batch: pd.DataFrame, drop_hosts: set) -> pd.DataFrame:
+    """Hits guardados (sin los de drop_hosts) más los del lote, con el esquema procesado y ordenados por sesión y tiempo."""
+    frames = [df_batch]
+    if existing is not None:
+        frames.insert(0, existing[~existing['Host remoto'].isin(list(drop_hosts))] if drop_hosts else existing)
+    return sort_by_session_time(apply_processed_schema(pd.concat(frames, ignore_index=True)))
+
+def merge_processed_batch(
+    df_batch: pd.DataFrame, processed_path: str, partition_by: str, drop_hosts: set | None = None
+) -> None:
+    """
+    Añade un lote de la sesionización incremental al conjunto particionado por partition_by ('day' u
+    'hour', ver write_partitioned_dataset) guardado en processed_path, de modo que el resultado es el
+    mismo que procesar todos los lotes juntos: las sesiones que continúan de lotes anteriores conservan
+    sus hits guardados, y los hits guardados de drop_hosts (hosts que el lote identifica como bots por
+    primera vez) se eliminan. Solo se leen y reescriben las particiones con hits del lote o de drop_hosts,
+    no todo el histórico; por eso no hay versión para un único Parquet. Cada partición se escribe en un
+    directorio temporal que después se renombra.
+    """
+    drop_hosts = drop_hosts or set()
+    if partition_by not in PARTITION_FORMATS:
+        print(f"Error: partition_by debe ser uno de {list(PARTITION_FORMATS)}, no '{partition_by}'.")
+        return
+    if not os.path.isdir(processed_path):
+        write_partitioned_dataset(df_batch, processed_path, partition_by)
+        return
+
+    batch_keys = _partition_keys(df_batch, partition_by)
+    keys_to_rewrite = set(batch_keys.unique())
+    partition_prefix = PARTITION_COLUMN + '='
+    if drop_hosts:
+        for name in os.listdir(processed_path):
+            if name.startswith(partition_prefix):
+                hosts = pd.read_parquet(os.path.join(processed_path, name), columns=['Host remoto'])['Host remoto']
+                if hosts.isin(list(drop_hosts)).any():
+                    keys_to_rewrite.add(name[len(partition_prefix):])
+    for key in sorted(keys_to_rewrite):
+        partition_dir = os.path.join(processed_path, partition_prefix + key)
+        existing = pd.read_parquet(partition_dir) if os.path.isdir(partition_dir) else None
+        df_partition = _merge_processed_hits(existing, df_batch[batch_keys == key], drop_hosts)
+        df_partition.attrs.pop('sort_order', None)
+        if df_partition.empty: # Solo tenía hits de drop_hosts
+            shutil.rmtree(partition_dir)
+            continue
+        # Los nombres que empiezan por '.' no los lee pyarrow como particiones
+        tmp_dir = os.path.join(processed_path, f'.{partition_prefix}{key}.tmp')
+        old_dir = os.path.join(processed_path, f'.{partition_prefix}{key}.old')
+        for leftover in (tmp_dir, old_dir):
+            if os.path.exists(leftover):
+                shutil.rmtree(leftover)
+        os.makedirs(tmp_dir)
+        df_partition.to_parquet(os.path.join(tmp_dir, 'part-0.parquet'), index=False)
+        if os.path.isdir(partition_dir):
+            os.replace(partition_dir, old_dir)
+        os.replace(tmp_dir, partition_dir)
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+    print(f"Lote añadido a {processed_path}: {len(df_batch)} hits nuevos en {len(keys_to_rewrite)} particiones reescritas.")
+
+# Caché de etapas del pipeline de __main__ (opcional; solo se guardan las etapas costosas: el parseo y
+# los bots). La clave de cada etapa encadena la de la etapa anterior con su nombre y sus parámetros; la
+# primera parte del hash del contenido del log y del código de este módulo y de log_common.py
+# (module_code_hash). Cambiar un parámetro (p.ej. las extensiones) solo invalida esa etapa y las siguientes.
+
+def file_content_hash(file_path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    """Hash SHA-256 del contenido de un fichero, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def module_code_hash(module_path: str) -> str:
+    """
+    Hash SHA-256 del código de un módulo sin su bloque __main__: los ajustes del script
+    (timeout, extensiones...) entran en las claves como parámetros de cada etapa, de modo
+    que cambiarlos no invalida las etapas anteriores.
+    """
+    with open(module_path, 'r', encoding='utf-8') as f:
+        library_code = f.read().split("\nif __name__ == '__main__':")[0]
+    return hashlib.sha256(library_code.encode('utf-8')).hexdigest()
+
+def stage_cache_key(parent_key: str, stage_name: str, params: dict | None = None) -> str:
+    """Clave de una etapa: hash de la clave de la etapa anterior, el nombre y los parámetros (los sets se ordenan)."""
+    payload = json.dumps([parent_key, stage_name, params or {}], sort_keys=True, default=sorted)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def run_cached_stage(cache_dir: str | None, stage_name: str, key: str, compute):
+    """
+    Devuelve el resultado de compute() (un DataFrame o una tupla de DataFrames) para la etapa stage_name,
+    reutilizando el guardado en cache_dir/<stage_name>-<clave>/ si existe. Solo se conserva la última
+    entrada de cada etapa. Con cache_dir None simplemente ejecuta compute().
+    """
+    if not cache_dir:
+        return compute()
+    entry_dir = os.path.join(cache_dir, f"{stage_name}-{key[:16]}")
+    if os.path.isdir(entry_dir):
+        part_files = sorted(name for name in os.listdir(entry_dir) if name.endswith('.parquet'))
+        parts = [pd.read_parquet(os.path.join(entry_dir, name)) for name in part_files]
+        print(f"\nEtapa '{stage_name}' recuperada de la caché: {entry_dir}")
+        return parts[0] if len(parts) == 1 else tuple(parts)
+
+    result = compute()
+    if result is None:
+        return None
+    parts = result if isinstance(result, tuple) else (result,)
+    if any(part is None for part in parts):
+        return result
+    # Escribir en un directorio temporal y renombrarlo para no dejar entradas a medias
+    tmp_entry_dir = entry_dir + '.tmp'
+    if os.path.exists(tmp_entry_dir):
+        shutil.rmtree(tmp_entry_dir)
+    os.makedirs(tmp_entry_dir)
+    for i, part in enumerate(parts):
+        part.to_parquet(os.path.join(tmp_entry_dir, f"{i:02d}.parquet"))
+    for name in os.listdir(cache_dir):
+        if name.startswith(f"{stage_name}-") and not name.endswith('.tmp'):
+            shutil.rmtree(os.path.join(cache_dir, name))
+    os.replace(tmp_entry_dir, entry_dir)
+    print(f"Etapa '{stage_name}' guardada en la caché: {entry_dir}")
+    return result
+
 if __name__ == '__main__':
     # Get the absolute path of the directory where this script is located (src/)
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -387,26 +1185,94 @@ if __name__ == '__main__':
     
     # Construct the absolute path to the log file
     log_file_name = 'NASA_access_log_FULL.txt' # O usa 'NASA_access_log_sample_for_testing.txt' para pruebas
+    # También puede ser un directorio o un patrón glob (p.ej. 'NASA_access_log_*.gz') con varios
+    # ficheros rotados: se parsean en paralelo y se mezclan por marca de tiempo (ver ingest_log_files)
     log_path = os.path.join(project_root, 'datos', log_file_name)
     log_path = os.path.normpath(log_path) # Normalize the path (e.g., src/../datos -> datos)
+    log_paths = resolve_log_paths(log_path)
 
     # output_base_dir is already robustly defined relative to script_dir
     output_base_dir = os.path.join(project_root, 'output', 'tables') # Adjusted to be from project_root too for consistency
     output_base_dir = os.path.normpath(output_base_dir)
 
-    print(f"Intentando cargar el log desde la ruta: {log_path}")
-    df_log = load_log_data(log_path)
-    
-    if df_log is not None:
+    # Procesos para el parseo paralelo del log (None o 1 para parsear secuencialmente)
+    n_workers = os.cpu_count()
+
+    # Si se indica, el log se parsea por lotes de este número de líneas y se vuelca
+    # incrementalmente a Parquet, sin mantener todas las líneas parseadas en memoria. Solo acota
+    # la memoria del parseo: las etapas siguientes cargan la tabla completa desde ese Parquet
+    streaming_batch_lines = None
+
+    # Fichero de estado para la sesionización incremental de logs añadidos (None para recalcular todo).
+    # Requiere processed_partition_by: cada lote solo reescribe las particiones que toca
+    # (en analysis.py, processed_dataset_name = 'processed_log_data')
+    session_state_path = None
+
+    # 'day' u 'hour' para guardar los datos procesados como conjunto particionado en
+    # output/processed_log_data/ (ver write_partitioned_dataset) en lugar de un único Parquet
+    processed_partition_by = None
+
+    # Tokenizador de líneas del log: 'regex' (LOG_PATTERN) o 'split' (vectorizado con pyarrow);
+    # ambos dan el mismo resultado
+    log_tokenizer = 'split'
+
+    # Timeout de inactividad (segundos) que separa dos sesiones de un mismo usuario
+    session_timeout_seconds = 1800
+
+    # Directorio de la caché de las etapas costosas (parseo y bots), p.ej.
+    # os.path.join(project_root, 'output', 'stage_cache'); cada entrada es una copia en Parquet de la
+    # tabla de hits, así que está desactivada por defecto (None recalcula siempre todas las etapas)
+    stage_cache_dir = None
+    if stage_cache_dir and not os.path.exists(stage_cache_dir):
+        os.makedirs(stage_cache_dir)
+
+    def parse_stage():
+        print(f"Intentando cargar el log desde la ruta: {log_path}")
+        if len(log_paths) != 1 or os.path.isdir(log_path):
+            raw_data_path = os.path.join(project_root, 'output', 'raw_log_data.parquet')
+            ingest_result = ingest_log_files(log_path, raw_data_path, n_workers=n_workers, tokenizer=log_tokenizer)
+            df_parsed = pd.read_parquet(raw_data_path) if ingest_result is not None else None
+        elif streaming_batch_lines:
+            raw_data_path = os.path.join(project_root, 'output', 'raw_log_data.parquet')
+            stream_result = stream_log_to_parquet(log_paths[0], raw_data_path, batch_lines=streaming_batch_lines)
+            df_parsed = pd.read_parquet(raw_data_path) if stream_result is not None else None
+        else:
+            df_parsed = load_log_data(log_paths[0], n_workers=n_workers, tokenizer=log_tokenizer)
+        if df_parsed is None:
+            return None
         print("\nPrimeras 5 líneas del DataFrame resultante (antes de añadir 'Extensión'):")
-        print(df_log.head())
-        
+        print(df_parsed.head())
+
         # Crear la columna 'Extensión' en el DataFrame principal
         print("\nCreando columna 'Extensión' en el DataFrame principal...")
-        df_log['Extensión'] = df_log['Página'].apply(_extract_extension_from_page)
+        df_parsed['Extensión'] = map_unique_values(df_parsed['Página'], extract_extension_from_page)
         print("Columna 'Extensión' creada.")
-        print(f"Número de valores únicos en 'Extensión' (incluyendo vacíos): {df_log['Extensión'].nunique()}")
-        print(df_log[['Página', 'Extensión']].head())
+        print(f"Número de valores únicos en 'Extensión' (incluyendo vacíos): {df_parsed['Extensión'].nunique()}")
+        print(df_parsed[['Página', 'Extensión']].head())
+        return df_parsed
+
+    # La primera clave depende del contenido del log y del código de este módulo y de log_common.py; el modo de
+    # parseo (paralelo, por lotes, tokenizador) no cambia el resultado y no forma parte de la clave
+    if stage_cache_dir and log_paths and all(os.path.exists(path) for path in log_paths):
+        input_hash = file_content_hash(log_paths[0]) if len(log_paths) == 1 else stage_cache_key(
+            '', 'entrada', {'files': [file_content_hash(path) for path in log_paths]})
+        parse_key = stage_cache_key(input_hash, 'parseo', {'code': [
+            module_code_hash(os.path.abspath(__file__)), module_code_hash(os.path.join(script_dir, 'log_common.py'))
+        ]})
+    else:
+        parse_key = None
+    # En modo incremental el estado de los lotes anteriores (última sesión de cada usuario y hosts
+    # ya identificados como bots) se lee antes de procesar el lote; si no es compatible no se procesa
+    session_state = load_session_state(session_state_path, session_timeout_seconds) if session_state_path else None
+    if session_state_path and not processed_partition_by:
+        print("Error: el modo incremental (session_state_path) requiere processed_partition_by ('day' u 'hour').")
+        df_log = None
+    elif session_state_path and session_state is None:
+        df_log = None
+    else:
+        df_log = run_cached_stage(stage_cache_dir if parse_key else None, 'parseo', parse_key, parse_stage)
+    
+    if df_log is not None:
 
         print("\nInformación del DataFrame (después de añadir 'Extensión'):")
         df_log.info()
@@ -425,6 +1291,8 @@ if __name__ == '__main__':
             'htm', 'html', 'pdf', 'asp', 'exe',
             'txt', 'doc', 'ppt', 'xls', 'xml'
         }
+        # El filtro es rápido: no se guarda en la caché, pero sus parámetros forman parte de la clave de los bots
+        filter_key = stage_cache_key(parse_key, 'filtro_extensiones', {'extensions': EXTENSIONS_TO_KEEP}) if parse_key else None
         df_log_filtered = filter_dataframe_by_extensions(df_log, EXTENSIONS_TO_KEEP)
         
         print("\nInformación del DataFrame filtrado (antes de identificar bots):")
@@ -435,11 +1303,18 @@ if __name__ == '__main__':
         bots_details_csv_path = os.path.join(output_base_dir, 'identified_bots_details.csv')
         bot_proportions_csv_path = os.path.join(output_base_dir, 'bot_proportions_summary.csv')
         
-        df_log_with_bot_flag, bots_details_table, bot_proportions_table = identify_bots_by_robots_txt(
-            df_log_filtered.copy(), 
-            save_path_details=bots_details_csv_path,
-            save_path_summary=bot_proportions_csv_path
+        # Las tablas de bots se escriben después de la etapa, también si se recupera de la caché.
+        # En modo incremental los hosts ya identificados como bots en lotes anteriores se siguen marcando
+        # como bots, y la etapa no se cachea porque depende del estado guardado
+        known_bot_hosts = session_state[1] if session_state_path else set()
+        bots_key = stage_cache_key(filter_key, 'bots') if filter_key and not session_state_path else None
+        df_log_with_bot_flag, bots_details_table, bot_proportions_table = run_cached_stage(
+            stage_cache_dir if bots_key else None, 'bots', bots_key,
+            lambda: identify_bots_by_robots_txt(df_log_filtered.copy(), known_bot_hosts=known_bot_hosts)
         )
+        save_bot_tables(bots_details_table, bot_proportions_table, bots_details_csv_path, bot_proportions_csv_path)
+        # Hosts que este lote identifica como bots por primera vez: sus hits de lotes anteriores se eliminan
+        new_bot_hosts = set(bots_details_table['Bot Host Remoto']) - known_bot_hosts
         
         # print("\nInformación del DataFrame después de añadir la bandera 'Is_Bot':")
         # df_log_with_bot_flag.info()
@@ -455,14 +1330,30 @@ if __name__ == '__main__':
         # print("\nPrimeras 5 filas del DataFrame sin bots (df_log_no_bots):")
         # print(df_log_no_bots.head())
         
-        # 1.4.3. Añadir columna 'UserID' (basada en 'Host remoto')
+        # 1.4.3. Añadir columna 'UserID' (código entero de 'Host remoto')
+        # El diccionario código -> host se guarda junto a los datos procesados para mostrar los
+        # identificadores; en modo incremental se reutiliza para mantener los códigos entre lotes.
         print("\nAñadiendo columna 'UserID'...")
-        df_log_no_bots['UserID'] = df_log_no_bots['Host remoto']
-        print("Columna 'UserID' añadida.")
+        user_dictionary_path = os.path.join(project_root, 'output', 'user_dictionary.parquet')
+        previous_user_dictionary = None
+        if session_state_path and os.path.exists(user_dictionary_path):
+            previous_user_dictionary = pd.read_parquet(user_dictionary_path)
+        df_log_no_bots, user_dictionary = encode_user_ids(df_log_no_bots, previous_user_dictionary)
+        print(f"Columna 'UserID' añadida. Usuarios en el diccionario: {len(user_dictionary)}")
         # print(df_log_no_bots[['Host remoto', 'UserID']].head())
 
         # 1.5.1 & 1.5.2. Identificar sesiones y añadir 'SessionID'
-        df_final_processed = identify_sessions(df_log_no_bots)
+        # Con un fichero de estado, el log se trata como un lote nuevo que continúa las sesiones
+        # de los lotes ya procesados (p.ej. el log de un día más) en lugar de recalcular todo.
+        if session_state_path:
+            df_final_processed, new_user_state = identify_sessions_incremental(
+                df_log_no_bots, session_state[0], timeout_seconds=session_timeout_seconds
+            )
+            # Los nuevos bots dejan de ser usuarios: sus sesiones abiertas salen del estado
+            new_bot_codes = user_dictionary.loc[user_dictionary['Host remoto'].isin(list(new_bot_hosts)), 'UserID']
+            new_user_state = new_user_state[~new_user_state['UserID'].isin(new_bot_codes)]
+        else:
+            df_final_processed = identify_sessions(df_log_no_bots, timeout_seconds=session_timeout_seconds)
         print("\nInformación del DataFrame después de añadir 'SessionID':")
         df_final_processed.info()
         print("\nPrimeras filas del DataFrame con 'SessionID' (ordenado por UserID, marca de tiempo):")
@@ -475,9 +1366,26 @@ if __name__ == '__main__':
             print(f"Directorio creado: {output_processed_data_dir}")
         
         processed_data_path = os.path.join(output_processed_data_dir, 'processed_log_data.parquet')
+        df_final_processed = apply_processed_schema(df_final_processed)
         try:
-            df_final_processed.to_parquet(processed_data_path, index=False)
-            print(f"DataFrame procesado guardado en: {processed_data_path}")
+            if session_state_path:
+                # El lote se añade a los datos de los lotes anteriores y el estado se guarda después
+                # de los datos: si algo falla antes, el lote se puede volver a procesar
+                merge_processed_batch(
+                    df_final_processed, os.path.join(output_processed_data_dir, 'processed_log_data'),
+                    partition_by=processed_partition_by, drop_hosts=new_bot_hosts
+                )
+            elif processed_partition_by:
+                write_partitioned_dataset(
+                    df_final_processed, os.path.join(output_processed_data_dir, 'processed_log_data'), processed_partition_by
+                )
+            else:
+                df_final_processed.to_parquet(processed_data_path, index=False)
+                print(f"DataFrame procesado guardado en: {processed_data_path}")
+            user_dictionary.to_parquet(user_dictionary_path, index=False)
+            print(f"Diccionario de usuarios guardado en: {user_dictionary_path}")
+            if session_state_path:
+                save_session_state(session_state_path, new_user_state, known_bot_hosts | new_bot_hosts, session_timeout_seconds)
         except Exception as e:
             print(f"Error al guardar el DataFrame procesado en Parquet: {e}")
 
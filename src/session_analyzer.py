@@ -3,31 +3,88 @@ import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from sklearn.linear_model import LinearRegression
+from matplotlib.colors import LogNorm
+from log_common import sort_by_session_time
+from streaming_stats import DurationSketch, LinearRegressionAccumulator
+from chart_rendering import ChartRenderer, render_chart, bin_histogram_and_kde, save_binned_arrays, draw_histogram
 
 # Configuración de Seaborn para los gráficos (si es específico de estas funciones o global)
 # sns.set_theme(style="whitegrid") # Puede ser global en el main script
 
-def calculate_session_durations(df: pd.DataFrame) -> pd.Series:
+def build_session_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Construye una tabla con una fila por sesión (índice 'SessionID') en una sola pasada sobre los
+    hits ordenados por sesión y marca de tiempo. Columnas:
+    'start_timestamp', 'end_timestamp', 'num_hits', 'entry_page', 'exit_page', 'start_hour',
+    'mean_page_view_time' y 'num_page_views' (vistas de página con duración calculable).
+    Las funciones de este módulo aceptan esta tabla (session_summary) en lugar de agrupar los hits cada una.
+    """
+    print("\nConstruyendo la tabla resumen de sesiones...")
+    df_sorted = sort_by_session_time(df)
+    session_ids = df_sorted['SessionID'].to_numpy()
+    timestamps = df_sorted['marca de tiempo'].to_numpy(dtype='float64')
+    n_hits = len(df_sorted)
+    if n_hits == 0:
+        return pd.DataFrame(columns=[
+            'start_timestamp', 'end_timestamp', 'num_hits', 'entry_page', 'exit_page',
+            'start_hour', 'mean_page_view_time', 'num_page_views'
+        ], index=pd.Index([], name='SessionID'))
+
+    is_session_start = np.r_[True, session_ids[1:] != session_ids[:-1]]
+    starts = np.flatnonzero(is_session_start)
+    ends = np.r_[starts[1:], n_hits] - 1
+
+    # Tiempo de visualización de cada página: diferencia con el siguiente hit de la misma sesión
+    next_timestamps = np.r_[timestamps[1:], np.nan]
+    page_view_durations = np.where(np.r_[~is_session_start[1:], False], next_timestamps - timestamps, np.nan)
+    is_valid_page_view = page_view_durations >= 0
+    num_page_views = np.add.reduceat(is_valid_page_view.astype('int64'), starts)
+    page_view_time_sum = np.add.reduceat(np.where(is_valid_page_view, page_view_durations, 0.0), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_page_view_time = np.where(num_page_views > 0, page_view_time_sum / num_page_views, np.nan)
+
+    # La página de salida es el primer hit con la marca de tiempo máxima (como idxmax)
+    is_time_run_start = is_session_start | np.r_[True, timestamps[1:] != timestamps[:-1]]
+    time_run_starts = np.maximum.accumulate(np.where(is_time_run_start, np.arange(n_hits), 0))
+
+    summary = pd.DataFrame({
+        'start_timestamp': np.fmin.reduceat(timestamps, starts),
+        'end_timestamp': np.fmax.reduceat(timestamps, starts),
+        'num_hits': ends - starts + 1,
+    }, index=pd.Index(session_ids[starts], name='SessionID'))
+    if 'Página' in df_sorted.columns:
+        pages = df_sorted['Página'].array # Categorical si los datos siguen PROCESSED_SCHEMA
+        summary['entry_page'] = pages[starts]
+        summary['exit_page'] = pages[time_run_starts[ends]]
+    if 'Fecha/Hora' in df_sorted.columns:
+        summary['start_hour'] = df_sorted['Fecha/Hora'].iloc[starts].dt.hour.to_numpy()
+    summary['mean_page_view_time'] = mean_page_view_time
+    summary['num_page_views'] = num_page_views
+
+    print(f"Tabla resumen construida para {len(summary)} sesiones a partir de {n_hits} hits.")
+    return summary
+
+def calculate_session_durations(df: pd.DataFrame | None, session_summary: pd.DataFrame | None = None) -> pd.Series:
     """
     Filtra sesiones que contienen más de una visita y calcula la duración de estas sesiones.
     La duración es la diferencia entre el timestamp del último y primer hit de la sesión.
     Devuelve una Serie de Pandas con las duraciones de las sesiones (en segundos).
+    Si se pasa session_summary (ver build_session_summary) se usa en lugar de agrupar df.
     """
     print("\nCalculando duraciones de sesión para sesiones con más de una visita...")
+    if session_summary is None:
+        session_summary = build_session_summary(df)
     
-    session_hit_counts = df.groupby('SessionID')['marca de tiempo'].count()
-    multi_hit_sessions = session_hit_counts[session_hit_counts > 1].index
+    multi_hit_sessions = session_summary[session_summary['num_hits'] > 1]
     
     if len(multi_hit_sessions) == 0:
         print("No se encontraron sesiones con más de una visita.")
         return pd.Series(dtype='float64')
         
-    print(f"Se encontraron {len(multi_hit_sessions)} sesiones con más de una visita (de un total de {df['SessionID'].nunique()} sesiones).")
+    print(f"Se encontraron {len(multi_hit_sessions)} sesiones con más de una visita (de un total de {len(session_summary)} sesiones).")
     
-    df_multi_hit = df[df['SessionID'].isin(multi_hit_sessions)]
-    session_min_max_times = df_multi_hit.groupby('SessionID')['marca de tiempo'].agg(['min', 'max'])
-    session_durations = session_min_max_times['max'] - session_min_max_times['min']
+    session_durations = multi_hit_sessions['end_timestamp'] - multi_hit_sessions['start_timestamp']
+    session_durations.name = None
     
     print(f"Duraciones calculadas para {len(session_durations)} sesiones.")
     print("Primeras 5 duraciones de sesión (en segundos):")
@@ -35,16 +92,39 @@ def calculate_session_durations(df: pd.DataFrame) -> pd.Series:
     
     return session_durations
 
+def _render_session_duration_histogram(durations_to_plot: pd.Series | dict, title_note: str, file_path: str) -> None:
+    """
+    Dibuja y guarda el histograma de plot_session_duration_histogram (se puede ejecutar en un ChartRenderer)
+    a partir de las duraciones o de sus arrays de bin_histogram_and_kde.
+    """
+    plt.figure(figsize=(12, 7))
+    draw_histogram(durations_to_plot)
+    plt.title(f'Histograma de Duración de Sesión (>1 visita)\n{title_note}')
+    plt.xlabel("Duración de la Sesión (segundos)")
+    plt.ylabel("Número de Sesiones")
+    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+    try:
+        plt.savefig(file_path)
+        print(f"Histograma de duración de sesión guardado en: {file_path}")
+    except Exception as e:
+        print(f"Error al guardar el histograma: {e}")
+    plt.close()
+
 def plot_session_duration_histogram(
     session_durations_seconds: pd.Series, 
     output_dir: str,
     filename: str = "session_duration_histogram.png",
-    threshold_percentile: float | None = 0.99
+    threshold_percentile: float | None = 0.99,
+    renderer: ChartRenderer | None = None,
+    binned: bool = True
 ) -> None:
     """
     Genera y guarda un histograma de la duración de la sesión (para sesiones con >1 visita).
     Las duraciones se esperan en segundos.
     Permite el filtrado de valores atípicos basado en un percentil.
+    Con binned=True el histograma y su KDE se calculan una vez con bin_histogram_and_kde (guardados
+    en un .npz junto al PNG) y el gráfico se dibuja a partir de esos arrays.
+    Con renderer el gráfico se dibuja en su pool de procesos (ver chart_rendering.py).
     """
     if session_durations_seconds.empty:
         print("No hay duraciones de sesión para generar el histograma.")
@@ -71,27 +151,14 @@ def plot_session_duration_histogram(
         description_for_memoria = "No se aplicó filtrado de valores atípicos para este histograma."
     print(description_for_memoria)
 
-    plt.figure(figsize=(12, 7))
-    sns.histplot(durations_to_plot, kde=True, bins='auto') 
-    
-    max_duration_to_plot = durations_to_plot.max()
-    if max_duration_to_plot > 300:
-        plt.title(f'Histograma de Duración de Sesión (>1 visita)\n{description_for_memoria.split(". ")[0]}')
-        plt.xlabel("Duración de la Sesión (segundos)")
-    else:
-        plt.title(f'Histograma de Duración de Sesión (>1 visita)\n{description_for_memoria.split(". ")[0]}')
-        plt.xlabel("Duración de la Sesión (segundos)")
-        
-    plt.ylabel("Número de Sesiones")
-    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-    
     file_path = os.path.join(output_dir, filename)
-    try:
-        plt.savefig(file_path)
-        print(f"Histograma de duración de sesión guardado en: {file_path}")
-    except Exception as e:
-        print(f"Error al guardar el histograma: {e}")
-    plt.close()
+    if binned:
+        durations_to_plot = bin_histogram_and_kde(durations_to_plot)
+        save_binned_arrays(file_path, durations_to_plot)
+    render_chart(
+        _render_session_duration_histogram, durations_to_plot, description_for_memoria.split(". ")[0],
+        file_path, renderer=renderer
+    )
     
     memoria_notes_path = os.path.join(output_dir, "session_duration_histogram_notes.txt")
     with open(memoria_notes_path, "w") as f:
@@ -99,13 +166,15 @@ def plot_session_duration_histogram(
     print(f"Notas para la memoria guardadas en: {memoria_notes_path}")
 
 def get_session_duration_stats(
-    session_durations_seconds: pd.Series, 
+    session_durations_seconds: pd.Series | DurationSketch, 
     output_dir: str,
     filename: str = "session_duration_stats.txt"
 ) -> pd.DataFrame | None:
     """
     Calcula y guarda un resumen estadístico de la duración de la sesión.
     Devuelve un DataFrame con las estadísticas y también las guarda en un archivo.
+    Acepta un DurationSketch en lugar de la Serie para no guardar todas las duraciones
+    (percentiles y moda aproximados, ver su docstring).
     """
     if session_durations_seconds.empty:
         print("No hay duraciones de sesión para calcular estadísticas.")
@@ -135,39 +204,63 @@ def get_session_duration_stats(
         
     return stats_df
 
-def calculate_per_session_avg_page_time(df: pd.DataFrame) -> pd.DataFrame:
+def calculate_per_session_avg_page_time(df: pd.DataFrame | None, session_summary: pd.DataFrame | None = None) -> pd.DataFrame:
     """
     Calculates the average page view time for each session that has more than one hit.
+    Uses session_summary (see build_session_summary) instead of grouping df when given.
     """
     print("\nCalculando el tiempo medio de visualización de página por sesión...")
-    df_sorted = df.sort_values(by=['SessionID', 'marca de tiempo'])
-    df_sorted['page_view_duration'] = df_sorted.groupby('SessionID')['marca de tiempo'].diff().shift(-1)
-    valid_page_durations = df_sorted.dropna(subset=['page_view_duration'])
-    valid_page_durations = valid_page_durations[valid_page_durations['page_view_duration'] >= 0]
+    if session_summary is None:
+        session_summary = build_session_summary(df)
+    sessions_with_page_views = session_summary[session_summary['num_page_views'] > 0]
 
-    if valid_page_durations.empty:
+    if sessions_with_page_views.empty:
         print("No se encontraron vistas de página con duración calculable para promediar por sesión.")
         return pd.DataFrame(columns=['SessionID', 'avg_page_view_time_seconds', 'num_page_views_in_session'])
 
-    session_avg_page_time = valid_page_durations.groupby('SessionID').agg(
-        avg_page_view_time_seconds=('page_view_duration', 'mean'),
-        num_page_views_in_session=('page_view_duration', 'count')
-    ).reset_index()
+    session_avg_page_time = pd.DataFrame({
+        'avg_page_view_time_seconds': sessions_with_page_views['mean_page_view_time'],
+        'num_page_views_in_session': sessions_with_page_views['num_page_views']
+    }).reset_index()
     
     session_avg_page_time_sorted = session_avg_page_time.sort_values(by='avg_page_view_time_seconds')
     
     print(f"Se calculó el tiempo medio por página para {len(session_avg_page_time_sorted)} sesiones.")
     return session_avg_page_time_sorted
 
+def _render_hits_per_session_histogram(counts_to_plot: pd.Series, title_note: str, file_path: str) -> None:
+    """Dibuja y guarda el histograma de plot_hits_per_session_histogram (se puede ejecutar en un ChartRenderer)."""
+    plt.figure(figsize=(12, 7))
+    max_hits = int(counts_to_plot.max())
+    min_hits = int(counts_to_plot.min())
+    if max_hits - min_hits < 50 and max_hits > 0:
+        bins = range(min_hits, max_hits + 2)
+    else:
+        bins = 'auto'
+
+    sns.histplot(counts_to_plot, kde=False, bins=bins, discrete=True)
+    plt.title(f'Histograma del Número de Visitas de Página por Sesión\n{title_note}')
+    plt.xlabel("Número de Visitas de Página por Sesión")
+    plt.ylabel("Número de Sesiones")
+    plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
+    try:
+        plt.savefig(file_path)
+        print(f"Histograma de visitas por sesión guardado en: {file_path}")
+    except Exception as e:
+        print(f"Error al guardar el histograma: {e}")
+    plt.close()
+
 def plot_hits_per_session_histogram(
     session_hit_counts: pd.Series,
     output_dir: str,
     filename: str = "hits_per_session_histogram.png",
-    threshold_percentile: float | None = 0.99
+    threshold_percentile: float | None = 0.99,
+    renderer: ChartRenderer | None = None
 ) -> None:
     """
     Genera y guarda un histograma del número de visitas de página (hits) por sesión.
     Permite el filtrado de valores atípicos basado en un percentil.
+    Con renderer el gráfico se dibuja en su pool de procesos (ver chart_rendering.py).
     """
     if session_hit_counts.empty:
         print("No hay datos de conteo de hits por sesión para generar el histograma.")
@@ -198,29 +291,10 @@ def plot_hits_per_session_histogram(
         description_for_memoria = "No se aplicó filtrado de valores atípicos para este histograma."
     print(description_for_memoria)
 
-    plt.figure(figsize=(12, 7))
-    max_hits = int(counts_to_plot.max())
-    min_hits = int(counts_to_plot.min())
-    if max_hits - min_hits < 50 and max_hits > 0:
-        bins = range(min_hits, max_hits + 2)
-    else:
-        bins = 'auto'
-
-    sns.histplot(counts_to_plot, kde=False, bins=bins, discrete=True)
-    
-    title_note = description_for_memoria.split(". ")[0]
-    plt.title(f'Histograma del Número de Visitas de Página por Sesión\n{title_note}')
-    plt.xlabel("Número de Visitas de Página por Sesión")
-    plt.ylabel("Número de Sesiones")
-    plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
-
-    file_path = os.path.join(output_dir, filename)
-    try:
-        plt.savefig(file_path)
-        print(f"Histograma de visitas por sesión guardado en: {file_path}")
-    except Exception as e:
-        print(f"Error al guardar el histograma: {e}")
-    plt.close()
+    render_chart(
+        _render_hits_per_session_histogram, counts_to_plot, description_for_memoria.split(". ")[0],
+        os.path.join(output_dir, filename), renderer=renderer
+    )
 
     memoria_notes_path = os.path.join(output_dir, "hits_per_session_histogram_notes.txt")
     with open(memoria_notes_path, "w") as f:
@@ -264,6 +338,71 @@ def get_hits_per_session_stats(
         
     return stats_df
 
+SCATTER_RENDER_MODES = ('auto', 'points', 'density', 'sample')
+
+def _scatter_density_grid(plot_df: pd.DataFrame, bins: int = 200) -> dict[str, np.ndarray]:
+    """
+    Histograma 2D (sesiones por celda) de hits vs duración para el modo 'density' de
+    plot_hits_vs_duration_scatter: su tamaño no depende del número de sesiones. En el eje de
+    hits hay una columna por valor entero mientras quepan en bins.
+    """
+    hits = plot_df['hits_per_session'].to_numpy(dtype='float64')
+    durations = plot_df['duration_seconds'].to_numpy(dtype='float64')
+    min_hits, max_hits = hits.min(), hits.max()
+    if max_hits - min_hits < bins:
+        x_edges = np.arange(min_hits - 0.5, max_hits + 1.5)
+    else:
+        x_edges = np.linspace(min_hits, max_hits, bins + 1)
+    y_edges = np.linspace(durations.min(), max(durations.max(), durations.min() + 1), bins + 1)
+    counts, _, _ = np.histogram2d(hits, durations, bins=[x_edges, y_edges])
+    return {'counts': counts, 'x_edges': x_edges, 'y_edges': y_edges}
+
+def _stratified_scatter_sample(plot_df: pd.DataFrame, max_points: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Muestra de como mucho max_points sesiones (aprox.) para el modo 'sample' de plot_hits_vs_duration_scatter,
+    estratificada por número de hits (cada valor conserva su proporción, con al menos una sesión) y que
+    conserva siempre los extremos: la sesión más corta y la más larga de cada número de hits.
+    """
+    if len(plot_df) <= max_points:
+        return plot_df
+    groups = plot_df.groupby('hits_per_session')['duration_seconds']
+    extremes = pd.Index(groups.idxmin()).union(pd.Index(groups.idxmax()))
+    rest = plot_df.drop(extremes)
+    fraction = max(max_points - len(extremes), 0) / max(len(rest), 1)
+    rng = np.random.default_rng(seed)
+    keep = rng.random(len(rest)) < fraction
+    return pd.concat([plot_df.loc[extremes], rest[keep]]).sort_index()
+
+def _render_hits_vs_duration_scatter(
+    plot_data: pd.DataFrame | dict, regression_line: tuple | None, title_note: str, file_path: str
+) -> None:
+    """
+    Dibuja y guarda el diagrama de plot_hits_vs_duration_scatter (se puede ejecutar en un ChartRenderer).
+    plot_data son las sesiones a dibujar como puntos o el histograma 2D de _scatter_density_grid.
+    regression_line es (x, y, etiqueta) de la recta de regresión, o None.
+    """
+    plt.figure(figsize=(12, 8))
+    if isinstance(plot_data, dict):
+        counts = np.ma.masked_equal(plot_data['counts'].T, 0) # Las celdas vacías se quedan en blanco
+        mesh = plt.pcolormesh(plot_data['x_edges'], plot_data['y_edges'], counts, norm=LogNorm(), cmap='viridis')
+        plt.colorbar(mesh, label='Número de Sesiones')
+    else:
+        sns.scatterplot(data=plot_data, x='hits_per_session', y='duration_seconds', alpha=0.5)
+    if regression_line is not None:
+        x_line, y_line, label = regression_line
+        plt.plot(x_line, y_line, color='red', linewidth=2, label=label)
+        plt.legend()
+    plt.title(f'Diagrama de Dispersión: Visitas por Sesión vs. Duración de Sesión\n{title_note}')
+    plt.xlabel("Número de Visitas de Página por Sesión")
+    plt.ylabel("Duración de la Sesión (segundos)")
+    plt.grid(True, linestyle='--', linewidth=0.5)
+    try:
+        plt.savefig(file_path)
+        print(f"Diagrama de dispersión guardado en: {file_path}")
+    except Exception as e:
+        print(f"Error al guardar el diagrama: {e}")
+    plt.close()
+
 def plot_hits_vs_duration_scatter(
     session_hit_counts: pd.Series,
     session_durations: pd.Series,
@@ -271,11 +410,25 @@ def plot_hits_vs_duration_scatter(
     filename: str = "hits_vs_duration_scatter.png",
     threshold_percentile_hits: float | None = 0.99,
     threshold_percentile_duration: float | None = 0.99,
-    perform_regression: bool = True
+    perform_regression: bool = True,
+    renderer: ChartRenderer | None = None,
+    render_mode: str = 'auto',
+    max_points: int = 50000
 ) -> tuple[pd.DataFrame | None, dict | None]:
     """
     Genera un diagrama de dispersión de visitas de página vs. duración de la sesión.
+    Con renderer el gráfico se dibuja en su pool de procesos (ver chart_rendering.py).
+    render_mode (SCATTER_RENDER_MODES) decide cómo se dibujan las sesiones, para que el tiempo de
+    dibujado y el tamaño del PNG no crezcan con su número:
+    - 'points': un punto por sesión.
+    - 'density': histograma 2D con el número de sesiones por celda (escala logarítmica).
+    - 'sample': muestra estratificada por hits de unas max_points sesiones que conserva los extremos.
+    - 'auto': 'points' con hasta max_points sesiones y 'density' con más.
+    La regresión se ajusta siempre con todas las sesiones.
     """
+    if render_mode not in SCATTER_RENDER_MODES:
+        print(f"Error: render_mode '{render_mode}' no válido. Opciones: {', '.join(SCATTER_RENDER_MODES)}.")
+        return None, None
     regression_results = None
     if session_hit_counts.empty or session_durations.empty:
         print("Datos insuficientes para generar el diagrama de dispersión hits vs. duración.")
@@ -331,43 +484,41 @@ def plot_hits_vs_duration_scatter(
         print(f"Notas para la memoria guardadas en: {memoria_notes_path}")
         return combined_df, regression_results
 
-    plt.figure(figsize=(12, 8))
-    sns.scatterplot(data=plot_df, x='hits_per_session', y='duration_seconds', alpha=0.5)
-    
+    regression_line = None
     if perform_regression and not combined_df.empty:
-        X = combined_df[['hits_per_session']]
-        y = combined_df['duration_seconds']
-        model = LinearRegression()
+        model = LinearRegressionAccumulator()
         try:
-            model.fit(X, y)
-            slope = model.coef_[0]
-            intercept = model.intercept_
+            model.update(combined_df['hits_per_session'], combined_df['duration_seconds'])
+            regression_results = model.result()
+            slope, intercept = regression_results['slope'], regression_results['intercept']
             equation = f"duration_seconds = {slope:.2f} * hits_per_session + {intercept:.2f}"
             print(f"\nEcuación de Regresión Lineal: {equation}")
-            regression_results = {'slope': slope, 'intercept': intercept, 'equation': equation}
+            print(f"R² = {regression_results['r_squared']:.4f}, desviación estándar de los residuos = "
+                  f"{regression_results['residual_std']:.2f}s ({regression_results['count']} sesiones)")
+            regression_results['equation'] = equation
             x_reg_min = plot_df['hits_per_session'].min()
             x_reg_max = plot_df['hits_per_session'].max()
-            x_line = np.array([[x_reg_min], [x_reg_max]])
+            x_line = np.array([x_reg_min, x_reg_max])
             y_line = model.predict(x_line)
-            plt.plot(x_line, y_line, color='red', linewidth=2, label=f'Regresión Lineal\n{equation}')
-            plt.legend()
+            regression_line = (x_line, y_line, f'Regresión Lineal\n{equation}')
         except ValueError as ve:
             print(f"Error al ajustar el modelo de regresión: {ve}.")
             regression_results = {'error': str(ve)}
 
     title_note = description_for_memoria.split(" Total sesiones omitidas")[0]
-    plt.title(f'Diagrama de Dispersión: Visitas por Sesión vs. Duración de Sesión\n{title_note}')
-    plt.xlabel("Número de Visitas de Página por Sesión")
-    plt.ylabel("Duración de la Sesión (segundos)")
-    plt.grid(True, linestyle='--', linewidth=0.5)
-
-    file_path = os.path.join(output_dir, filename)
-    try:
-        plt.savefig(file_path)
-        print(f"Diagrama de dispersión guardado en: {file_path}")
-    except Exception as e:
-        print(f"Error al guardar el diagrama: {e}")
-    plt.close()
+    if render_mode == 'auto':
+        render_mode = 'points' if len(plot_df) <= max_points else 'density'
+    if render_mode == 'density':
+        plot_data = _scatter_density_grid(plot_df)
+    elif render_mode == 'sample':
+        plot_data = _stratified_scatter_sample(plot_df, max_points)
+        print(f"Se dibujan {len(plot_data)} de {len(plot_df)} sesiones (muestra estratificada por hits con los extremos).")
+    else:
+        plot_data = plot_df
+    render_chart(
+        _render_hits_vs_duration_scatter, plot_data, regression_line, title_note,
+        os.path.join(output_dir, filename), renderer=renderer
+    )
 
     memoria_notes_path = os.path.join(output_dir, "hits_vs_duration_scatter_notes.txt")
     with open(memoria_notes_path, "w") as f:
@@ -376,31 +527,55 @@ def plot_hits_vs_duration_scatter(
     
     return combined_df, regression_results
 
+def _render_mean_session_duration_by_hour(mean_duration_by_hour: pd.Series, file_path: str) -> None:
+    """Dibuja y guarda el gráfico de barras de plot_mean_session_duration_by_hour (se puede ejecutar en un ChartRenderer)."""
+    plt.figure(figsize=(14, 7))
+    sns.barplot(x=mean_duration_by_hour.index, y=mean_duration_by_hour.values, palette="viridis")
+    plt.title('Longitud Media de las Visitas (Sesiones >1 hit) por Hora del Día')
+    plt.xlabel('Hora del Día (0-23)')
+    plt.ylabel('Duración Media de la Sesión (segundos)')
+    plt.xticks(range(24))
+    plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
+    plt.tight_layout()
+    try:
+        plt.savefig(file_path)
+        print(f"Gráfico de longitud media de sesión por hora guardado en: {file_path}")
+    except Exception as e:
+        print(f"Error al guardar el gráfico: {e}")
+    plt.close()
+
 # Nueva función para Tarea 2.8.3
 def plot_mean_session_duration_by_hour(
-    df: pd.DataFrame, 
+    df: pd.DataFrame | None, 
     output_dir: str, 
-    filename: str = "mean_session_duration_by_hour.png"
+    filename: str = "mean_session_duration_by_hour.png",
+    session_summary: pd.DataFrame | None = None,
+    session_durations: pd.Series | None = None,
+    renderer: ChartRenderer | None = None
 ) -> None:
     """
     Calcula la duración media de las sesiones (>1 hit) para cada hora del día y genera un gráfico de barras.
+    Si se pasa session_summary (ver build_session_summary) se usa en lugar de agrupar df, y si se
+    pasan session_durations (de calculate_session_durations sobre esa tabla) no se recalculan.
+    Con renderer el gráfico se dibuja en su pool de procesos (ver chart_rendering.py).
     """
     print("\n--- Analizando Longitud Media de Sesión por Hora del Día ---")
-    if 'Fecha/Hora' not in df.columns or 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns:
-        print("Error: Se requieren las columnas 'Fecha/Hora', 'SessionID' y 'marca de tiempo'.")
-        return
+    if session_summary is None:
+        if 'Fecha/Hora' not in df.columns or 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns:
+            print("Error: Se requieren las columnas 'Fecha/Hora', 'SessionID' y 'marca de tiempo'.")
+            return
+        session_summary = build_session_summary(df)
     
     # 1. Calcular duraciones de sesión (>1 hit)
-    session_durations = calculate_session_durations(df) # Esto devuelve una Serie indexada por SessionID
+    if session_durations is None:
+        session_durations = calculate_session_durations(df, session_summary) # Esto devuelve una Serie indexada por SessionID
     if session_durations.empty:
         print("No hay duraciones de sesión (>1 hit) para analizar por hora.")
         return
 
     # 2. Obtener la hora de inicio de las sesiones que tienen duración calculada
     # Nos interesan las sesiones que están en session_durations.index
-    df_for_start_time = df[df['SessionID'].isin(session_durations.index)]
-    session_start_times = df_for_start_time.groupby('SessionID')['Fecha/Hora'].min()
-    session_start_hour = session_start_times.dt.hour.rename('start_hour')
+    session_start_hour = session_summary.loc[session_durations.index, 'start_hour'].rename('start_hour')
 
     # 3. Combinar duraciones con hora de inicio
     # Usar pd.concat para asegurar la alineación por SessionID (índice)
@@ -421,22 +596,9 @@ def plot_mean_session_duration_by_hour(
     print(mean_duration_by_hour.to_string())
 
     # 6. Generar gráfico de barras
-    plt.figure(figsize=(14, 7))
-    sns.barplot(x=mean_duration_by_hour.index, y=mean_duration_by_hour.values, palette="viridis")
-    plt.title('Longitud Media de las Visitas (Sesiones >1 hit) por Hora del Día')
-    plt.xlabel('Hora del Día (0-23)')
-    plt.ylabel('Duración Media de la Sesión (segundos)')
-    plt.xticks(range(24))
-    plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
-    plt.tight_layout()
-
-    file_path = os.path.join(output_dir, filename)
-    try:
-        plt.savefig(file_path)
-        print(f"Gráfico de longitud media de sesión por hora guardado en: {file_path}")
-    except Exception as e:
-        print(f"Error al guardar el gráfico: {e}")
-    plt.close()
+    render_chart(
+        _render_mean_session_duration_by_hour, mean_duration_by_hour, os.path.join(output_dir, filename), renderer=renderer
+    )
 
 # Nueva función para Tarea 2.8.4
 def get_top_visitors_by_sessions(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> pd.DataFrame | None:
@@ -459,6 +621,12 @@ def get_top_visitors_by_sessions(df: pd.DataFrame, output_dir: str, top_n: int =
     top_visitors_df = sessions_per_user.head(top_n).reset_index()
     top_visitors_df.columns = ['UserID', 'SessionCount']
 
+    # 'UserID' es un código entero: mostrar el host remoto correspondiente si está disponible
+    if 'Host remoto' in df.columns:
+        top_user_hosts = df.loc[df['UserID'].isin(top_visitors_df['UserID']), ['UserID', 'Host remoto']]
+        top_user_hosts = top_user_hosts.drop_duplicates('UserID').set_index('UserID')['Host remoto']
+        top_visitors_df['UserID'] = top_visitors_df['UserID'].map(top_user_hosts)
+
     print(f"\nTop {top_n} Visitantes (UserID) por Número de Sesiones:")
     print(top_visitors_df.to_string())
 
@@ -529,27 +697,25 @@ def get_visitor_session_distribution(df: pd.DataFrame, output_dir: str, max_sess
     return distribution_df
 
 # Nueva función para Tarea 2.8.9
-def get_top_entry_pages(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> pd.DataFrame | None:
+def get_top_entry_pages(df: pd.DataFrame | None, output_dir: str, top_n: int = 10, session_summary: pd.DataFrame | None = None) -> pd.DataFrame | None:
     """
     Identifica las N páginas de entrada (primera página de una sesión) más repetidas.
+    Si se pasa session_summary (ver build_session_summary) se usa en lugar de agrupar df.
     """
     print("\n--- Analizando Top Páginas de Entrada ---")
-    if 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns or 'Página' not in df.columns:
-        print("Error: Se requieren las columnas 'SessionID', 'marca de tiempo' y 'Página'.")
-        return None
-
-    # Identificar la primera página de cada sesión
-    # Ordenar por SessionID y marca de tiempo, luego tomar la primera de cada grupo SessionID
-    # O usar idxmin para encontrar el índice del primer hit de cada sesión
-    first_hits_indices = df.groupby('SessionID')['marca de tiempo'].idxmin()
-    first_pages_df = df.loc[first_hits_indices]
-
-    if first_pages_df.empty:
+    if session_summary is None:
+        if 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns or 'Página' not in df.columns:
+            print("Error: Se requieren las columnas 'SessionID', 'marca de tiempo' y 'Página'.")
+            return None
+        session_summary = build_session_summary(df)
+
+    # La primera página de cada sesión es su 'entry_page' en la tabla resumen
+    if session_summary.empty:
         print("No se pudieron identificar las primeras páginas de las sesiones.")
         return None
 
     # Contar cuántas sesiones iniciaron con cada página
-    entry_page_counts = first_pages_df.groupby('Página').size().rename('NumeroDeSesionesIniciadas').sort_values(ascending=False)
+    entry_page_counts = session_summary.groupby('entry_page', observed=True).size().rename('NumeroDeSesionesIniciadas').sort_values(ascending=False)
     
     df_top_entry_pages = entry_page_counts.head(top_n).reset_index()
     df_top_entry_pages.columns = ['PáginaDeEntrada', 'NumeroDeSesionesIniciadas']
@@ -573,25 +739,25 @@ def get_top_entry_pages(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> p
     return df_top_entry_pages
 
 # Nueva función para Tarea 2.8.10
-def get_top_exit_pages(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> pd.DataFrame | None:
+def get_top_exit_pages(df: pd.DataFrame | None, output_dir: str, top_n: int = 10, session_summary: pd.DataFrame | None = None) -> pd.DataFrame | None:
     """
     Identifica las N páginas de salida (última página de una sesión) más repetidas.
+    Si se pasa session_summary (ver build_session_summary) se usa en lugar de agrupar df.
     """
     print("\n--- Analizando Top Páginas de Salida ---")
-    if 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns or 'Página' not in df.columns:
-        print("Error: Se requieren las columnas 'SessionID', 'marca de tiempo' y 'Página'.")
-        return None
-
-    # Identificar la última página de cada sesión usando idxmax
-    last_hits_indices = df.groupby('SessionID')['marca de tiempo'].idxmax()
-    last_pages_df = df.loc[last_hits_indices]
-
-    if last_pages_df.empty:
+    if session_summary is None:
+        if 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns or 'Página' not in df.columns:
+            print("Error: Se requieren las columnas 'SessionID', 'marca de tiempo' y 'Página'.")
+            return None
+        session_summary = build_session_summary(df)
+
+    # La última página de cada sesión es su 'exit_page' en la tabla resumen
+    if session_summary.empty:
         print("No se pudieron identificar las últimas páginas de las sesiones.")
         return None
 
     # Contar cuántas sesiones terminaron con cada página
-    exit_page_counts = last_pages_df.groupby('Página').size().rename('NumeroDeSesionesTerminadas').sort_values(ascending=False)
+    exit_page_counts = session_summary.groupby('exit_page', observed=True).size().rename('NumeroDeSesionesTerminadas').sort_values(ascending=False)
     
     df_top_exit_pages = exit_page_counts.head(top_n).reset_index()
     df_top_exit_pages.columns = ['PáginaDeSalida', 'NumeroDeSesionesTerminadas']
@@ -615,31 +781,28 @@ def get_top_exit_pages(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> pd
     return df_top_exit_pages
 
 # Nueva función para Tarea 2.8.11
-def get_top_single_access_pages(df: pd.DataFrame, output_dir: str, top_n: int = 10) -> pd.DataFrame | None:
+def get_top_single_access_pages(df: pd.DataFrame | None, output_dir: str, top_n: int = 10, session_summary: pd.DataFrame | None = None) -> pd.DataFrame | None:
     """
     Identifica las N páginas más comunes en sesiones de acceso único (una sola página vista).
+    Si se pasa session_summary (ver build_session_summary) se usa en lugar de agrupar df.
     """
     print("\n--- Analizando Top Páginas de Acceso Único ---")
-    if 'SessionID' not in df.columns or 'Página' not in df.columns:
-        print("Error: Se requieren las columnas 'SessionID' y 'Página'.")
-        return None
-
-    # 1. Contar hits por sesión
-    session_hit_counts = df.groupby('SessionID').size()
+    if session_summary is None:
+        if 'SessionID' not in df.columns or 'Página' not in df.columns or 'marca de tiempo' not in df.columns:
+            print("Error: Se requieren las columnas 'SessionID', 'marca de tiempo' y 'Página'.")
+            return None
+        session_summary = build_session_summary(df)
+
+    # 1. Identificar sesiones con un solo hit
+    single_hit_sessions = session_summary[session_summary['num_hits'] == 1]
     
-    # 2. Identificar sesiones con un solo hit
-    single_hit_session_ids = session_hit_counts[session_hit_counts == 1].index
-    
-    if len(single_hit_session_ids) == 0:
+    if len(single_hit_sessions) == 0:
         print("No se encontraron sesiones de acceso único.")
         return None
-        
-    # 3. Filtrar el DataFrame para incluir solo esas sesiones
-    single_hit_df = df[df['SessionID'].isin(single_hit_session_ids)]
 
-    # 4. Contar las páginas en estas sesiones de acceso único
-    # Como cada sesión tiene 1 hit, contar las páginas es equivalente a contar las sesiones
-    single_access_page_counts = single_hit_df.groupby('Página').size().rename('NumeroDeVisitasUnicas').sort_values(ascending=False)
+    # 2. Contar las páginas en estas sesiones de acceso único
+    # Como cada sesión tiene 1 hit, su página de entrada es la única página vista
+    single_access_page_counts = single_hit_sessions.groupby('entry_page', observed=True).size().rename('NumeroDeVisitasUnicas').sort_values(ascending=False)
     
     df_top_single_access = single_access_page_counts.head(top_n).reset_index()
     df_top_single_access.columns = ['PáginaDeAccesoUnico', 'NumeroDeVisitasUnicas']
@@ -663,17 +826,25 @@ def get_top_single_access_pages(df: pd.DataFrame, output_dir: str, top_n: int =
     return df_top_single_access
 
 # Nueva función para Tarea 2.8.12
-def get_session_duration_distribution_minutes(df: pd.DataFrame, output_dir: str) -> pd.DataFrame | None:
+def get_session_duration_distribution_minutes(
+    df: pd.DataFrame | None,
+    output_dir: str,
+    session_summary: pd.DataFrame | None = None,
+    session_durations_seconds: pd.Series | None = None
+) -> pd.DataFrame | None:
     """
     Calcula la distribución de la duración de las sesiones (>1 hit) en rangos de minutos.
+    Si se pasa session_summary (ver build_session_summary) se usa en lugar de agrupar df, y si se
+    pasan session_durations_seconds (de calculate_session_durations) no se recalculan.
     """
     print("\n--- Analizando Distribución de Duración de Sesiones en Minutos ---")
-    if 'SessionID' not in df.columns or 'marca de tiempo' not in df.columns:
+    if session_durations_seconds is None and session_summary is None and ('SessionID' not in df.columns or 'marca de tiempo' not in df.columns):
         print("Error: Se requieren las columnas 'SessionID' y 'marca de tiempo'.")
         return None
 
     # 1. Calcular duraciones de sesión (>1 hit) en segundos
-    session_durations_seconds = calculate_session_durations(df)
+    if session_durations_seconds is None:
+        session_durations_seconds = calculate_session_durations(df, session_summary)
     if session_durations_seconds.empty:
         print("No hay duraciones de sesión (>1 hit) para analizar.")
         return None
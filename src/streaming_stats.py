@@ -0,0 +1,492 @@
+import math
+import heapq
+import numpy as np
+import pandas as pd
+
+def hash_values(values) -> np.ndarray:
+    """
+    Hash estable de 64 bits (uint64) de cada valor, con pd.util.hash_pandas_object: el mismo valor
+    da el mismo hash en cualquier lote o proceso, sea texto, categórico o entero.
+    """
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+class CountMinSketch:
+    """
+    Count-Min: estima la frecuencia de cualquier clave con una tabla fija de depth x width contadores.
+    La estimación nunca es menor que la frecuencia real y, con probabilidad 1 - delta, la supera
+    en como mucho epsilon * (total de apariciones).
+    """
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, hashes: np.ndarray) -> list[np.ndarray]:
+        # Doble hashing: la fila i usa h1 + i * h2, derivados de un único hash de 64 bits
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        return [((h1 + np.uint64(i) * h2) % np.uint64(self.width)).astype(np.int64) for i in range(self.depth)]
+
+    def update(self, hashes: np.ndarray, counts: np.ndarray | None = None) -> None:
+        """Suma counts (1 por defecto) a las claves con los hashes dados (ver hash_values)."""
+        counts = np.ones(len(hashes), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        for row, columns in enumerate(self._columns(hashes)):
+            np.add.at(self.table[row], columns, counts)
+        self.total += int(counts.sum())
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        """Frecuencia estimada (cota superior) de cada clave."""
+        estimates = [self.table[row][columns] for row, columns in enumerate(self._columns(hashes))]
+        return np.min(estimates, axis=0) if estimates else np.zeros(len(hashes), dtype=np.int64)
+
+    def merge(self, other: 'CountMinSketch') -> None:
+        """Acumula otro sketch con los mismos parámetros (p.ej. de otro lote o proceso)."""
+        self.table += other.table
+        self.total += other.total
+
+class SpaceSaving:
+    """
+    Space-Saving: mantiene como mucho capacity claves con su contador. Una clave nueva con el
+    resumen lleno sustituye a la de menor contador y hereda ese contador como error, así que
+    cada contador es una cota superior que sobrestima en como mucho total / capacity, y toda
+    clave con frecuencia mayor que total / capacity está en el resumen.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self._heap = [] # (contador, clave) con entradas obsoletas que se descartan al sacarlas
+
+    def update(self, key, count: int = 1):
+        """Suma count apariciones de key. Devuelve la clave expulsada para hacerle sitio, o None."""
+        self.total += count
+        evicted = None
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+        else:
+            while True:
+                min_count, min_key = heapq.heappop(self._heap)
+                if self.counts.get(min_key) == min_count:
+                    break
+            evicted = min_key
+            del self.counts[min_key]
+            del self.errors[min_key]
+            self.counts[key] = min_count + count
+            self.errors[key] = min_count
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity: # Compactar las entradas obsoletas
+            self._heap = [(value, item) for item, value in self.counts.items()]
+            heapq.heapify(self._heap)
+        return evicted
+
+    def top(self, n: int | None = None) -> list[tuple]:
+        """Las n claves con mayor contador como (clave, contador, error), de mayor a menor contador."""
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return [(key, count, self.errors[key]) for key, count in items[:n]]
+
+def _hll_positions(hashes: np.ndarray, precision: int) -> tuple[np.ndarray, np.ndarray]:
+    """Registro (primeros precision bits del hash) y rango (posición del primer 1 en el resto) de cada hash."""
+    remaining_bits = 64 - precision
+    indices = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << remaining_bits) - 1)
+    # Longitud en bits exacta a partir de dos mitades de 32 bits, representables sin pérdida en float64
+    high = (rest >> np.uint64(32)).astype(np.float64)
+    low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+    ranks = (remaining_bits - bit_length + 1).astype(np.uint8)
+    return indices, ranks
+
+def _hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """Estimación de HyperLogLog (con corrección de rango pequeño) para cada fila de registros."""
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    with np.errstate(divide='ignore'):
+        linear_counting = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear_counting, raw)
+
+class HyperLogLog:
+    """
+    HyperLogLog: estima el número de valores distintos con 2**precision registros de un byte.
+    El error relativo típico es 1.04 / sqrt(2**precision) (1.6% con precision=12).
+    """
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update(self, hashes: np.ndarray) -> None:
+        """Añade valores por sus hashes (ver hash_values)."""
+        indices, ranks = _hll_positions(hashes, self.precision)
+        np.maximum.at(self.registers, indices, ranks)
+
+    def estimate(self) -> float:
+        return float(_hll_estimate(self.registers)[0])
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+class TopKeySketch:
+    """
+    Top-N de claves (páginas, dominios, directorios...) por hits y por sesiones distintas sobre
+    una entrada no acotada procesada por lotes, con memoria fija:
+    - Space-Saving con capacidad ceil(1 / epsilon) decide qué claves se siguen; su contador y un
+      Count-Min (epsilon, delta) son cotas superiores de los hits y se informa el menor de ambos.
+      El error de los hits es como mucho epsilon * (hits totales).
+    - Cada clave seguida tiene una fila de registros HyperLogLog (hll_precision) con sus sesiones.
+      Como su contador, una clave que entra en el resumen hereda los registros de la expulsada.
+    Mientras haya como mucho ceil(1 / epsilon) claves distintas los hits son exactos.
+    """
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01, hll_precision: int = 12):
+        self.epsilon = epsilon
+        self.hll_precision = hll_precision
+        self.heavy_hitters = SpaceSaving(math.ceil(1 / epsilon))
+        self.count_min = CountMinSketch(epsilon, delta)
+        self.slots = {} # clave seguida -> fila de registros
+        self.registers = np.zeros((self.heavy_hitters.capacity, 1 << hll_precision), dtype=np.uint8)
+
+    @property
+    def hit_error_bound(self) -> float:
+        """Sobrestimación máxima de los hits de cualquier clave."""
+        return self.heavy_hitters.total / self.heavy_hitters.capacity
+
+    @property
+    def session_relative_error(self) -> float:
+        """Error relativo típico de las sesiones distintas estimadas."""
+        return 1.04 / math.sqrt(self.registers.shape[1])
+
+    def update(self, keys: pd.Series, session_ids: pd.Series) -> None:
+        """Añade un lote de hits: la clave y el SessionID de cada hit. Las claves nulas se ignoran."""
+        codes, uniques = pd.factorize(keys)
+        uniques = np.asarray(uniques, dtype=object)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.count_min.update(hash_values(uniques), counts)
+
+        # Primero las claves más frecuentes del lote, que son las que deben quedarse en el resumen
+        for position in np.argsort(-counts, kind='stable'):
+            key = uniques[position]
+            evicted = self.heavy_hitters.update(key, int(counts[position]))
+            if key not in self.slots:
+                self.slots[key] = self.slots.pop(evicted) if evicted is not None else len(self.slots)
+
+        slot_by_code = np.array([self.slots.get(key, -1) for key in uniques] + [-1], dtype=np.int64)
+        row_slots = slot_by_code[codes] # El código -1 (clave nula) cae en el -1 final
+        tracked = row_slots >= 0
+        indices, ranks = _hll_positions(hash_values(np.asarray(session_ids)[tracked]), self.hll_precision)
+        np.maximum.at(self.registers, (row_slots[tracked], indices), ranks)
+
+    def top(self, n: int, key_name: str = 'key') -> pd.DataFrame:
+        """
+        Las n claves con más hits (y, a igualdad, más sesiones) como DataFrame con columnas
+        key_name, 'HitCount' y 'SessionCount', igual que las tablas exactas de page_analyzer.
+        """
+        if not self.slots:
+            return pd.DataFrame({key_name: pd.Series(dtype=object), 'HitCount': pd.Series(dtype='int64'),
+                                 'SessionCount': pd.Series(dtype='int64')})
+        keys = sorted(self.slots)
+        hit_counts = np.minimum(
+            np.array([self.heavy_hitters.counts[key] for key in keys], dtype=np.int64),
+            self.count_min.estimate(hash_values(np.asarray(keys, dtype=object)))
+        )
+        session_counts = np.rint(_hll_estimate(self.registers[[self.slots[key] for key in keys]])).astype(np.int64)
+        table = pd.DataFrame({
+            key_name: keys,
+            'HitCount': hit_counts,
+            'SessionCount': np.clip(session_counts, 1, hit_counts), # Cada hit pertenece a una sola sesión
+        })
+        table = table.sort_values(by=['HitCount', 'SessionCount'], ascending=[False, False], kind='stable')
+        return table.head(n).reset_index(drop=True)
+
+class KLLSketch:
+    """
+    Sketch de cuantiles KLL: guarda los valores en niveles de compactación, donde un valor del nivel h
+    representa 2**h valores de la entrada. Cuando un nivel supera su capacidad (k en el nivel superior,
+    decreciendo en factor 2/3 hacia abajo) se ordena y la mitad de sus valores, alternos desde un
+    desplazamiento aleatorio, sube al nivel siguiente. Ocupa O(k) valores y se puede combinar (merge)
+    con sketches de otros lotes o procesos. El error de rango de un cuantil es como mucho rank_error
+    veces el número de valores con probabilidad del 99% (1.65% con k=200). Mientras no se
+    compacta (hasta k valores) los cuantiles son exactos.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        """Error de rango normalizado (99% de confianza), con la fórmula empírica de Apache DataSketches."""
+        return 2.446 / self.k ** 0.9433
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(math.ceil(self.k * (2 / 3) ** depth), 2)
+
+    def _compress(self) -> None:
+        while True:
+            level = next((h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h)), None)
+            if level is None:
+                return
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            items = np.sort(self.levels[level])
+            leftover = items[len(items) - len(items) % 2:] # Con un número impar, uno se queda en el nivel
+            promoted = items[int(self._rng.integers(2)):len(items) - len(leftover):2]
+            self.levels[level] = leftover
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def update(self, values) -> None:
+        """Añade un lote de valores (los NaN se ignoran)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other: 'KLLSketch') -> None:
+        """Acumula otro sketch (p.ej. de otro lote o proceso)."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def quantile(self, q) -> np.ndarray | float:
+        """
+        Cuantil(es) q en [0, 1]. Sin compactaciones coincide con np.quantile (interpolación lineal,
+        como pandas); después es el valor guardado cuyo rango acumulado alcanza q * count.
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], q)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=np.int64) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative_weights = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative_weights, np.asarray(q) * cumulative_weights[-1], side='left')
+        return values[order][np.minimum(positions, len(values) - 1)]
+
+class DurationSketch:
+    """
+    Resumen en streaming de una serie de duraciones para los informes de estadísticas
+    (get_session_duration_stats, get_page_view_duration_stats, ...), que lo aceptan en lugar de la Serie:
+    imita empty, describe() y mode() de pd.Series sin guardar todos los valores. Lo llena
+    LiveSessionTracker (live_sessions.py) a medida que cierra sesiones; analysis.py ya tiene todas
+    las duraciones en memoria y usa las Series.
+    - count, media, desviación estándar, mínimo y máximo son exactos (momentos acumulados).
+    - Los percentiles salen de un KLLSketch(k): exactos hasta k valores y después con error de rango
+      como mucho quantile_rank_error * count (99% de confianza).
+    - La moda sale de un SpaceSaving(mode_capacity) sobre los valores: exacta mientras haya como
+      mucho mode_capacity valores distintos (las duraciones son segundos enteros). Si el resumen se
+      desborda solo se da la moda cuando está garantizada (ver mode()); si no, mode() va vacía y los
+      informes escriben 'N/A'.
+    Se puede llenar valor a valor (add), por lotes (update) y combinar con merge.
+    """
+
+    _PENDING_LIMIT = 4096
+
+    def __init__(self, k: int = 200, mode_capacity: int = 1000, seed: int = 0):
+        self.quantiles = KLLSketch(k, seed=seed)
+        self.frequent_values = SpaceSaving(mode_capacity)
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0 # Suma de cuadrados de las desviaciones respecto a la media
+        self.min = np.nan
+        self.max = np.nan
+        self._pending = []
+
+    @property
+    def quantile_rank_error(self) -> float:
+        return self.quantiles.rank_error
+
+    @property
+    def empty(self) -> bool:
+        return self.count + len(self._pending) == 0
+
+    @property
+    def mode_is_exact(self) -> bool:
+        """Si el resumen de la moda no se ha desbordado (ningún contador arrastra error de una expulsión)."""
+        self._flush()
+        return not any(self.frequent_values.errors.values())
+
+    def add(self, value: float) -> None:
+        """Añade un valor; se procesan por lotes internamente."""
+        self._pending.append(value)
+        if len(self._pending) >= self._PENDING_LIMIT:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self.update(pending)
+
+    def _merge_moments(self, count: int, mean: float, m2: float, minimum: float, maximum: float) -> None:
+        # Combinación de medias y varianzas de dos grupos (Chan et al.)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = np.fmin(self.min, minimum)
+        self.max = np.fmax(self.max, maximum)
+
+    def update(self, values) -> None:
+        """Añade un lote de valores (los NaN se ignoran, como en describe())."""
+        self._flush()
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        mean = values.mean()
+        self._merge_moments(len(values), mean, float(((values - mean) ** 2).sum()), values.min(), values.max())
+        self.quantiles.update(values)
+        unique_values, counts = np.unique(values, return_counts=True)
+        for position in np.argsort(-counts, kind='stable'):
+            self.frequent_values.update(float(unique_values[position]), int(counts[position]))
+
+    def merge(self, other: 'DurationSketch') -> None:
+        """Acumula otro DurationSketch (p.ej. de otro lote o proceso)."""
+        self._flush()
+        other._flush()
+        if other.count == 0:
+            return
+        self._merge_moments(other.count, other.mean, other._m2, other.min, other.max)
+        self.quantiles.merge(other.quantiles)
+        for value, count, _ in other.frequent_values.top():
+            self.frequent_values.update(value, count)
+
+    def describe(self) -> pd.Series:
+        """Como pd.Series.describe(): count, mean, std, min, 25%, 50%, 75% y max."""
+        self._flush()
+        std = math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else np.nan
+        percentiles = self.quantiles.quantile([0.25, 0.5, 0.75])
+        return pd.Series(
+            [float(self.count), self.mean if self.count else np.nan, std, self.min, *percentiles, self.max],
+            index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+        )
+
+    def mode(self) -> pd.Series:
+        """
+        Como pd.Series.mode(): los valores más frecuentes, ordenados. Con el resumen desbordado los
+        contadores son cotas superiores, así que solo se devuelve el primero si su cota inferior
+        (contador - error) supera el contador de cualquier otro valor; si no, una Serie vacía.
+        """
+        self._flush()
+        top = self.frequent_values.top()
+        if not top:
+            return pd.Series(dtype='float64')
+        if not self.mode_is_exact:
+            value, count, error = top[0]
+            if len(top) > 1 and count - error <= top[1][1]:
+                return pd.Series(dtype='float64')
+            return pd.Series([value], dtype='float64')
+        max_count = top[0][1]
+        return pd.Series(sorted(value for value, count, _ in top if count == max_count), dtype='float64')
+
+class LinearRegressionAccumulator:
+    """
+    Regresión lineal simple y = slope · x + intercept por mínimos cuadrados, en forma cerrada a partir
+    de sumas acumuladas: se puede llenar por lotes (update) y combinar con merge (p.ej. de otro lote o
+    proceso) sin guardar los datos. En lugar de Σx, Σy, Σx², Σxy se acumulan las medias y las sumas de
+    productos de las desviaciones (combinadas como en DurationSketch), que dan el mismo resultado sin
+    la cancelación numérica de Σx² - n·media² con valores grandes.
+    Como LinearRegression de scikit-learn, si todos los x son iguales la pendiente es 0 y el
+    intercepto la media de y.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self._sxx = 0.0 # Σ(x - media_x)²
+        self._syy = 0.0 # Σ(y - media_y)²
+        self._sxy = 0.0 # Σ(x - media_x)(y - media_y)
+
+    def _merge_sums(self, count: int, mean_x: float, mean_y: float, sxx: float, syy: float, sxy: float) -> None:
+        total = self.count + count
+        delta_x = mean_x - self.mean_x
+        delta_y = mean_y - self.mean_y
+        weight = self.count * count / total
+        self.mean_x += delta_x * count / total
+        self.mean_y += delta_y * count / total
+        self._sxx += sxx + delta_x * delta_x * weight
+        self._syy += syy + delta_y * delta_y * weight
+        self._sxy += sxy + delta_x * delta_y * weight
+        self.count = total
+
+    def update(self, x, y) -> None:
+        """Añade un lote de pares (x, y); se ignoran los pares con algún NaN."""
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        if len(x) != len(y):
+            raise ValueError(f"x e y deben tener la misma longitud ({len(x)} != {len(y)}).")
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[valid], y[valid]
+        if len(x) == 0:
+            return
+        mean_x, mean_y = x.mean(), y.mean()
+        dx, dy = x - mean_x, y - mean_y
+        self._merge_sums(len(x), mean_x, mean_y, float(dx @ dx), float(dy @ dy), float(dx @ dy))
+
+    def merge(self, other: 'LinearRegressionAccumulator') -> None:
+        """Acumula otro LinearRegressionAccumulator."""
+        if other.count:
+            self._merge_sums(other.count, other.mean_x, other.mean_y, other._sxx, other._syy, other._sxy)
+
+    @property
+    def slope(self) -> float:
+        return self._sxy / self._sxx if self._sxx > 0 else 0.0
+
+    @property
+    def intercept(self) -> float:
+        return self.mean_y - self.slope * self.mean_x
+
+    def predict(self, x) -> np.ndarray:
+        return self.slope * np.asarray(x, dtype=np.float64) + self.intercept
+
+    def result(self) -> dict:
+        """
+        Coeficientes y bondad del ajuste:
+        - slope, intercept y count (pares usados).
+        - r_squared: coeficiente de determinación (NaN si todos los y son iguales).
+        - residual_sum_squares y residual_std: suma de cuadrados de los residuos y su desviación
+          estándar con n - 2 grados de libertad (error estándar de la regresión; los residuos tienen media 0).
+        - slope_std_error: error estándar de la pendiente.
+        Lanza ValueError si no hay ningún par.
+        """
+        if self.count == 0:
+            raise ValueError("No hay datos para ajustar la regresión.")
+        slope = self.slope
+        residual_sum_squares = max(self._syy - slope * self._sxy, 0.0)
+        degrees_of_freedom = self.count - 2
+        residual_std = math.sqrt(residual_sum_squares / degrees_of_freedom) if degrees_of_freedom > 0 else np.nan
+        return {
+            'slope': slope,
+            'intercept': self.intercept,
+            'count': self.count,
+            'r_squared': 1 - residual_sum_squares / self._syy if self._syy > 0 else np.nan,
+            'residual_sum_squares': residual_sum_squares,
+            'residual_std': residual_std,
+            'slope_std_error': residual_std / math.sqrt(self._sxx) if self._sxx > 0 else np.nan,
+        }
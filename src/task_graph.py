@@ -0,0 +1,130 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# matplotlib.pyplot no es seguro entre hilos (figura activa global): las tareas que dibujan
+# se ejecutan de una en una con este lock, el resto en paralelo con ellas
+PYPLOT_LOCK = threading.Lock()
+
+class _Skipped:
+    def __repr__(self):
+        return 'SKIPPED'
+
+# Resultado de una tarea omitida: las tareas que dependen de ella también se omiten
+SKIPPED = _Skipped()
+
+class _Task:
+    __slots__ = ('name', 'func', 'inputs', 'after', 'uses_pyplot')
+
+    def __init__(self, name, func, inputs, after, uses_pyplot):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.after = after
+        self.uses_pyplot = uses_pyplot
+
+class TaskGraph:
+    """
+    Grafo de tareas con nombre y dependencias declaradas. Cada tarea recibe como argumentos los
+    resultados de sus inputs (en orden) y se ejecuta una sola vez: su resultado queda memorizado
+    en results y lo reutilizan todas las tareas que lo declaran como input. 'after' añade
+    dependencias de orden sin pasar su resultado. Las tareas cuyas dependencias ya terminaron se
+    ejecutan en paralelo en un pool de max_workers hilos (con max_workers=1, en orden de alta en
+    el hilo principal); las que usan pyplot (uses_pyplot=True) se serializan con PYPLOT_LOCK.
+    Una tarea que devuelve SKIPPED, o que falla (el error se muestra por pantalla), hace que se
+    omitan las tareas que dependen de ella. Como los inputs deben estar dados de alta antes, el
+    grafo no puede tener ciclos.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.results = {}
+        self.durations = {} # Segundos de ejecución de cada tarea
+
+    def add(self, name: str, func, inputs: tuple = (), after: tuple = (), uses_pyplot: bool = False) -> str:
+        """Da de alta la tarea name = func(*[resultado de cada input]). Devuelve name."""
+        if name in self.tasks:
+            raise ValueError(f"La tarea '{name}' ya existe.")
+        for dependency in (*inputs, *after):
+            if dependency not in self.tasks:
+                raise ValueError(f"La tarea '{name}' depende de '{dependency}', que no existe.")
+        self.tasks[name] = _Task(name, func, tuple(inputs), tuple(after), uses_pyplot)
+        return name
+
+    def _dependencies(self, name: str) -> tuple:
+        task = self.tasks[name]
+        return task.inputs + task.after
+
+    def _required(self, targets) -> list[str]:
+        """Las tareas necesarias para obtener targets, en orden de alta (topológico)."""
+        required = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in required:
+                required.add(name)
+                stack.extend(self._dependencies(name))
+        return [name for name in self.tasks if name in required]
+
+    def _call(self, task: _Task, args: list):
+        start = time.perf_counter()
+        try:
+            return task.func(*args)
+        except Exception as e:
+            print(f"Error en la tarea '{task.name}': {e}")
+            return SKIPPED
+        finally:
+            self.durations[task.name] = time.perf_counter() - start
+
+    def _execute(self, task: _Task, args: list):
+        if task.uses_pyplot:
+            with PYPLOT_LOCK: # Sin contar la espera en durations
+                return self._call(task, args)
+        return self._call(task, args)
+
+    def _arguments_or_skip(self, name: str):
+        """Argumentos de la tarea, o None si alguna dependencia se omitió."""
+        if any(self.results[dependency] is SKIPPED for dependency in self._dependencies(name)):
+            self.results[name] = SKIPPED
+            return None
+        return [self.results[dependency] for dependency in self.tasks[name].inputs]
+
+    def run(self, targets=None) -> dict:
+        """
+        Ejecuta las tareas necesarias para targets (por defecto todas) que aún no tengan resultado
+        y devuelve el diccionario de resultados.
+        """
+        pending = [name for name in self._required(targets or self.tasks) if name not in self.results]
+        if self.max_workers <= 1:
+            for name in pending:
+                args = self._arguments_or_skip(name)
+                if args is not None:
+                    self.results[name] = self._execute(self.tasks[name], args)
+            return self.results
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                ready = [name for name in pending if all(dependency in self.results for dependency in self._dependencies(name))]
+                for name in ready:
+                    pending.remove(name)
+                    args = self._arguments_or_skip(name)
+                    if args is not None:
+                        running[executor.submit(self._execute, self.tasks[name], args)] = name
+                if not running:
+                    continue # Solo había tareas omitidas: pueden haber liberado otras
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.results[running.pop(future)] = future.result()
+        return self.results
+
+    def get(self, name: str):
+        """Resultado de la tarea name, ejecutándola (y sus dependencias) si hace falta."""
+        return self.run([name])[name]
+
+    def print_timings(self, top_n: int = 10) -> None:
+        """Muestra las tareas que más tiempo han tardado."""
+        print(f"\nTareas más lentas (de {len(self.durations)} ejecutadas):")
+        for name, seconds in sorted(self.durations.items(), key=lambda item: item[1], reverse=True)[:top_n]:
+            print(f"    {seconds:8.2f} s  {name}")
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+import time
+import unittest.mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pandas as pd
+from preprocessing import _parse_log_file_sequential, LOG_TOKENIZERS
+
+def benchmark_tokenizers(log_path, repeats):
+    """
+    Parses log_path with every tokenizer in LOG_TOKENIZERS, checks that all of them
+    produce the same rows and counters, and prints the best time of each one.
+    """
+    results = {}
+    timings = {}
+    for tokenizer in LOG_TOKENIZERS:
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with unittest.mock.patch('builtins.print'):
+                results[tokenizer] = _parse_log_file_sequential(log_path, tokenizer=tokenizer)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[tokenizer] = best
+
+    reference_df, reference_processed, reference_skipped = results['regex']
+    for tokenizer, (df, processed, skipped) in results.items():
+        pd.testing.assert_frame_equal(df, reference_df)
+        assert (processed, skipped) == (reference_processed, reference_skipped), tokenizer
+
+    print(f"{log_path}: {reference_processed} lines, {reference_skipped} skipped")
+    for tokenizer, elapsed in timings.items():
+        print(f"  {tokenizer:>6}: {elapsed:.4f} s  ({timings['regex'] / elapsed:.2f}x vs regex)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the log line tokenizers of load_log_data.")
+    parser.add_argument("--log",
+                        default=os.path.join(os.path.dirname(__file__), "sample_first_2000_lines.txt"),
+                        help="Path to the log file to parse.")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="Number of runs per tokenizer; the best time is reported.")
+    args = parser.parse_args()
+    benchmark_tokenizers(args.log, args.repeats)
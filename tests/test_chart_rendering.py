@@ -0,0 +1,95 @@
+import unittest
+import unittest.mock
+import sys
+import os
+import tempfile
+import pandas as pd
+import numpy as np
+
+# Los módulos de src se importan entre sí por nombre (como al ejecutar analysis.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from chart_rendering import ChartRenderer, bin_histogram_and_kde, load_binned_arrays
+from session_analyzer import (
+    plot_session_duration_histogram, _render_mean_session_duration_by_hour,
+    plot_hits_vs_duration_scatter, _scatter_density_grid, _stratified_scatter_sample
+)
+
+class TestChartRenderer(unittest.TestCase):
+    def test_charts_rendered_in_worker_processes(self):
+        durations = pd.Series(np.random.default_rng(0).exponential(300, 2000))
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            with ChartRenderer(max_workers=1) as renderer:
+                plot_session_duration_histogram(durations, tmp_dir, renderer=renderer)
+                # Las notas se escriben en este proceso sin esperar al gráfico
+                self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'session_duration_histogram_notes.txt')))
+                renderer.submit(_render_mean_session_duration_by_hour, None, os.path.join(tmp_dir, 'roto.png'))
+                self.assertEqual(renderer.wait(), 1) # El gráfico con datos no válidos falla sin detener el resto
+            with open(os.path.join(tmp_dir, 'session_duration_histogram.png'), 'rb') as f:
+                self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+            self.assertFalse(os.path.exists(os.path.join(tmp_dir, 'roto.png')))
+
+class TestBinnedHistogram(unittest.TestCase):
+    def test_counts_and_kde_match_direct_computation(self):
+        rng = np.random.default_rng(1)
+        values = np.concatenate([rng.exponential(30, 4000), rng.exponential(3000, 200), [np.nan]])
+        binned = bin_histogram_and_kde(values)
+        finite = values[np.isfinite(values)]
+        expected_counts, expected_edges = np.histogram(finite, bins='auto')
+        np.testing.assert_array_equal(binned['counts'], expected_counts)
+        np.testing.assert_allclose(binned['edges'], expected_edges)
+
+        # KDE gaussiano exacto con el ancho de banda de Scott, como seaborn
+        bandwidth = finite.std(ddof=1) * len(finite) ** (-1 / 5)
+        differences = (binned['kde_x'][:, None] - finite[None, :]) / bandwidth
+        exact = np.exp(-0.5 * differences ** 2).sum(axis=1) / (len(finite) * bandwidth * np.sqrt(2 * np.pi))
+        self.assertEqual(len(binned['kde_x']), 200)
+        self.assertLess(np.max(np.abs(binned['kde_density'] - exact)), 0.01 * exact.max())
+
+        constant = bin_histogram_and_kde(np.full(10, 5.0))
+        self.assertEqual(constant['counts'].sum(), 10)
+        self.assertEqual(len(constant['kde_x']), 0)
+
+    def test_binned_arrays_saved_next_to_png(self):
+        durations = pd.Series(np.random.default_rng(0).exponential(300, 2000))
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            plot_session_duration_histogram(durations, tmp_dir, threshold_percentile=None)
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'session_duration_histogram.png')))
+            saved = load_binned_arrays(os.path.join(tmp_dir, 'session_duration_histogram.npz'))
+        self.assertEqual(set(saved), {'counts', 'edges', 'kde_x', 'kde_density'})
+        self.assertEqual(saved['counts'].sum(), len(durations))
+
+class TestHitsVsDurationRenderModes(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        hits = rng.integers(1, 40, 5000)
+        self.hits = pd.Series(hits, name='hits_per_session')
+        self.durations = pd.Series(hits * 30 + rng.exponential(120, 5000), name='duration_seconds')
+
+    def test_density_grid_and_sample_keep_all_sessions_or_extremes(self):
+        plot_df = pd.concat([self.hits, self.durations], axis=1)
+        grid = _scatter_density_grid(plot_df)
+        self.assertEqual(grid['counts'].sum(), len(plot_df))
+        self.assertEqual(grid['counts'].shape[0], 39) # Una columna por número de hits
+
+        sample = _stratified_scatter_sample(plot_df, max_points=500)
+        self.assertLess(len(sample), 600)
+        groups = plot_df.groupby('hits_per_session')['duration_seconds']
+        sample_groups = sample.groupby('hits_per_session')['duration_seconds']
+        pd.testing.assert_series_equal(sample_groups.min(), groups.min())
+        pd.testing.assert_series_equal(sample_groups.max(), groups.max())
+
+    def test_regression_uses_all_sessions_in_every_mode(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            results = {}
+            for render_mode in ['points', 'density', 'sample', 'auto']:
+                _, results[render_mode] = plot_hits_vs_duration_scatter(
+                    self.hits, self.durations, tmp_dir, render_mode=render_mode, max_points=1000
+                )
+                self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'hits_vs_duration_scatter.png')))
+            self.assertEqual(plot_hits_vs_duration_scatter(self.hits, self.durations, tmp_dir, render_mode='hexagonos'), (None, None))
+        for render_mode in ['density', 'sample', 'auto']:
+            self.assertEqual(results[render_mode], results['points'])
+
+if __name__ == '__main__':
+    unittest.main()
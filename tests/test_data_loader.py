@@ -0,0 +1,117 @@
+import unittest
+import sys
+import os
+import tempfile
+import unittest.mock
+import pandas as pd
+
+# Los módulos de src se importan entre sí por nombre (como al ejecutar analysis.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from data_loader import format_session_ids, load_processed_data, time_window_filters, _partition_filters
+from log_common import SESSION_COUNTER_BITS, PROCESSED_SCHEMA_VERSION, apply_processed_schema
+from preprocessing import write_partitioned_dataset
+
+class TestDataLoader(unittest.TestCase):
+    def test_format_session_ids_uses_host_and_counter(self):
+        user_dictionary = pd.DataFrame({'UserID': [0, 1], 'Host remoto': ['199.72.81.55', 'unicomp6.unicomp.net']})
+        session_ids = pd.Series([1, (1 << SESSION_COUNTER_BITS) + 3])
+        labels = format_session_ids(session_ids, user_dictionary)
+        self.assertEqual(labels.tolist(), ['199.72.81.55_1', 'unicomp6.unicomp.net_3'])
+
+    def _processed_sample(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'Host remoto': ['a.com', 'b.com', 'a.com'],
+            'Método': ['GET', 'GET', 'POST'],
+            'Página': ['/index.html', '/img/x.gif', '/index.html'],
+            'Protocolo': ['HTTP/1.0', 'HTTP/1.0', 'HTTP/1.0'],
+            'Resultado': [200, 304, 200],
+            'Tamaño': [1234.0, float('nan'), 56.0],
+            'marca de tiempo': [0.0, 5.0, 10.0],
+            'Extensión': ['html', 'gif', 'html'],
+            'UserID': pd.Series([0, 1, 0], dtype='int32'),
+            'SessionID': pd.Series([1, (1 << SESSION_COUNTER_BITS) + 1, 1], dtype='int64'),
+        })
+
+    def test_processed_schema_round_trips_through_parquet(self):
+        df = apply_processed_schema(self._processed_sample())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'processed_log_data.parquet')
+            df.to_parquet(path, index=False)
+            with unittest.mock.patch('builtins.print'):
+                loaded = load_processed_data(path)
+        self.assertEqual(loaded.attrs.get('schema_version'), PROCESSED_SCHEMA_VERSION)
+        self.assertEqual(loaded['Página'].dtype, 'category')
+        self.assertEqual(loaded['Resultado'].dtype, 'int16')
+        self.assertEqual(loaded['Tamaño'].dtype, 'float32')
+        pd.testing.assert_frame_equal(loaded, df)
+
+    def test_load_processed_data_upgrades_unversioned_files(self):
+        df = self._processed_sample()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'processed_log_data.parquet')
+            df.to_parquet(path, index=False)
+            with unittest.mock.patch('builtins.print'):
+                loaded = load_processed_data(path)
+        self.assertEqual(loaded.attrs.get('schema_version'), PROCESSED_SCHEMA_VERSION)
+        self.assertEqual(loaded['Host remoto'].dtype, 'category')
+        self.assertEqual(loaded['Página'].astype(str).tolist(), df['Página'].tolist())
+
+    def test_load_processed_data_with_columns_and_time_window(self):
+        df = apply_processed_schema(self._processed_sample())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'processed_log_data.parquet')
+            df.to_parquet(path, index=False, row_group_size=1)
+            # marca de tiempo 5 y 10 -> 1995-01-01 00:00:05 y 00:00:10 UTC
+            filters = time_window_filters('1995-01-01 00:00:05', pd.Timestamp('1994-12-31 20:00:10', tz='-04:00'))
+            with unittest.mock.patch('builtins.print'):
+                loaded = load_processed_data(path, columns=['SessionID', 'marca de tiempo'], filters=filters)
+        self.assertEqual(loaded.columns.tolist(), ['SessionID', 'marca de tiempo'])
+        self.assertEqual(loaded['marca de tiempo'].tolist(), [5.0])
+
+    def test_partitioned_dataset_reads_only_the_time_window(self):
+        df = apply_processed_schema(self._processed_sample())
+        # Hits el 1 de enero a las 00:00, el 2 de enero a las 10:00 y el 3 de enero a las 23:59 (UTC)
+        df['marca de tiempo'] = [0.0, 86400.0 + 36000.0, 3 * 86400.0 - 1.0]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dataset_path = os.path.join(tmp_dir, 'processed_log_data')
+            with unittest.mock.patch('builtins.print'):
+                write_partitioned_dataset(df, dataset_path, partition_by='day')
+                self.assertEqual(sorted(os.listdir(dataset_path)), [
+                    'periodo=1995-01-01', 'periodo=1995-01-02', 'periodo=1995-01-03'
+                ])
+                filters = time_window_filters('1995-01-02 09:00', '1995-01-02 11:00')
+                self.assertEqual(_partition_filters(dataset_path, filters), [
+                    ('periodo', '>=', '1995-01-02'), ('periodo', '<=', '1995-01-02')
+                ])
+                loaded = load_processed_data(dataset_path, filters=filters)
+                full = load_processed_data(dataset_path)
+        self.assertEqual(loaded['marca de tiempo'].tolist(), [86400.0 + 36000.0])
+        self.assertNotIn('periodo', full.columns)
+        pd.testing.assert_frame_equal(full, df, check_categorical=False)
+
+    def test_arrow_cache_is_reused_and_invalidated(self):
+        df = apply_processed_schema(self._processed_sample())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'processed_log_data.parquet')
+            df.to_parquet(path, index=False)
+            with unittest.mock.patch('builtins.print'):
+                first = load_processed_data(path, use_cache=True)
+                self.assertTrue(os.path.exists(path + '.arrow'))
+                with unittest.mock.patch('pyarrow.parquet.read_table', side_effect=AssertionError('read_table')):
+                    cached = load_processed_data(path, columns=['SessionID', 'Página'], use_cache=True)
+                # Con filtros la caché (el conjunto completo) no se usa, para no perder la poda del lector
+                with unittest.mock.patch('data_loader._load_arrow_cache', side_effect=AssertionError('_load_arrow_cache')):
+                    filtered = load_processed_data(path, columns=['SessionID', 'Página'], filters=[('Resultado', '==', 200)], use_cache=True)
+                # Al reescribir el Parquet la caché deja de ser válida y se regenera
+                df.iloc[:1].to_parquet(path, index=False)
+                regenerated = load_processed_data(path, use_cache=True)
+        pd.testing.assert_frame_equal(first, df)
+        self.assertEqual(first.attrs.get('schema_version'), PROCESSED_SCHEMA_VERSION)
+        self.assertEqual(cached.columns.tolist(), ['SessionID', 'Página'])
+        self.assertEqual(cached['Página'].astype(str).tolist(), ['/index.html', '/img/x.gif', '/index.html'])
+        self.assertEqual(filtered['Página'].astype(str).tolist(), ['/index.html', '/index.html'])
+        self.assertEqual(len(regenerated), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import unittest.mock
+import sys
+import os
+import tempfile
+import pandas as pd
+import numpy as np
+
+# Los módulos de src se importan entre sí por nombre (como al ejecutar analysis.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from preprocessing import load_log_data, encode_user_ids, identify_sessions
+from session_analyzer import build_session_summary
+from live_sessions import LiveSessionTracker, follow
+
+SAMPLE_LOG_PATH = os.path.join(os.path.dirname(__file__), 'sample_first_2000_lines.txt')
+
+class TestLiveSessionTracker(unittest.TestCase):
+    def test_closed_sessions_match_batch_summary(self):
+        timeout_seconds = 300 # Corto para que se cierren sesiones durante la lectura del sample
+        with unittest.mock.patch('builtins.print'):
+            df = load_log_data(SAMPLE_LOG_PATH)
+            df, _ = encode_user_ids(df)
+            summary = build_session_summary(identify_sessions(df, timeout_seconds=timeout_seconds))
+
+        tracker = LiveSessionTracker(timeout_seconds=timeout_seconds)
+        with open(SAMPLE_LOG_PATH, encoding='utf-8', errors='ignore') as f:
+            lines = f.readlines()
+        closed_while_reading = []
+        for start in range(0, len(lines), 100):
+            closed_while_reading.extend(tracker.process_lines(lines[start:start + 100]))
+        self.assertGreater(len(closed_while_reading), 0)
+        # Solo quedan abiertas sesiones con actividad reciente
+        self.assertTrue(all(tracker.watermark - session.end_timestamp <= timeout_seconds
+                            for session in tracker.open_sessions.values()))
+        closed = pd.DataFrame(closed_while_reading + tracker.flush())
+
+        columns = ['start_timestamp', 'end_timestamp', 'num_hits', 'entry_page', 'exit_page',
+                   'start_hour', 'mean_page_view_time', 'num_page_views']
+        expected = summary.reset_index()[columns].astype({'entry_page': str, 'exit_page': str})
+        expected = expected.sort_values(columns[:5]).reset_index(drop=True)
+        result = closed[columns].sort_values(columns[:5]).reset_index(drop=True)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+        summary_stats = tracker.summary(top_n=3)
+        durations = (summary['end_timestamp'] - summary['start_timestamp'])[summary['num_hits'] > 1]
+        self.assertEqual(summary_stats['sesiones_cerradas'], len(summary))
+        self.assertEqual(summary_stats['lineas_omitidas'], len(lines) - len(df))
+        self.assertAlmostEqual(summary_stats['duracion_media'], durations.mean())
+        self.assertEqual(summary_stats['duracion_max'], durations.max())
+        self.assertEqual(summary_stats['duracion_min'], durations.min())
+        self.assertEqual(tracker.session_durations.count, len(durations))
+        self.assertEqual(tracker.page_view_durations.count, summary['num_page_views'].sum())
+        self.assertEqual(summary_stats['hits_por_sesion_max'], summary['num_hits'].max())
+        expected_entry = summary['entry_page'].astype(str).value_counts()
+        self.assertEqual([count for _, count in summary_stats['top_paginas_entrada']], expected_entry.head(3).tolist())
+
+    def test_new_session_after_timeout_and_extension_filter(self):
+        tracker = LiveSessionTracker(timeout_seconds=1800, allowed_extensions={'html'})
+        lines = [
+            'h1 - - [01/Jul/1995:00:00:00 -0400] "GET /a.html HTTP/1.0" 200 1',
+            'h1 - - [01/Jul/1995:00:00:10 -0400] "GET /img.gif HTTP/1.0" 200 1',
+            'h1 - - [01/Jul/1995:00:10:00 -0400] "GET /b/ HTTP/1.0" 200 1',
+            'h1 - - [01/Jul/1995:00:40:01 -0400] "GET /c.html HTTP/1.0" 200 1',
+            'h2 - - [99/Jul/1995:00:40:01 -0400] "GET /d.html HTTP/1.0" 200 1',
+            '',
+        ]
+        closed = tracker.process_lines(lines)
+        self.assertEqual(len(closed), 1)
+        self.assertEqual((closed[0]['num_hits'], closed[0]['entry_page'], closed[0]['exit_page']), (2, '/a.html', '/b/'))
+        self.assertEqual(closed[0]['end_timestamp'] - closed[0]['start_timestamp'], 600)
+        self.assertEqual((tracker.filtered_hits, tracker.skipped_lines), (1, 2))
+        self.assertEqual(list(tracker.open_sessions), ['h1'])
+        self.assertEqual(tracker.expire(tracker.watermark + 1800), [])
+        self.assertEqual(len(tracker.expire(tracker.watermark + 1)), 1)
+        self.assertEqual(tracker.summary()['top_paginas_acceso_unico'], [('/c.html', 1)])
+
+    def test_out_of_order_hit_keeps_last_activity_order(self):
+        tracker = LiveSessionTracker(timeout_seconds=100)
+        tracker.add_hit('a', 0.0, '/a1', 0)
+        tracker.add_hit('a', 30.0, '/a2', 0)
+        tracker.add_hit('b', 50.0, '/b1', 0)
+        tracker.add_hit('a', 10.0, '/a3', 0) # Fuera de orden: la última actividad de 'a' sigue en 30
+        self.assertEqual(list(tracker.open_sessions), ['a', 'b'])
+        closed = tracker.expire(131.0)
+        self.assertEqual([session['host'] for session in closed], ['a'])
+        self.assertEqual((closed[0]['num_hits'], closed[0]['exit_page']), (3, '/a2'))
+
+class TestFollow(unittest.TestCase):
+    def test_follow_reads_appended_complete_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'access.log')
+            with open(path, 'wb') as f:
+                f.write(b'antigua\n')
+            lines = follow(path, poll_interval=0, from_start=False)
+            self.assertEqual(next(lines), [])
+            with open(path, 'ab') as f:
+                f.write(b'uno\r\ndos\nsin termin')
+            self.assertEqual(next(lines), ['uno', 'dos'])
+            self.assertEqual(next(lines), [])
+            with open(path, 'ab') as f:
+                f.write(b'ar\n')
+            self.assertEqual(next(lines), ['sin terminar'])
+            self.assertEqual(next(lines), [])
+            # Rotación: se añaden líneas al fichero justo antes de renombrarlo y se crea uno nuevo más corto.
+            # Primero se leen las del anterior (también la incompleta) y después el nuevo
+            with open(path, 'ab') as f:
+                f.write(b'tarde\nincompleta')
+            os.rename(path, path + '.1')
+            with open(path, 'wb') as f:
+                f.write(b'nuevo\n')
+            self.assertEqual(next(lines), ['tarde', 'incompleta'])
+            self.assertEqual(next(lines), ['nuevo'])
+            lines.close()
+
+            idle_lines = list(follow(path, poll_interval=0, from_start=True, idle_timeout=0))
+            self.assertEqual(idle_lines, [['nuevo']])
+
+if __name__ == '__main__':
+    unittest.main()
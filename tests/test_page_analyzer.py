@@ -0,0 +1,92 @@
+import unittest
+import sys
+import os
+import pandas as pd
+import numpy as np
+import tempfile
+import unittest.mock
+
+# Los módulos de src se importan entre sí por nombre (como al ejecutar analysis.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from page_analyzer import (
+    calculate_first_second_page_durations, get_top_pages_by_hits_and_sessions,
+    get_top_domains_by_hits_and_sessions, get_top_directories_by_hits_and_sessions,
+    _approximate_top_by_hits_and_sessions, _extract_directory
+)
+
+class TestPageAnalyzer(unittest.TestCase):
+    def test_first_second_page_durations_match_per_session_loop(self):
+        rng = np.random.default_rng(0)
+        n_hits = 2000
+        df = pd.DataFrame({
+            'SessionID': rng.integers(0, 700, n_hits),
+            'marca de tiempo': rng.integers(0, 50, n_hits).astype('float64'),
+        })
+        df.loc[df.sample(20, random_state=0).index, 'marca de tiempo'] = np.nan
+
+        # Referencia: recorrido explícito sesión a sesión
+        expected_first, expected_second = [], []
+        for _, group in df.sort_values(by=['SessionID', 'marca de tiempo']).groupby('SessionID'):
+            timestamps = group['marca de tiempo'].tolist()
+            if len(timestamps) >= 2 and timestamps[1] - timestamps[0] >= 0:
+                expected_first.append(timestamps[1] - timestamps[0])
+            if len(timestamps) >= 3 and timestamps[2] - timestamps[1] >= 0:
+                expected_second.append(timestamps[2] - timestamps[1])
+
+        first, second = calculate_first_second_page_durations(df)
+        pd.testing.assert_series_equal(first, pd.Series(expected_first, dtype='float64'))
+        pd.testing.assert_series_equal(second, pd.Series(expected_second, dtype='float64'))
+
+    def test_first_second_page_durations_empty(self):
+        df = pd.DataFrame({'SessionID': pd.Series(dtype='int64'), 'marca de tiempo': pd.Series(dtype='float64')})
+        first, second = calculate_first_second_page_durations(df)
+        self.assertTrue(first.empty)
+        self.assertTrue(second.empty)
+
+    def test_approximate_top_tables_match_exact(self):
+        # Pocas claves distintas: los hits aproximados son exactos y las sesiones casi
+        rng = np.random.default_rng(0)
+        n_hits = 3000
+        pages = rng.choice(['/a/x.html', '/a/y.gif', '/b/', '/b/z.txt', '/c.html', '/'], n_hits, p=[.3, .25, .2, .1, .1, .05])
+        df = pd.DataFrame({
+            'Página': pd.Series(pages).astype('category'),
+            'Host remoto': rng.choice(['h1.com', 'h2.edu', '10.0.0.1'], n_hits),
+            'SessionID': rng.integers(0, 400, n_hits).astype('int64'),
+        })
+        functions = [get_top_pages_by_hits_and_sessions, get_top_domains_by_hits_and_sessions,
+                     get_top_directories_by_hits_and_sessions]
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            output_dir = os.path.join(tmp_dir, 'graphics')
+            for function in functions:
+                with self.subTest(function=function.__name__):
+                    exact = function(df, output_dir, top_n=5)
+                    approximate = function(df, output_dir, top_n=5, approximate=True)
+                    self.assertEqual(list(approximate.columns), list(exact.columns))
+                    self.assertEqual(approximate.dtypes.tolist(), exact.dtypes.tolist())
+                    pd.testing.assert_frame_equal(approximate.iloc[:, :2], exact.iloc[:, :2])
+                    relative_error = (approximate['SessionCount'] / exact['SessionCount'] - 1).abs()
+                    self.assertTrue((relative_error < 0.1).all())
+
+    def test_approximate_top_directories_streams_batches_without_copy(self):
+        rng = np.random.default_rng(1)
+        n_hits = 500
+        df = pd.DataFrame({
+            'Página': pd.Series(rng.choice(['/a/x.html', '/a/y.gif', '/b/', '/b/z.txt', '/c.html'], n_hits)).astype('category'),
+            'SessionID': rng.integers(0, 100, n_hits).astype('int64'),
+        })
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            exact = get_top_directories_by_hits_and_sessions(df, os.path.join(tmp_dir, 'graphics'), top_n=5)
+            original_copy = pd.DataFrame.copy
+            def copy_other_frames(frame, *args, **kwargs):
+                self.assertIsNot(frame, df, "El modo aproximado no debe copiar el DataFrame de hits")
+                return original_copy(frame, *args, **kwargs)
+            with unittest.mock.patch.object(pd.DataFrame, 'copy', copy_other_frames):
+                get_top_directories_by_hits_and_sessions(df, os.path.join(tmp_dir, 'graphics'), top_n=5, approximate=True)
+            batched = _approximate_top_by_hits_and_sessions(
+                df['Página'], df['SessionID'], 'Directory', 5, 0.001, 12, batch_rows=37, key_func=_extract_directory
+            )
+        pd.testing.assert_frame_equal(batched.iloc[:, :2], exact.iloc[:, :2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,12 +3,27 @@ import sys
 import os
 import pandas as pd # For pd.NaT and type checking
 import numpy as np # For np.nan comparison if needed
+import pyarrow.parquet as pq
 import unittest.mock
+import tempfile
+import gzip
+import bz2
+import lzma
 
-# Add the parent directory (project root) to sys.path to allow imports from src
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Los módulos de src se importan entre sí por nombre (como al ejecutar preprocessing.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
-from src.preprocessing import parse_log_line, COLUMN_NAMES, load_log_data, get_top_extensions
+from log_common import (
+    parse_log_line, COLUMN_NAMES, parse_clf_datetimes, CLF_DATETIME_FORMAT, SESSION_COUNTER_BITS,
+    SESSION_SORT_ORDER, sort_by_session_time, map_unique_values, extract_extension_from_page,
+    apply_processed_schema
+)
+from preprocessing import (
+    load_log_data, get_top_extensions, _parse_log_file_sequential, _parse_log_file_parallel,
+    stream_log_to_parquet, identify_sessions, identify_sessions_incremental, load_session_state,
+    save_session_state, merge_processed_batch, identify_bots_by_robots_txt, save_bot_tables,
+    encode_user_ids, stage_cache_key, run_cached_stage, detect_compression, ingest_log_files, resolve_log_paths
+)
 
 class TestPreprocessing(unittest.TestCase):
     # Path to the sample log file generated by create_test_sample.py
@@ -196,5 +211,321 @@ class TestPreprocessing(unittest.TestCase):
         
         pd.testing.assert_frame_equal(result_df_sorted, expected_df_sorted)
 
+    def test_parallel_parser_matches_sequential(self):
+        with unittest.mock.patch('builtins.print'):
+            expected = _parse_log_file_sequential(self.SAMPLE_LOG_PATH)
+            result = _parse_log_file_parallel(self.SAMPLE_LOG_PATH, n_workers=2, chunk_size_bytes=4096)
+        pd.testing.assert_frame_equal(result[0], expected[0])
+        self.assertEqual(result[1:], expected[1:])
+
+    def test_parallel_parser_counts_blank_malformed_and_cr_lines(self):
+        content = (
+            b'199.72.81.55 - - [01/Jul/1995:00:00:01 -0400] "GET /history/apollo/ HTTP/1.0" 200 6245\r\n'
+            b'\n'
+            b'linea mal formada\n'
+            b'host\xff.com - - [01/Jul/1995:00:00:02 -0400] "GET /a.html HTTP/1.0" 200 -\r'
+            b'host2 - - [01/Jul/1995:00:00:03 -0400] "GET /b.html HTTP/1.0" 304 0'
+        )
+        with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as tmp:
+            tmp.write(content)
+        try:
+            with unittest.mock.patch('builtins.print'):
+                expected = _parse_log_file_sequential(tmp.name)
+                result = _parse_log_file_parallel(tmp.name, n_workers=2, chunk_size_bytes=16)
+            pd.testing.assert_frame_equal(result[0], expected[0])
+            self.assertEqual(result[1:], expected[1:])
+            self.assertEqual(expected[1:], (5, 2))
+        finally:
+            os.remove(tmp.name)
+
+    def test_split_tokenizer_matches_regex(self):
+        # Líneas canónicas mezcladas con casos que el tokenizador 'split' debe delegar en LOG_PATTERN
+        content = (
+            b'199.72.81.55 - - [01/Jul/1995:00:00:01 -0400] "GET /history/apollo/ HTTP/1.0" 200 6245\n'
+            b'\n'
+            b'   \n'
+            b'linea mal formada\n'
+            b'  host1 - - [01/Jul/1995:00:00:02 -0400] "GET /a.html HTTP/1.0" 200 -  \n'
+            b'host2 -  - [01/Jul/1995:00:00:03 -0400]\t"POST /b.html HTTP/1.0" 304 0\n'
+            b'host3 - - [01/Jul/1995:00:00:04 -0400] "GET /c d.html HTTP/1.0" 200 10\n'
+            b'host4 - - [01/Jul/1995:00:00:05 -0400] "BREW /pot HTTP/1.0" 200 10\n'
+            b'host5 - - [01/Jul/1995:00:00:06] -0400] "GET /e.html HTTP/1.0" 200 10\n'
+            b'host6 - - [01/Jul/1995:00:00:07 -0400] "GET /f.html HTTP/1.0" 20 10\n'
+            b'h\xc3\xb3st7 - - [01/Jul/1995:00:00:08 -0400] "GET /g.html HTTP/1.0" 200 10\n'
+            b'host\xff8 - - [01/Jul/1995:00:00:09 -0400] "GET /h.html HTTP/1.0" 200 10\n'
+            b'host9 - - [01/Jul/1995:00:00:10 -0400] "GET /i.html HTTP/1.0" 200 10\x1c\n'
+            b'host10 - - [01/Jul/1995:00:00:11 -0400] "HEAD /j.html HTTP/1.1" 404 -'
+        )
+        with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as tmp:
+            tmp.write(content)
+        try:
+            with unittest.mock.patch('builtins.print'):
+                expected = _parse_log_file_sequential(tmp.name)
+                result = _parse_log_file_sequential(tmp.name, tokenizer='split')
+                result_small_chunks = _parse_log_file_sequential(tmp.name, tokenizer='split', chunk_size_bytes=64)
+            pd.testing.assert_frame_equal(result[0], expected[0])
+            self.assertEqual(result[1:], expected[1:])
+            pd.testing.assert_frame_equal(result_small_chunks[0], expected[0])
+            self.assertEqual(result_small_chunks[1:], expected[1:])
+            self.assertEqual(expected[1:], (14, 7))
+        finally:
+            os.remove(tmp.name)
+
+    def test_load_log_data_split_tokenizer_matches_regex(self):
+        with unittest.mock.patch('builtins.print'):
+            df_regex = load_log_data(self.SAMPLE_LOG_PATH)
+            df_split = load_log_data(self.SAMPLE_LOG_PATH, tokenizer='split')
+            df_split_parallel = load_log_data(self.SAMPLE_LOG_PATH, n_workers=2, tokenizer='split')
+            self.assertIsNone(load_log_data(self.SAMPLE_LOG_PATH, tokenizer='otro'))
+        pd.testing.assert_frame_equal(df_split, df_regex)
+        pd.testing.assert_frame_equal(df_split_parallel, df_regex)
+
+    def test_load_log_data_parallel_matches_sequential(self):
+        with unittest.mock.patch('builtins.print'):
+            df_sequential = load_log_data(self.SAMPLE_LOG_PATH)
+            df_parallel = load_log_data(self.SAMPLE_LOG_PATH, n_workers=2)
+        pd.testing.assert_frame_equal(df_parallel, df_sequential)
+
+    def test_compressed_logs_match_plain_text(self):
+        with open(self.SAMPLE_LOG_PATH, 'rb') as f:
+            content = f.read()
+        half = len(content) // 2
+        compressed_contents = {
+            # Dos miembros gzip concatenados (como al añadir con cat a.gz b.gz)
+            'gzip': gzip.compress(content[:half]) + gzip.compress(content[half:]),
+            'bz2': bz2.compress(content),
+            'xz': lzma.compress(content),
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with unittest.mock.patch('builtins.print'):
+                df_plain = load_log_data(self.SAMPLE_LOG_PATH)
+                self.assertIsNone(detect_compression(self.SAMPLE_LOG_PATH))
+                for compression, compressed in compressed_contents.items():
+                    path = os.path.join(tmp_dir, f'log.{compression}')
+                    with open(path, 'wb') as f:
+                        f.write(compressed)
+                    self.assertEqual(detect_compression(path), compression)
+                    for n_workers, tokenizer in [(None, 'regex'), (None, 'split'), (2, 'regex'), (2, 'split')]:
+                        with self.subTest(compression=compression, n_workers=n_workers, tokenizer=tokenizer):
+                            pd.testing.assert_frame_equal(load_log_data(path, n_workers=n_workers, tokenizer=tokenizer), df_plain)
+                    # Bloques pequeños: muchos bloques pendientes a la vez en el pool
+                    result = _parse_log_file_parallel(path, n_workers=2, chunk_size_bytes=4096, tokenizer='split')
+                    expected = _parse_log_file_sequential(self.SAMPLE_LOG_PATH)
+                    pd.testing.assert_frame_equal(result[0], expected[0])
+                    self.assertEqual(result[1:], expected[1:])
+
+                gz_path = os.path.join(tmp_dir, 'log.gzip')
+                stream_result = stream_log_to_parquet(gz_path, os.path.join(tmp_dir, 'raw.parquet'), batch_lines=700)
+            self.assertEqual(stream_result, (2000, len(df_plain), 2000 - len(df_plain)))
+            pd.testing.assert_frame_equal(pd.read_parquet(os.path.join(tmp_dir, 'raw.parquet')), df_plain)
+
+    def test_ingest_log_files_merges_by_timestamp(self):
+        with open(self.SAMPLE_LOG_PATH, 'rb') as f:
+            lines = f.read().splitlines(keepends=True)
+        bad_date = b'host.bad - - [99/Foo/1995:00:00:00 -0400] "GET /x.html HTTP/1.0" 200 1\n'
+        # Ficheros solapados en el tiempo, uno desordenado localmente, uno comprimido y
+        # fechas no válidas (NaN) en dos de ellos
+        part_a = lines[0:900:2] + [bad_date]
+        part_b = lines[1:900:2]
+        part_b[10], part_b[11] = part_b[11], part_b[10]
+        part_c = [bad_date] + lines[900:]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            logs_dir = os.path.join(tmp_dir, 'logs')
+            os.makedirs(logs_dir)
+            for name, part in [('access_a.txt', part_a), ('access_b.txt', part_b)]:
+                with open(os.path.join(logs_dir, name), 'wb') as f:
+                    f.writelines(part)
+            with open(os.path.join(logs_dir, 'access_c.gz'), 'wb') as f:
+                f.write(gzip.compress(b''.join(part_c)))
+            self.assertEqual([os.path.basename(path) for path in resolve_log_paths(logs_dir)],
+                             ['access_a.txt', 'access_b.txt', 'access_c.gz'])
+            self.assertEqual(len(resolve_log_paths(os.path.join(logs_dir, 'access_*.txt'))), 2)
+
+            with unittest.mock.patch('builtins.print'):
+                expected = pd.concat([load_log_data(path) for path in resolve_log_paths(logs_dir)], ignore_index=True)
+                expected = expected.sort_values('marca de tiempo', kind='stable', na_position='last').reset_index(drop=True)
+                for source, n_workers, batch_rows in [(logs_dir, None, 500000), (logs_dir, 2, 37),
+                                                      (os.path.join(logs_dir, 'access_*'), None, 1)]:
+                    with self.subTest(source=source, n_workers=n_workers, batch_rows=batch_rows):
+                        output_path = os.path.join(tmp_dir, 'merged.parquet')
+                        result = ingest_log_files(source, output_path, n_workers=n_workers, tokenizer='split', batch_rows=batch_rows)
+                        self.assertEqual(result, (len(lines) + 2, len(expected), len(lines) + 2 - len(expected)))
+                        pd.testing.assert_frame_equal(pd.read_parquet(output_path), expected)
+                self.assertIsNone(ingest_log_files(os.path.join(logs_dir, 'nada_*'), os.path.join(tmp_dir, 'x.parquet')))
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ['logs', 'merged.parquet']) # Sin ficheros temporales
+
+    def test_stream_log_to_parquet_matches_load_log_data(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parquet_path = os.path.join(tmp_dir, 'raw.parquet')
+            with unittest.mock.patch('builtins.print'):
+                expected = load_log_data(self.SAMPLE_LOG_PATH)
+                result = stream_log_to_parquet(self.SAMPLE_LOG_PATH, parquet_path, batch_lines=300)
+            self.assertEqual(result, (2000, len(expected), 2000 - len(expected)))
+            self.assertEqual(pq.ParquetFile(parquet_path).num_row_groups, 7)
+            pd.testing.assert_frame_equal(pd.read_parquet(parquet_path), expected)
+
+    def test_parse_clf_datetimes_matches_pd_to_datetime(self):
+        values = pd.Series([
+            '01/Jul/1995:00:00:01 -0400', '01/Jul/1995:00:00:01 -0400', '29/Feb/1996:23:59:59 -0400',
+            '31/Jun/1995:00:00:01 -0400', '1/Jul/1995:00:00:05 -0400', '01/Jux/1995:00:00:01 -0400',
+            '01/Jul/1995/00:00:01 -0400', None
+        ])
+        datetimes, seconds = parse_clf_datetimes(values)
+        expected = pd.to_datetime(values, format=CLF_DATETIME_FORMAT, errors='coerce')
+        pd.testing.assert_series_equal(datetimes, expected)
+        expected_seconds = (expected.dt.tz_convert('UTC') - pd.Timestamp("1995-01-01", tz='UTC')).dt.total_seconds()
+        pd.testing.assert_series_equal(seconds, expected_seconds)
+        self.assertEqual(seconds.iloc[0], 15652801.0)
+
+    def test_identify_sessions_incremental_matches_full_recomputation(self):
+        with unittest.mock.patch('builtins.print'):
+            df = load_log_data(self.SAMPLE_LOG_PATH)
+            df_full, full_dictionary = encode_user_ids(df.copy())
+            expected = identify_sessions(df_full, timeout_seconds=60)
+            batches = []
+            user_dictionary = None
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                state_path = os.path.join(tmp_dir, 'session_state.parquet')
+                for start in range(0, len(df), 500):
+                    state, known_bot_hosts = load_session_state(state_path, timeout_seconds=60)
+                    batch, user_dictionary = encode_user_ids(df.iloc[start:start + 500].copy(), user_dictionary)
+                    batch, state = identify_sessions_incremental(batch, state, timeout_seconds=60)
+                    batches.append(batch)
+                    save_session_state(state_path, state, known_bot_hosts | {'bot.example.com'}, timeout_seconds=60)
+                metadata = pq.read_schema(state_path).metadata
+                state, known_bot_hosts = load_session_state(state_path, timeout_seconds=60)
+                # Un estado generado con otro timeout no se usa
+                self.assertIsNone(load_session_state(state_path, timeout_seconds=1800))
+        result = pd.concat(batches)
+        pd.testing.assert_series_equal(result['SessionID'].sort_index(), expected['SessionID'].sort_index())
+        pd.testing.assert_frame_equal(user_dictionary, full_dictionary)
+        self.assertEqual(len(state), df['Host remoto'].nunique())
+        self.assertEqual(metadata[b'timeout_seconds'], b'60')
+        self.assertEqual(known_bot_hosts, {'bot.example.com'})
+
+    def test_merged_batches_match_full_processing(self):
+        hits = pd.DataFrame({
+            # Las sesiones de a.com y b.com continúan en el lote del día siguiente
+            'Host remoto': ['a.com', 'bot.com', 'b.com', 'a.com', 'a.com', 'bot.com', 'b.com', 'bot.com', 'b.com'],
+            'Página': ['/x.html', '/y.html', '/x.html', '/z.html', '/x.html', '/robots.txt', '/z.html', '/y.html', '/x.html'],
+            'marca de tiempo': [0.0, 10.0, 20.0, 86000.0, 86500.0, 90010.0, 172700.0, 180000.0, 172900.0],
+        })
+
+        def process(df, state, known_bot_hosts, user_dictionary):
+            with_bots, details, _ = identify_bots_by_robots_txt(df.copy(), known_bot_hosts=known_bot_hosts)
+            df_users, user_dictionary = encode_user_ids(with_bots[~with_bots['Is_Bot']].drop(columns='Is_Bot'), user_dictionary)
+            df_sessions, state = identify_sessions_incremental(df_users, state, timeout_seconds=3600)
+            return apply_processed_schema(df_sessions), state, set(details['Bot Host Remoto']), user_dictionary
+
+        with unittest.mock.patch('builtins.print'), tempfile.TemporaryDirectory() as tmp_dir:
+            full, _, _, _ = process(hits, load_session_state(os.path.join(tmp_dir, 'ninguno'), 3600)[0], set(), None)
+            for partition_by in ['day', 'hour']:
+                processed_path = os.path.join(tmp_dir, f'procesado_{partition_by}')
+                known_bot_hosts, user_dictionary, state = set(), None, None
+                # Tres lotes, uno por día: bot.com pide /robots.txt en el segundo y vuelve en el tercero
+                for day in range(3):
+                    batch = hits[(hits['marca de tiempo'] // 86400) == day]
+                    state = state if state is not None else load_session_state(os.path.join(tmp_dir, 'ninguno'), 3600)[0]
+                    df_batch, state, batch_bots, user_dictionary = process(batch, state, known_bot_hosts, user_dictionary)
+                    merge_processed_batch(df_batch, processed_path, partition_by=partition_by, drop_hosts=batch_bots - known_bot_hosts)
+                    known_bot_hosts |= batch_bots
+                merged = pd.read_parquet(processed_path)
+                self.assertEqual(sorted(merged['Host remoto'].astype(str)), sorted(full['Host remoto'].astype(str)))
+                self.assertNotIn('bot.com', set(merged['Host remoto'].astype(str)))
+                # Las mismas sesiones que procesando todo junto (los códigos cambian: bot.com tuvo código)
+                self.assertEqual(sorted(merged.groupby('SessionID').size()), sorted(full.groupby('SessionID').size()))
+                self.assertEqual(sorted(full.groupby('SessionID').size()), [1, 1, 2, 2])
+            # Sin partición no se reescribe un único Parquet con todo el histórico
+            single_file_path = os.path.join(tmp_dir, 'procesado.parquet')
+            merge_processed_batch(full, single_file_path, partition_by=None)
+            self.assertFalse(os.path.exists(single_file_path))
+
+    def test_identify_sessions_integer_ids(self):
+        df = pd.DataFrame({
+            'Host remoto': ['b.com', 'a.com', 'b.com', 'b.com', 'a.com'],
+            'marca de tiempo': [0.0, 10.0, 100.0, 5000.0, 20.0]
+        })
+        with unittest.mock.patch('builtins.print'):
+            df, user_dictionary = encode_user_ids(df)
+            result = identify_sessions(df)
+        self.assertEqual(user_dictionary['Host remoto'].tolist(), ['b.com', 'a.com'])
+        self.assertEqual(result['UserID'].dtype, 'int32')
+        self.assertEqual(result['SessionID'].dtype, 'int64')
+        # b.com (código 0): sesiones 1, 1, 2; a.com (código 1): sesión 1
+        expected_ids = [1, 1, 2, (1 << SESSION_COUNTER_BITS) + 1, (1 << SESSION_COUNTER_BITS) + 1]
+        self.assertEqual(result['SessionID'].tolist(), expected_ids)
+
+    def test_session_sort_order_is_persisted_and_verified(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'UserID': rng.integers(0, 30, 300).astype('int32'),
+            'marca de tiempo': rng.integers(0, 20000, 300).astype('float64')
+        })
+        with unittest.mock.patch('builtins.print'):
+            result = identify_sessions(df, timeout_seconds=600)
+        self.assertEqual(result.attrs.get('sort_order'), SESSION_SORT_ORDER)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parquet_path = os.path.join(tmp_dir, 'processed.parquet')
+            result.to_parquet(parquet_path, index=False)
+            loaded = pd.read_parquet(parquet_path)
+        self.assertEqual(loaded.attrs.get('sort_order'), SESSION_SORT_ORDER)
+
+        # Con el orden ya anotado no se reordena y añadir columnas no modifica el original
+        with unittest.mock.patch.object(pd.DataFrame, 'sort_values', side_effect=AssertionError('sort_values')):
+            sorted_df = sort_by_session_time(loaded)
+        sorted_df['extra'] = 1
+        self.assertNotIn('extra', loaded.columns)
+        pd.testing.assert_frame_equal(sorted_df.drop(columns='extra'), loaded.sort_values(by=SESSION_SORT_ORDER))
+
+        # Una anotación que ya no se cumple (p.ej. tras reordenar) se detecta y se ordena de nuevo
+        shuffled = loaded.sample(frac=1, random_state=0)
+        self.assertEqual(shuffled.attrs.get('sort_order'), SESSION_SORT_ORDER)
+        pd.testing.assert_frame_equal(sort_by_session_time(shuffled), shuffled.sort_values(by=SESSION_SORT_ORDER))
+
+    def test_map_unique_values_matches_apply(self):
+        pages = pd.Series(['/a/b.HTML', '/c/', np.nan, '/a/b.HTML', '/img/x.gif', np.nan], name='Página', index=range(10, 16))
+        expected = pages.apply(extract_extension_from_page)
+        pd.testing.assert_series_equal(map_unique_values(pages, extract_extension_from_page), expected)
+        pd.testing.assert_series_equal(
+            map_unique_values(pages.astype('category'), extract_extension_from_page), expected
+        )
+
+    def test_stage_cache_reuses_results_and_chains_keys(self):
+        key_a = stage_cache_key('log-hash', 'filtro_extensiones', {'extensions': {'html', 'htm'}})
+        key_b = stage_cache_key('log-hash', 'filtro_extensiones', {'extensions': {'htm', 'html'}})
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(stage_cache_key(key_a, 'sesiones', {'timeout_seconds': 1800}),
+                            stage_cache_key(key_a, 'sesiones', {'timeout_seconds': 900}))
+
+        calls = []
+        def compute():
+            calls.append(1)
+            return pd.DataFrame({'a': [1, 2]}, index=[5, 7]), pd.DataFrame({'b': ['x']})
+        with tempfile.TemporaryDirectory() as cache_dir, unittest.mock.patch('builtins.print'):
+            first = run_cached_stage(cache_dir, 'bots', key_a, compute)
+            second = run_cached_stage(cache_dir, 'bots', key_a, compute)
+            run_cached_stage(cache_dir, 'bots', stage_cache_key('otro-log', 'bots'), compute)
+            entries = os.listdir(cache_dir)
+        self.assertEqual(len(calls), 2)
+        pd.testing.assert_frame_equal(second[0], first[0])
+        pd.testing.assert_frame_equal(second[1], first[1])
+        # Solo se conserva la última entrada de cada etapa
+        self.assertEqual(len(entries), 1)
+
+    def test_bot_tables_written_from_cached_stage(self):
+        df = pd.DataFrame({'Host remoto': ['bot.com', 'a.com', 'bot.com'], 'Página': ['/robots.txt', '/x.html', '/y.html']})
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            os.makedirs(cache_dir)
+            compute = lambda: identify_bots_by_robots_txt(df.copy())
+            run_cached_stage(cache_dir, 'bots', 'clave', compute)
+            # Segunda ejecución con output/ limpio: la etapa sale de la caché y las tablas se escriben igual
+            _, details, summary = run_cached_stage(cache_dir, 'bots', 'clave', compute)
+            details_path, summary_path = os.path.join(tmp_dir, 'bots.csv'), os.path.join(tmp_dir, 'resumen.csv')
+            save_bot_tables(details, summary, details_path, summary_path)
+            self.assertEqual(pd.read_csv(details_path).values.tolist(), [['bot.com', 2]])
+            self.assertEqual(pd.read_csv(summary_path)['Número de Peticiones'].tolist(), [2, 1])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+# Los módulos de src se importan entre sí por nombre (como al ejecutar analysis.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from session_analyzer import (
+    build_session_summary, calculate_session_durations, calculate_per_session_avg_page_time
+)
+
+class TestSessionSummary(unittest.TestCase):
+    def setUp(self):
+        # Hits desordenados, con empates de marca de tiempo y sesiones de un solo hit
+        rng = np.random.default_rng(0)
+        n_hits = 500
+        self.df = pd.DataFrame({
+            'SessionID': rng.integers(0, 60, n_hits).astype('int64'),
+            'marca de tiempo': rng.integers(0, 200, n_hits).astype('float64'),
+            'Página': rng.choice(['/a.html', '/b.gif', '/c/', '/d.txt'], n_hits),
+        })
+        self.df['Fecha/Hora'] = pd.to_datetime(self.df['marca de tiempo'] * 600, unit='s')
+
+    def test_summary_matches_groupby(self):
+        summary = build_session_summary(self.df)
+        grouped = self.df.groupby('SessionID')
+        pd.testing.assert_series_equal(summary['num_hits'], grouped.size(), check_names=False)
+        pd.testing.assert_series_equal(summary['start_timestamp'], grouped['marca de tiempo'].min(), check_names=False)
+        pd.testing.assert_series_equal(summary['end_timestamp'], grouped['marca de tiempo'].max(), check_names=False)
+
+        first_pages = self.df.loc[grouped['marca de tiempo'].idxmin(), ['SessionID', 'Página']].set_index('SessionID')['Página']
+        last_pages = self.df.loc[grouped['marca de tiempo'].idxmax(), ['SessionID', 'Página']].set_index('SessionID')['Página']
+        pd.testing.assert_series_equal(summary['entry_page'], first_pages, check_names=False)
+        pd.testing.assert_series_equal(summary['exit_page'], last_pages, check_names=False)
+        pd.testing.assert_series_equal(
+            summary['start_hour'], grouped['Fecha/Hora'].min().dt.hour, check_names=False, check_dtype=False
+        )
+
+    def test_durations_and_avg_page_time_match_groupby(self):
+        grouped = self.df.groupby('SessionID')['marca de tiempo']
+        hit_counts = grouped.count()
+        multi_hit = hit_counts[hit_counts > 1].index
+        expected_durations = (grouped.max() - grouped.min()).loc[multi_hit]
+        pd.testing.assert_series_equal(calculate_session_durations(self.df), expected_durations, check_names=False)
+
+        df_sorted = self.df.sort_values(by=['SessionID', 'marca de tiempo'])
+        df_sorted['page_view_duration'] = df_sorted.groupby('SessionID')['marca de tiempo'].diff().shift(-1)
+        valid = df_sorted.dropna(subset=['page_view_duration'])
+        valid = valid[valid['page_view_duration'] >= 0]
+        expected = valid.groupby('SessionID').agg(
+            avg_page_view_time_seconds=('page_view_duration', 'mean'),
+            num_page_views_in_session=('page_view_duration', 'count')
+        )
+        result = calculate_per_session_avg_page_time(self.df).set_index('SessionID').sort_index()
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_empty_frame(self):
+        empty = self.df.iloc[0:0]
+        self.assertTrue(build_session_summary(empty).empty)
+        self.assertTrue(calculate_session_durations(empty).empty)
+
+if __name__ == '__main__':
+    unittest.main()
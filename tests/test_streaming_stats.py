@@ -0,0 +1,191 @@
+import unittest
+import unittest.mock
+import sys
+import tempfile
+import os
+import pandas as pd
+import numpy as np
+
+# Los módulos de src se importan entre sí por nombre (como al ejecutar analysis.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from streaming_stats import (
+    CountMinSketch, SpaceSaving, HyperLogLog, TopKeySketch, KLLSketch, DurationSketch,
+    LinearRegressionAccumulator, hash_values
+)
+from session_analyzer import get_session_duration_stats
+
+def zipf_hits(n_hits, n_keys, seed=0):
+    """Hits con claves de popularidad tipo Zipf (como páginas de un log) y un SessionID por hit."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, n_keys + 1)
+    keys = rng.choice(n_keys, size=n_hits, p=weights / weights.sum())
+    return pd.DataFrame({
+        'key': pd.Series([f'/pagina/{k}.html' for k in keys], dtype='str'),
+        'SessionID': rng.integers(0, n_hits // 4, n_hits).astype('int64'),
+    })
+
+class TestSketches(unittest.TestCase):
+    def test_space_saving_bounds(self):
+        hits = zipf_hits(20000, 2000)
+        true_counts = hits['key'].value_counts()
+        summary = SpaceSaving(capacity=100)
+        for key in hits['key']:
+            summary.update(key)
+        bound = len(hits) / summary.capacity
+        for key, count, error in summary.top():
+            self.assertGreaterEqual(count, true_counts[key])
+            self.assertLessEqual(count - error, true_counts[key])
+            self.assertLessEqual(count - true_counts[key], bound)
+        # Toda clave con frecuencia mayor que total / capacity está en el resumen
+        for key in true_counts[true_counts > bound].index:
+            self.assertIn(key, summary.counts)
+
+        exact = SpaceSaving(capacity=10)
+        for key, count in [('a', 3), ('b', 1), ('a', 2), ('c', 4)]:
+            self.assertIsNone(exact.update(key, count))
+        self.assertEqual(exact.top(2), [('a', 5, 0), ('c', 4, 0)])
+
+    def test_count_min_overestimates_within_bound(self):
+        hits = zipf_hits(20000, 2000)
+        true_counts = hits['key'].value_counts()
+        sketch = CountMinSketch(epsilon=0.01, delta=0.01)
+        for start in range(0, len(hits), 5000):
+            sketch.update(hash_values(hits['key'].iloc[start:start + 5000]))
+        estimates = sketch.estimate(hash_values(true_counts.index))
+        self.assertTrue(np.all(estimates >= true_counts.to_numpy()))
+        within_bound = estimates - true_counts.to_numpy() <= sketch.epsilon * sketch.total
+        self.assertGreaterEqual(within_bound.mean(), 1 - sketch.delta)
+
+    def test_hyperloglog_estimate_and_merge(self):
+        values = np.arange(50000, dtype='int64')
+        first, second, union = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+        first.update(hash_values(values[:30000]))
+        second.update(hash_values(values[20000:]))
+        union.update(hash_values(values))
+        first.merge(second)
+        np.testing.assert_array_equal(first.registers, union.registers)
+        self.assertLess(abs(union.estimate() / len(values) - 1), 4 * union.relative_error)
+
+        small = HyperLogLog(12)
+        small.update(hash_values(np.repeat(np.arange(100, dtype='int64'), 3)))
+        self.assertLess(abs(small.estimate() - 100), 3)
+
+class TestTopKeySketch(unittest.TestCase):
+    def test_top_keys_match_exact_counts_within_bounds(self):
+        hits = zipf_hits(60000, 5000)
+        exact = pd.concat([
+            hits.groupby('key').size().rename('HitCount'),
+            hits.groupby('key')['SessionID'].nunique().rename('SessionCount'),
+        ], axis=1)
+
+        sketch = TopKeySketch(epsilon=0.002, hll_precision=12)
+        for start in range(0, len(hits), 7000):
+            sketch.update(hits['key'].iloc[start:start + 7000], hits['SessionID'].iloc[start:start + 7000])
+        top = sketch.top(10, key_name='Página')
+        self.assertEqual(list(top.columns), ['Página', 'HitCount', 'SessionCount'])
+
+        expected_top = exact.sort_values('HitCount', ascending=False).head(10)
+        self.assertEqual(set(top['Página']), set(expected_top.index))
+        for row in top.itertuples(index=False):
+            true_hits, true_sessions = exact.loc[row[0]]
+            self.assertGreaterEqual(row.HitCount, true_hits)
+            self.assertLessEqual(row.HitCount - true_hits, sketch.hit_error_bound)
+            self.assertLess(abs(row.SessionCount / true_sessions - 1), 4 * sketch.session_relative_error)
+
+    def test_exact_when_keys_fit(self):
+        hits = zipf_hits(3000, 50)
+        sketch = TopKeySketch(epsilon=0.01)
+        sketch.update(hits['key'], hits['SessionID'])
+        top = sketch.top(5, key_name='key').set_index('key')
+        exact_hits = hits['key'].value_counts()
+        pd.testing.assert_series_equal(top['HitCount'], exact_hits.loc[top.index], check_names=False)
+        self.assertTrue(sketch.top(5).columns.tolist() == ['key', 'HitCount', 'SessionCount'])
+        self.assertTrue(TopKeySketch().top(5).empty)
+
+class TestDurationSketch(unittest.TestCase):
+    def test_quantiles_within_rank_error_and_merge(self):
+        rng = np.random.default_rng(0)
+        durations = np.rint(rng.exponential(300, 100000))
+        first, second = DurationSketch(k=200), DurationSketch(k=200)
+        for chunk in np.array_split(durations[:60000], 7):
+            first.update(chunk)
+        for value in durations[60000:]:
+            second.add(value)
+        first.merge(second)
+
+        expected = pd.Series(durations).describe()
+        result = first.describe()
+        self.assertEqual(list(result.index), list(expected.index))
+        exact = ['count', 'mean', 'std', 'min', 'max']
+        np.testing.assert_allclose(result[exact], expected[exact], rtol=1e-9)
+        sorted_durations = np.sort(durations)
+        for label, q in [('25%', 0.25), ('50%', 0.5), ('75%', 0.75)]:
+            # El rango del valor devuelto está a como mucho quantile_rank_error * count del pedido
+            low = np.searchsorted(sorted_durations, result[label], side='left') / len(durations)
+            high = np.searchsorted(sorted_durations, result[label], side='right') / len(durations)
+            self.assertLessEqual(max(low - q, q - high, 0), first.quantile_rank_error)
+        self.assertEqual(first.mode().tolist(), pd.Series(durations).mode().tolist())
+        self.assertLess(sum(len(items) for items in first.quantiles.levels), 1000)
+
+        kll = KLLSketch(k=50)
+        kll.update(np.arange(50.0))
+        self.assertEqual(kll.quantile(0.5), 24.5) # Sin compactar es exacto (interpolación lineal)
+
+    def test_stats_report_from_sketch_matches_series(self):
+        durations = pd.Series([10.0, 20.0, 20.0, 35.0, 600.0, 5.0, np.nan])
+        sketch = DurationSketch()
+        sketch.update(durations)
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            expected = get_session_duration_stats(durations, tmp_dir)
+            result = get_session_duration_stats(sketch, tmp_dir)
+            self.assertIsNone(get_session_duration_stats(DurationSketch(), tmp_dir))
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_mode_not_reported_when_summary_overflows(self):
+        # Más valores distintos que mode_capacity y sin un valor claramente más frecuente
+        rng = np.random.default_rng(1)
+        sketch = DurationSketch(mode_capacity=1000)
+        for chunk in np.array_split(rng.integers(0, 3600, 200000).astype(float), 50):
+            sketch.update(chunk)
+        self.assertFalse(sketch.mode_is_exact)
+        self.assertTrue(sketch.mode().empty)
+        with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch('builtins.print'):
+            stats_df = get_session_duration_stats(sketch, tmp_dir)
+        self.assertEqual(stats_df['mode'].iloc[0], 'N/A')
+
+        # Con un valor dominante la moda sigue estando garantizada aunque el resumen se desborde
+        sketch.update(np.full(5000, 42.0))
+        self.assertEqual(sketch.mode().tolist(), [42.0])
+
+class TestLinearRegressionAccumulator(unittest.TestCase):
+    def test_merged_chunks_match_least_squares(self):
+        rng = np.random.default_rng(3)
+        # Valores grandes: con Σx² - n·media² se perdería precisión
+        x = 1e6 + rng.integers(1, 50, 20000).astype(float)
+        y = 40 * x + rng.normal(0, 300, 20000)
+        model = LinearRegressionAccumulator()
+        for x_chunk, y_chunk in zip(np.array_split(x, 7), np.array_split(y, 7)):
+            chunk_model = LinearRegressionAccumulator()
+            chunk_model.update(x_chunk, y_chunk)
+            model.merge(chunk_model)
+        model.update([np.nan], [1.0])
+        result = model.result()
+
+        slope, intercept = np.polyfit(x, y, 1)
+        residuals = y - (slope * x + intercept)
+        self.assertEqual(result['count'], len(x))
+        self.assertAlmostEqual(result['slope'], slope, places=6)
+        self.assertAlmostEqual(result['intercept'] / intercept, 1, places=6)
+        self.assertAlmostEqual(result['r_squared'], 1 - (residuals ** 2).sum() / ((y - y.mean()) ** 2).sum(), places=9)
+        self.assertAlmostEqual(result['residual_std'], residuals.std(ddof=2), places=6)
+
+    def test_constant_x_and_empty(self):
+        model = LinearRegressionAccumulator()
+        with self.assertRaises(ValueError):
+            model.result()
+        model.update([2, 2, 2], [1.0, 2.0, 6.0])
+        self.assertEqual((model.result()['slope'], model.result()['intercept']), (0.0, 3.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import unittest.mock
+import sys
+import os
+import threading
+
+# Los módulos de src se importan entre sí por nombre (como al ejecutar analysis.py desde src/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from task_graph import TaskGraph, SKIPPED
+
+class TestTaskGraph(unittest.TestCase):
+    def build_graph(self, max_workers, calls):
+        def record(name, value):
+            calls.append(name)
+            return value
+
+        graph = TaskGraph(max_workers=max_workers)
+        graph.add('base', lambda: record('base', 2))
+        graph.add('square', lambda x: record('square', x * x), ['base'])
+        graph.add('double', lambda x: record('double', 2 * x), ['base'])
+        graph.add('total', lambda a, b: record('total', a + b), ['square', 'double'])
+        graph.add('skipped', lambda: SKIPPED)
+        graph.add('after_skipped', lambda x: record('after_skipped', x), ['base'], after=['skipped'])
+        graph.add('failing', lambda x: 1 / 0, ['base'])
+        graph.add('after_failing', lambda x: record('after_failing', x), ['failing'])
+        return graph
+
+    def test_results_memoized_and_skips_propagate(self):
+        for max_workers in [1, 4]:
+            calls = []
+            graph = self.build_graph(max_workers, calls)
+            with unittest.mock.patch('builtins.print'):
+                self.assertEqual(graph.get('total'), 8)
+                self.assertEqual(sorted(calls), ['base', 'double', 'square', 'total'])
+                results = graph.run()
+            self.assertEqual(sorted(calls), ['base', 'double', 'square', 'total']) # Cada tarea una sola vez
+            for name in ['skipped', 'after_skipped', 'failing', 'after_failing']:
+                self.assertIs(results[name], SKIPPED)
+
+    def test_independent_tasks_run_concurrently(self):
+        # Las dos tareas solo terminan si se ejecutan a la vez
+        barrier = threading.Barrier(2, timeout=5)
+        graph = TaskGraph(max_workers=2)
+        graph.add('left', barrier.wait)
+        graph.add('right', barrier.wait)
+        graph.add('both', lambda left, right: sorted([left, right]), ['left', 'right'])
+        self.assertEqual(graph.get('both'), [0, 1])
+
+    def test_unknown_or_duplicate_tasks_rejected(self):
+        graph = TaskGraph()
+        graph.add('a', lambda: 1)
+        with self.assertRaises(ValueError):
+            graph.add('a', lambda: 2)
+        with self.assertRaises(ValueError):
+            graph.add('b', lambda x: x, ['missing'])
+
+if __name__ == '__main__':
+    unittest.main()